@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+价格提醒引擎
+
+规则文件（默认 alerts.txt，空白分隔，# 开头为注释，修改后自动重新加载）：
+    AAPL     price  >  250        价格上穿 250
+    AAPL     price  <  200        价格下穿 200
+    TSLA     change >= 5          涨跌幅达到 +5%
+    TSLA     change <= -5         涨跌幅达到 -5%
+    NVDA     pnl    >= 1000       持仓盈亏达到 +1000
+    BTCUSDT  pnl    <= -500       持仓亏损达到 500
+    news     美联储 降息 财报      新闻关键词（任意一个命中即提醒）
+
+- 每个 (代码, 指标) 的规则按阈值排序存放，价格从 old 变到 new 时只用二分查找
+  取出阈值落在 (old, new] 区间里的规则，规则再多每次也只检查价格附近的；
+- 启动后第一次看到某个值时，已经满足条件的规则也提醒一次；
+- 同一条规则在 cooldown 秒内不重复提醒（价格在阈值附近来回穿越时不会刷屏）；
+- > 与 >=、< 与 <= 按相同处理（到达阈值即提醒）。
+"""
+
+import os
+import re
+import sys
+import time
+import bisect
+import shutil
+import subprocess
+import threading
+from collections import deque
+from typing import NamedTuple
+
+METRIC_NAMES = {"price": "价格", "change": "涨跌幅", "pnl": "盈亏"}
+ABOVE_OPS = (">", ">=")
+BELOW_OPS = ("<", "<=")
+NEWS_SYMBOL = "news"
+
+
+class Alert(NamedTuple):
+    ts: float
+    symbol: str
+    text: str
+
+
+class Rule:
+    __slots__ = ("symbol", "metric", "above", "threshold", "last_fired")
+
+    def __init__(self, symbol, metric, above, threshold):
+        self.symbol = symbol
+        self.metric = metric
+        self.above = above            # True=上穿/达到，False=下穿/跌破
+        self.threshold = threshold
+        self.last_fired = None
+
+    def describe(self, value):
+        name = METRIC_NAMES[self.metric]
+        unit = "%" if self.metric == "change" else ""
+        verb = "上穿" if self.above else "下穿"
+        if self.metric != "price":
+            verb = "达到" if self.above else "跌破"
+        return f"{self.symbol} {name}{verb} {self.threshold:g}{unit}（当前 {value:,.2f}{unit}）"
+
+
+class ThresholdIndex:
+    """单个 (代码, 指标) 的规则：上穿、下穿各一个按阈值排序的列表"""
+
+    def __init__(self):
+        self.above_keys, self.above = [], []
+        self.below_keys, self.below = [], []
+
+    def add(self, rule):
+        keys, rules = (self.above_keys, self.above) if rule.above else (self.below_keys, self.below)
+        i = bisect.bisect_right(keys, rule.threshold)
+        keys.insert(i, rule.threshold)
+        rules.insert(i, rule)
+
+    def crossed(self, old, new):
+        """值从 old 变为 new 时被触发的规则（old 为 None 表示第一次看到）"""
+        if old is None:
+            return (self.above[:bisect.bisect_right(self.above_keys, new)]
+                    + self.below[bisect.bisect_left(self.below_keys, new):])
+        if new > old:   # old < 阈值 <= new
+            return self.above[bisect.bisect_right(self.above_keys, old):bisect.bisect_right(self.above_keys, new)]
+        if new < old:   # new <= 阈值 < old
+            return self.below[bisect.bisect_left(self.below_keys, new):bisect.bisect_left(self.below_keys, old)]
+        return []
+
+
+# ====== 规则解析 ======
+def parse_alert_rules(lines):
+    """返回 ([(代码, 指标, 是否上穿, 阈值)], [关键词])，格式不对的行忽略"""
+    rules, keywords = [], []
+    for line in lines:
+        parts = line.split("#", 1)[0].split()
+        if len(parts) < 2:
+            continue
+        if parts[0].lower() == NEWS_SYMBOL:
+            keywords.extend(parts[1:])
+            continue
+        if len(parts) < 4 or parts[1].lower() not in METRIC_NAMES or parts[2] not in ABOVE_OPS + BELOW_OPS:
+            continue
+        try:
+            threshold = float(parts[3])
+        except ValueError:
+            continue
+        rules.append((parts[0].upper(), parts[1].lower(), parts[2] in ABOVE_OPS, threshold))
+    return rules, keywords
+
+
+# ====== 引擎 ======
+class AlertEngine:
+    def __init__(self, cooldown=300):
+        self.cooldown = cooldown          # 同一条规则的最短提醒间隔（秒）
+        self.rule_count = 0
+        self._index = {}                  # (代码, 指标) -> ThresholdIndex
+        self._last = {}                   # (代码, 指标) -> 上一次的值
+        self._news_re = None
+        self._seen_news = set()
+        self._seen_order = deque(maxlen=2000)
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def set_rules(self, rules, keywords=()):
+        """替换全部规则（保留已看到的值，重新加载后只对新的穿越提醒）"""
+        index = {}
+        for symbol, metric, above, threshold in rules:
+            index.setdefault((symbol, metric), ThresholdIndex()).add(Rule(symbol, metric, above, threshold))
+        news_re = re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE) if keywords else None
+        with self._lock:
+            self._index = index
+            self._news_re = news_re
+            self.rule_count = len(rules) + len(keywords)
+
+    def poll_file(self, path):
+        """规则文件有变化（mtime/大小）时重新加载，返回是否加载"""
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+        except OSError:
+            return False
+        if stamp == self._stamp:
+            return False
+        try:
+            if stamp is None:
+                self.set_rules([])
+            else:
+                with open(path, encoding="utf-8") as f:
+                    self.set_rules(*parse_alert_rules(f))
+        except (OSError, UnicodeDecodeError, ValueError):
+            # 读取或解析失败（例如编辑器保存到一半）：保留原规则，不记录 stamp，下次检查时重试
+            return False
+        self._stamp = stamp
+        return True
+
+    def update(self, symbol, metric, value, now=None):
+        """记录一个新值，返回被触发的提醒"""
+        if value is None or value != value:  # NaN
+            return []
+        key = (symbol, metric)
+        with self._lock:
+            old = self._last.get(key)
+            self._last[key] = value
+            index = self._index.get(key)
+            if index is None or old == value:
+                return []
+            now = time.time() if now is None else now
+            fired = []
+            for rule in index.crossed(old, value):
+                if rule.last_fired is not None and now - rule.last_fired < self.cooldown:
+                    continue
+                rule.last_fired = now
+                fired.append(Alert(now, symbol, rule.describe(value)))
+            return fired
+
+    def update_many(self, metric, symbols, values, now=None):
+        now = time.time() if now is None else now
+        fired = []
+        for symbol, value in zip(symbols, values):
+            fired.extend(self.update(symbol, metric, value, now))
+        return fired
+
+    def check_news(self, items, now=None):
+        """新闻关键词提醒（每条新闻只检查一次）"""
+        if self._news_re is None:
+            return []
+        now = time.time() if now is None else now
+        fired = []
+        for news in items:
+            news_id = news.get("id")
+            if news_id in self._seen_news:
+                continue
+            if len(self._seen_order) == self._seen_order.maxlen:
+                self._seen_news.discard(self._seen_order[0])
+            self._seen_order.append(news_id)
+            self._seen_news.add(news_id)
+            match = self._news_re.search(news.get("content", ""))
+            if match:
+                fired.append(Alert(now, "新闻", f"关键词「{match.group(0)}」：{news['content'][:40]}"))
+        return fired
+
+
+# ====== 通知 ======
+class AlertNotifier:
+    """bell=终端响铃，desktop=响铃 + 桌面通知（notify-send / osascript），none=只显示在画面上"""
+
+    def __init__(self, mode="bell", stream=None):
+        self.mode = mode
+        self.stream = stream or sys.stdout
+
+    def notify(self, alerts):
+        if not alerts or self.mode == "none":
+            return
+        self.stream.write("\a")
+        self.stream.flush()
+        if self.mode != "desktop":
+            return
+        for alert in alerts:
+            try:
+                if sys.platform == "darwin":
+                    script = f'display notification {_quote(alert.text)} with title {_quote(alert.symbol)}'
+                    subprocess.Popen(["osascript", "-e", script])
+                elif shutil.which("notify-send"):
+                    subprocess.Popen(["notify-send", alert.symbol, alert.text])
+            except OSError:
+                pass
+
+
+def _quote(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+monitor.py 离线性能测试：按 10 / 100 / 1000 个自选股测量每个阶段的耗时
+
+阶段：
+    fetch      经 QuoteCache 分块并发拉取（上游换成本地替身，可用 --latency 模拟网络耗时）
+    normalize  quote 字典 -> 列式数值表（normalize_us_quotes）
+    sort       排序并取一页（rank_quotes）
+    render     生成画面并差分输出到内存（build_screen + ScreenRenderer）
+
+替身行情默认用内置模板生成；指定 --replay 时用录制文件中的 Yahoo 行情做模板。
+--json 保存结果，--baseline 与之前保存的结果比较，中位数超出 tolerance 倍时返回非 0，
+便于在改动前后离线发现性能回退。
+
+用法：
+    python3 bench_monitor.py --json bench.json
+    python3 bench_monitor.py --baseline bench.json --tolerance 1.5
+"""
+
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+STAGES = ("fetch", "normalize", "sort", "render")
+
+# 内置的 Yahoo quote 模板（只含 monitor 用到的字段）
+QUOTE_TEMPLATE = {
+    "preMarketPrice": 101.2, "preMarketChangePercent": 0.45,
+    "regularMarketPrice": 100.75, "regularMarketChangePercent": -0.31,
+    "postMarketPrice": 100.9, "postMarketChangePercent": 0.15,
+    "overnightMarketPrice": 100.8, "overnightMarketChangePercent": 0.05,
+}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='monitor.py 离线性能测试')
+    parser.add_argument('--sizes', default='10,100,1000', help='自选股数量，逗号分隔 (默认: 10,100,1000)')
+    parser.add_argument('--iterations', type=int, default=20, help='每个数量重复次数 (默认: 20)')
+    parser.add_argument('--top', type=int, default=40, help='每页显示条数，0=全部 (默认: 40)')
+    parser.add_argument('--latency', type=float, default=0.0, help='替身每个请求的模拟耗时（毫秒）')
+    parser.add_argument('--replay', metavar='FILE', help='用 --capture 录制的 Yahoo 行情做模板')
+    parser.add_argument('--json', metavar='FILE', help='保存结果')
+    parser.add_argument('--baseline', metavar='FILE', help='与之前保存的结果比较')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='允许的变慢倍数 (默认: 1.5)')
+    return parser.parse_args()
+
+
+def load_templates(path):
+    """从录制文件中取出所有 Yahoo quote 字典"""
+    templates = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line) if line.strip() else {}
+            if record.get('source') == 'yahoo' and isinstance(record.get('data'), dict):
+                templates.extend(q for q in record['data'].values() if isinstance(q, dict))
+    return templates or [QUOTE_TEMPLATE]
+
+
+def make_stand_in(templates, latency_ms, seed=0):
+    """本地替身：按模板为任意代码生成带随机波动的行情"""
+    rng = random.Random(seed)
+
+    def fetch_many(tickers):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        quotes = {}
+        for t in tickers:
+            template = templates[rng.randrange(len(templates))]
+            scale = 1 + rng.uniform(-0.05, 0.05)
+            quotes[t] = {k: (v * scale if isinstance(v, (int, float)) else v) for k, v in template.items()}
+        return quotes
+    return fetch_many
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_size(monitor, size, iterations, top, fetch_many):
+    tickers = [f"T{i:04d}" for i in range(size)]
+    marks = {t: ("🚀" if i % 17 == 0 else "⚡") for i, t in enumerate(tickers) if i % 7 == 0}
+    book = monitor.PositionBook()
+    book.sync('us', {t: (100.0 if i % 2 else -100.0, 10.0) for i, t in enumerate(tickers) if i % 5 == 0})
+    status = {'notes': {}, 'lines': []}
+    timings = {stage: [] for stage in STAGES}
+    monitor.args.top = top
+
+    for _ in range(iterations):
+        # 每轮新建缓存，测量的是冷启动拉取（分块、并发、写缓存）
+        cache = monitor.QuoteCache(fetch_many, chunk_size=monitor.YAHOO_CHUNK_SIZE,
+                                   max_workers=monitor.YAHOO_MAX_WORKERS, name="bench")
+        renderer = monitor.ScreenRenderer(io.StringIO())
+
+        t0 = time.perf_counter()
+        quotes = cache.get_many(tickers, ttl=60)
+        t1 = time.perf_counter()
+        df = monitor.normalize_us_quotes(tickers, quotes, "regularMarketPrice", "regularMarketChangePercent",
+                                         marks, book)
+        t2 = time.perf_counter()
+        view, _, _ = monitor.rank_quotes(df, top, 0)
+        t3 = time.perf_counter()
+        renderer.render(monitor.build_screen([], df, monitor.QuoteTable(), {}, status))
+        t4 = time.perf_counter()
+
+        for stage, elapsed in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+            timings[stage].append(elapsed * 1000)
+        cache._executor.shutdown(wait=False)
+        cache._chunk_pool.shutdown(wait=False)
+
+    return {stage: {'median': statistics.median(v), 'p95': percentile(v, 95)} for stage, v in timings.items()}
+
+
+def main():
+    options = parse_arguments()
+    import monitor
+    monitor.apply_arguments(monitor.parse_arguments(['-t', 'none', '--no-crypto-stream']))
+
+    templates = load_templates(options.replay) if options.replay else [QUOTE_TEMPLATE]
+    fetch_many = make_stand_in(templates, options.latency)
+    sizes = [int(s) for s in options.sizes.split(',') if s.strip()]
+
+    results = {}
+    print(f"{'代码数':>6} " + " ".join(f"{stage + ' 中位/p95(ms)':>26}" for stage in STAGES))
+    for size in sizes:
+        results[str(size)] = run_size(monitor, size, options.iterations, options.top, fetch_many)
+        row = results[str(size)]
+        print(f"{size:>6} " + " ".join(f"{row[s]['median']:>17.2f} /{row[s]['p95']:>7.2f}" for s in STAGES))
+
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = []
+        for size, row in results.items():
+            for stage in STAGES:
+                old = baseline.get(size, {}).get(stage, {}).get('median')
+                # 太小的耗时受计时噪声影响大，低于 0.5ms 的不比较
+                if old and max(old, row[stage]['median']) >= 0.5 and row[stage]['median'] > old * options.tolerance:
+                    regressions.append(f"{size} 个代码 {stage}: {old:.2f}ms -> {row[stage]['median']:.2f}ms")
+        if regressions:
+            print("\n❌ 性能回退：")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\n✅ 与基准相比没有超出容忍范围的回退")
+
+
+if __name__ == '__main__':
+    main()
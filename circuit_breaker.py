@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每个上游数据源一个熔断器
+
+- 关闭：正常请求；连续失败 failure_threshold 次后打开；
+- 打开：直接快速失败（CircuitOpenError），不再每轮都等满超时；
+- 半开：打开 reset_timeout 秒后放行一个探测请求，成功则关闭，
+  失败则重新打开并把等待时间翻倍（不超过 max_reset_timeout）。
+
+budget 为单次调用的耗时预算：超出预算即使返回了结果也记一次失败，
+上游变慢时同样会被熔断，不会拖长整个刷新周期。
+错误不打印，记录在 last_error 中，由调用方显示在画面上。
+"""
+
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断打开期间的快速失败"""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, reset_timeout=15, max_reset_timeout=300, budget=None):
+        self.name = name
+        self.failure_threshold = failure_threshold  # 连续失败多少次后打开
+        self.reset_timeout = reset_timeout          # 打开后多久放行探测请求（秒）
+        self.max_reset_timeout = max_reset_timeout
+        self.budget = budget                        # 单次调用耗时预算（秒），None 表示不限
+        self.state = CLOSED
+        self.failures = 0                           # 连续失败次数
+        self.last_error = None
+        self.last_success = None                    # 最近一次成功的时间戳
+        self._timeout = reset_timeout
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否允许发出请求（半开状态同一时间只放行一个探测请求）"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() >= self._open_until:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.last_error = None
+            self.last_success = time.time()
+            self._timeout = self.reset_timeout
+            self._probing = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            self._probing = False
+            if self.state == HALF_OPEN:
+                # 探测失败：重新打开，等待时间翻倍
+                self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._open_until = time.time() + self._timeout
+
+    def call(self, fn, *args, **kwargs):
+        """经熔断器调用 fn：打开时抛 CircuitOpenError，异常和超出预算都记为失败"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} 熔断中")
+        start = time.time()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        elapsed = time.time() - start
+        if self.budget is not None and elapsed > self.budget:
+            self.record_failure(TimeoutError(f"耗时 {elapsed:.1f}s 超出预算 {self.budget}s"))
+        else:
+            self.record_success()
+        return result
+
+    def retry_in(self):
+        """距下一次探测的秒数（未打开时为 0）"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.time())
+
+    def age(self):
+        """距最近一次成功的秒数，从未成功返回 None"""
+        return None if self.last_success is None else time.time() - self.last_success
+
+    def status(self):
+        """画面底部的状态文字，正常时返回 None"""
+        if self.failures == 0:
+            return None
+        error = str(self.last_error or "")[:60]
+        if self.state == CLOSED:
+            return f"{self.name} 失败 {self.failures} 次: {error}"
+        if self.state == HALF_OPEN:
+            return f"{self.name} 熔断中（正在探测）: {error}"
+        return f"{self.name} 熔断中（{self.retry_in():.0f}秒后重试）: {error}"
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gate.io 虚拟币行情：WebSocket 推送 + 精简轮询兜底
+
+- 流式模式：只订阅配置的交易对（spot.tickers），最新价保存在内存中；
+- 轮询兜底：WebSocket 不可用、断线或数据过期时，只按交易对请求 REST 接口，
+  不再下载整个 /spot/tickers 列表。
+
+ws_url / rest_url 可配置，便于指向本地替身服务器做测试。
+"""
+
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+GATE_WS_URL = "wss://api.gateio.ws/ws/v4/"
+GATE_REST_URL = "https://api.gateio.ws/api/v4/spot/tickers"
+
+
+def pair_to_symbol(pair):
+    """BTC_USDT -> BTCUSDT（与 crypto_positions 的 key 一致）"""
+    return pair.replace("_", "")
+
+
+# ====== 精简轮询 ======
+def poll_gate_prices(pairs, rest_url=GATE_REST_URL, timeout=10, http_get=None):
+    """
+    并发请求每个交易对的 Gate.io REST 行情，返回 {BTCUSDT: 价格}；
+    总耗时约等于最慢的一个请求（不超过 timeout），不随交易对数量累加。
+    部分交易对失败时返回其余的价格；全部失败时抛出最后一个错误（由调用方的熔断器记录）。
+    http_get 可替换为录制/回放替身（见 replay.py），默认 requests.get。
+    """
+    if http_get is None:
+        import requests
+        http_get = requests.get
+
+    def fetch(pair):
+        response = http_get(rest_url, params={"currency_pair": pair}, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        # 指定 currency_pair 时接口仍返回数组
+        item = data[0] if isinstance(data, list) and data else data
+        return item.get("last") if isinstance(item, dict) else None
+
+    prices = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max(1, len(pairs)), thread_name_prefix="gate-poll") as pool:
+        futures = {pair: pool.submit(fetch, pair) for pair in pairs}
+        for pair, future in futures.items():
+            try:
+                last = future.result()
+                if last is not None:
+                    prices[pair_to_symbol(pair)] = float(last)
+            except Exception as e:
+                error = e
+    if not prices and error is not None:
+        raise error
+    return prices
+
+
+# ====== WebSocket 推送 ======
+class CryptoPriceStream:
+    """
+    后台线程维持 Gate.io WebSocket 订阅，断线后指数退避重连。
+    未安装 websocket-client 时不启动，调用方使用 poll_gate_prices 兜底。
+    """
+
+    def __init__(self, pairs, ws_url=GATE_WS_URL, stale_after=30, on_update=None):
+        self.pairs = list(pairs)
+        self.ws_url = ws_url
+        self.stale_after = stale_after      # 超过该秒数没有推送视为过期
+        self.on_update = on_update          # 每次价格更新后的回调 (symbol, price)
+        self._prices = {}
+        self._updated_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ws = None
+        self._thread = None
+
+    def start(self):
+        """启动后台订阅线程，websocket-client 不可用时返回 False"""
+        try:
+            import websocket  # noqa: F401  (websocket-client)
+        except ImportError:
+            return False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="crypto-ws")
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+
+    def is_fresh(self):
+        """所有交易对都有价格且最近有推送"""
+        with self._lock:
+            return (len(self._prices) == len(self.pairs)
+                    and time.time() - self._updated_at < self.stale_after)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._prices)
+
+    def subscribe_message(self):
+        return json.dumps({
+            "time": int(time.time()),
+            "channel": "spot.tickers",
+            "event": "subscribe",
+            "payload": self.pairs,
+        })
+
+    def handle_message(self, message):
+        """处理一条推送消息（与网络无关，便于单独测试）"""
+        try:
+            msg = json.loads(message)
+        except (TypeError, ValueError):
+            return
+        if msg.get("channel") != "spot.tickers" or msg.get("event") != "update":
+            return
+        result = msg.get("result")
+        for item in result if isinstance(result, list) else [result]:
+            if not isinstance(item, dict) or item.get("last") is None:
+                continue
+            symbol = pair_to_symbol(item.get("currency_pair", ""))
+            price = float(item["last"])
+            with self._lock:
+                self._prices[symbol] = price
+                self._updated_at = time.time()
+            if self.on_update:
+                self.on_update(symbol, price)
+
+    def _run(self):
+        import websocket
+
+        backoff = 1
+        while not self._stop.is_set():
+            opened = []
+            self._ws = websocket.WebSocketApp(
+                self.ws_url,
+                on_open=lambda ws: (opened.append(True), ws.send(self.subscribe_message())),
+                on_message=lambda ws, message: self.handle_message(message),
+            )
+            try:
+                self._ws.run_forever(ping_interval=20, ping_timeout=10)
+            except Exception:
+                pass
+            if self._stop.is_set():
+                break
+            # 连上过就从 1 秒重新开始退避
+            backoff = 1 if opened else min(backoff * 2, 60)
+            self._stop.wait(backoff)
@@ -3,7 +3,31 @@ import yfinance as yf
 import pandas as pd
 import pandas_ta as ta
 from datetime import datetime, timedelta
+import argparse
+import heapq
+import json
 import os
+import re
+
+# monitor.py 盘中指标预热用：每个代码每个周期保存最近多少根 bar 的收盘价
+LAST_BARS_COUNT = 200
+LAST_BARS_FILE = "last_bars.json"
+# monitor.py --indicators 的 bar 周期（只用相同周期的收盘价预热），加 --seed-bars 时才额外下载（只下载最近几天、只保存收盘价）
+SEED_INTERVALS = ["1m", "5m"]
+SEED_PERIOD = "5d"
+
+# ====== 分片（--shard i/N）：按预计工作量把代码均衡分到 N 个进程/机器，各自输出后 --merge 合并 ======
+# 每个代码的工作量按请求数估计：3 个周期的历史行情 + 到期日列表 + 现价，再加每个到期日一次期权链请求
+# （--seed-bars 对每个代码多出的请求数相同，不影响分配）
+REQUESTS_PER_TICKER = 5
+CHAIN_SIZES_FILE = "option_chain_sizes.json"   # 上次运行记录的 {代码: 6 个月内到期日数量}
+# 没有记录时按市值（us_stocks_list.csv 的 Market Cap）估计到期日数量：大盘股有周期权，到期日多
+CAP_EXPIRATION_ESTIMATES = [(200e9, 20), (10e9, 14), (2e9, 9), (0, 5)]
+DEFAULT_EXPIRATIONS = 8                        # 既没有记录也没有市值（stock.list）
+SHARD_DIR = "shards"
+SHARD_NAME = re.compile(r"shard-(\d+)-of-(\d+)")   # shard_dir 的目录名，其他文件/目录（.DS_Store、临时目录）合并时忽略
+HISTORY_INTERVALS = ["1d", "30m", "60m"]
+HISTORY_SHEETS = {"1d": "Daily", "30m": "30m", "60m": "60m"}
 
 # ========= 计算技术指标 =========
 def calc_indicators(df):
@@ -82,6 +106,22 @@ def fetch_and_process_stock(code, interval="1d"):
     return df
 
 
+# ========= 获取预热用的最近收盘价 =========
+def fetch_recent_closes(code, interval):
+    """最近 SEED_PERIOD 的 interval 收盘价列表（供 monitor.py 预热同周期的实时指标），失败返回 None"""
+    try:
+        df = yf.download(code, period=SEED_PERIOD, interval=interval, progress=False, auto_adjust=False)
+    except Exception as e:
+        print(f"❌ Error downloading {code} ({interval}): {e}")
+        return None
+    if df is None or df.empty:
+        return None
+    close = df["Close"]
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    return close.dropna().tail(LAST_BARS_COUNT).round(4).tolist()
+
+
 # ========= 获取期权链 =========
 def fetch_options(code):
     print(f"📌 Fetching options: {code} ...")
@@ -147,37 +187,97 @@ def fetch_options(code):
     return raw_df, filt_df
 
 
-# ========= 主程序 =========
-def main():
-    list_file = "stock.list"
-    if not os.path.exists(list_file):
-        print(f"❌ Error: {list_file} 不存在")
-        return
-
-    with open(list_file) as f:
-        codes = [line.strip() for line in f if line.strip()]
-
-    all_history_1d = []
-    all_history_30m = []
-    all_history_60m = []
+# ========= 代码列表 =========
+def read_codes(list_file):
+    """
+    读取代码列表，返回 (代码列表, {代码: 市值})。
+    .csv 按 get_stock_id.py 的 us_stocks_list.csv 读取 Code / Market Cap 列，其他文件每行一个代码；重复的代码只保留第一个。
+    """
+    caps = {}
+    if list_file.endswith(".csv"):
+        df = pd.read_csv(list_file, encoding="utf-8-sig", dtype={"Code": str})
+        codes = [str(c).strip() for c in df["Code"].dropna()]
+        if "Market Cap" in df.columns:
+            for code, cap in zip(df["Code"], pd.to_numeric(df["Market Cap"], errors="coerce")):
+                if isinstance(code, str) and cap == cap:
+                    caps.setdefault(code.strip(), float(cap))
+    else:
+        with open(list_file) as f:
+            codes = [line.strip() for line in f if line.strip()]
+    return list(dict.fromkeys(c for c in codes if c)), caps
+
+
+# ========= 分片 =========
+def parse_shard(text):
+    """'i/N' -> (i, N)，i 从 0 开始"""
+    try:
+        index, count = (int(x) for x in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 i/N，例如 0/4: {text}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"分片序号应在 0 到 {count - 1} 之间: {text}")
+    return index, count
+
+
+def load_chain_sizes(out_dir):
+    path = os.path.join(out_dir, CHAIN_SIZES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def expected_cost(code, chain_sizes, caps):
+    """一个代码的预计请求数：优先用上次记录的到期日数量，其次按市值估计"""
+    expirations = chain_sizes.get(code)
+    if expirations is None:
+        cap = caps.get(code)
+        if cap is None:
+            expirations = DEFAULT_EXPIRATIONS
+        else:
+            expirations = next((n for floor, n in CAP_EXPIRATION_ESTIMATES if cap >= floor),
+                               CAP_EXPIRATION_ESTIMATES[-1][1])
+    return REQUESTS_PER_TICKER + expirations
+
+
+def assign_shards(codes, count, chain_sizes, caps):
+    """
+    把代码分成 count 份，返回每份的代码列表（各份内保持原列表顺序）。
+    按预计工作量从大到小依次放入当前最轻的一份（LPT），同样的输入在任何机器上结果相同。
+    """
+    costs = {code: expected_cost(code, chain_sizes, caps) for code in codes}
+    loads = [(0, i) for i in range(count)]
+    members = [set() for _ in range(count)]
+    for code in sorted(codes, key=lambda c: (-costs[c], c)):
+        load, i = heapq.heappop(loads)
+        members[i].add(code)
+        heapq.heappush(loads, (load + costs[code], i))
+    return [[c for c in codes if c in member] for member in members]
+
+
+def shard_dir(out_dir, date_tag, index, count):
+    return os.path.join(out_dir, SHARD_DIR, date_tag, f"shard-{index}-of-{count}")
+
+
+# ========= 抓取 =========
+def collect_codes(codes, seed_bars=False):
+    """逐个代码抓取历史行情与期权链（seed_bars 时另下载预热用的收盘价），返回合并后的结果（没有数据的项为 None）"""
+    history = {interval: [] for interval in HISTORY_INTERVALS}
     all_options_raw = []
     all_options_filt = []
+    last_bars = {}    # 代码 -> {周期: 最近收盘价列表}，只有 SEED_INTERVALS
+    chain_sizes = {}  # 代码 -> 6 个月内到期日数量（下次分片的工作量估计）
 
     for code in codes:
-        # 历史数据 - 1d
-        hist_df_1d = fetch_and_process_stock(code, interval="1d")
-        if hist_df_1d is not None:
-            all_history_1d.append(hist_df_1d)
-
-        # 历史数据 - 30m
-        hist_df_30m = fetch_and_process_stock(code, interval="30m")
-        if hist_df_30m is not None:
-            all_history_30m.append(hist_df_30m)
-
-        # 历史数据 - 60m
-        hist_df_60m = fetch_and_process_stock(code, interval="60m")
-        if hist_df_60m is not None:
-            all_history_60m.append(hist_df_60m)
+        # 历史数据 - 1d / 30m / 60m
+        for interval in HISTORY_INTERVALS:
+            hist_df = fetch_and_process_stock(code, interval=interval)
+            if hist_df is not None:
+                history[interval].append(hist_df)
+        for interval in (SEED_INTERVALS if seed_bars else []):
+            closes = fetch_recent_closes(code, interval)
+            if closes:
+                last_bars.setdefault(code, {})[interval] = closes
 
         # 期权链
         raw_df, opt_df = fetch_options(code)
@@ -185,67 +285,207 @@ def main():
             all_options_raw.append(raw_df)
         if opt_df is not None:
             all_options_filt.append(opt_df)
+        chain_sizes[code] = int(raw_df["expiration"].nunique()) if raw_df is not None else 0
+
+    results = {interval: pd.concat(frames) if frames else None for interval, frames in history.items()}
+    results["options_raw"] = pd.concat(all_options_raw) if all_options_raw else None
+    results["options_filt"] = pd.concat(all_options_filt) if all_options_filt else None
+    results["last_bars"] = last_bars
+    results["chain_sizes"] = chain_sizes
+    return results
+
 
-    date_tag = datetime.today().strftime("%Y%m%d")
-    out_dir = os.path.join(os.getcwd(), "data2")
+# ========= 保存 =========
+def save_daily_outputs(results, out_dir, date_tag):
+    """写出最终的每日文件：历史行情 / 期权链 Excel、last_bars.json，并更新到期日数量记录"""
     os.makedirs(out_dir, exist_ok=True)
 
     # 保存历史行情到 Excel (分 3 个 sheet)
-    if all_history_1d or all_history_30m or all_history_60m:
+    if any(results[interval] is not None for interval in HISTORY_INTERVALS):
         print("\n📦 Saving historical data to Excel...")
         hist_path = os.path.join(out_dir, f"all_stocks_data_{date_tag}.xlsx")
-        
+
         with pd.ExcelWriter(hist_path, engine='openpyxl') as writer:
-            if all_history_1d:
-                df_hist_1d = pd.concat(all_history_1d)
+            for interval in HISTORY_INTERVALS:
+                df_hist = results[interval]
+                if df_hist is None:
+                    continue
                 # 移除 timezone 信息
-                if pd.api.types.is_datetime64_any_dtype(df_hist_1d.index):
-                    df_hist_1d.index = df_hist_1d.index.tz_localize(None)
-                df_hist_1d.to_excel(writer, sheet_name="Daily", index=True, index_label="Date")
-            
-            if all_history_30m:
-                df_hist_30m = pd.concat(all_history_30m)
-                # 移除 timezone 信息
-                if pd.api.types.is_datetime64_any_dtype(df_hist_30m.index):
-                    df_hist_30m.index = df_hist_30m.index.tz_localize(None)
-                df_hist_30m.to_excel(writer, sheet_name="30m", index=True, index_label="Date")
-            
-            if all_history_60m:
-                df_hist_60m = pd.concat(all_history_60m)
-                # 移除 timezone 信息
-                if pd.api.types.is_datetime64_any_dtype(df_hist_60m.index):
-                    df_hist_60m.index = df_hist_60m.index.tz_localize(None)
-                df_hist_60m.to_excel(writer, sheet_name="60m", index=True, index_label="Date")
-                
+                if pd.api.types.is_datetime64_any_dtype(df_hist.index):
+                    df_hist.index = df_hist.index.tz_localize(None)
+                df_hist.to_excel(writer, sheet_name=HISTORY_SHEETS[interval], index=True, index_label="Date")
+
         print(f"✅ Saved: {hist_path}")
 
-    # 保存期权链（未过滤）到 Excel
-    if all_options_raw:
-        print("\n📦 Saving raw option chain to Excel...")
-        opt_path_raw = os.path.join(out_dir, f"all_options_raw_{date_tag}.xlsx")
-        
-        with pd.ExcelWriter(opt_path_raw, engine='openpyxl') as writer:
-            df_opt_raw = pd.concat(all_options_raw)
-            # 遍历所有列，如果是 datetime 类型且带时区，则移除时区
-            for col in df_opt_raw.columns:
-                if pd.api.types.is_datetime64_any_dtype(df_opt_raw[col]):
-                        df_opt_raw[col] = df_opt_raw[col].dt.tz_localize(None)
-            df_opt_raw.to_excel(writer, sheet_name="All_Options", index=False)
-        print(f"📄 Saved: {opt_path_raw}")
-
-    # 保存期权链（过滤后）到 Excel
-    if all_options_filt:
-        print("\n📦 Saving filtered option chain to Excel...")
-        opt_path_filt = os.path.join(out_dir, f"all_options_filtered_{date_tag}.xlsx")
-
-        with pd.ExcelWriter(opt_path_filt, engine='openpyxl') as writer:
-            df_opt_filt = pd.concat(all_options_filt)
+    # 保存最近收盘价（供 monitor.py 预热实时指标）
+    if results["last_bars"]:
+        last_bars_path = os.path.join(out_dir, LAST_BARS_FILE)
+        with open(last_bars_path, "w", encoding="utf-8") as f:
+            json.dump(results["last_bars"], f)
+        print(f"📄 Saved: {last_bars_path}")
+
+    # 保存期权链（未过滤 / 过滤后）到 Excel
+    for key, name, sheet, label in (("options_raw", "raw", "All_Options", "raw"),
+                                    ("options_filt", "filtered", "Filtered_Options", "filtered")):
+        df_opt = results[key]
+        if df_opt is None:
+            continue
+        print(f"\n📦 Saving {label} option chain to Excel...")
+        opt_path = os.path.join(out_dir, f"all_options_{name}_{date_tag}.xlsx")
+
+        with pd.ExcelWriter(opt_path, engine='openpyxl') as writer:
             # 遍历所有列，如果是 datetime 类型且带时区，则移除时区
-            for col in df_opt_filt.columns:
-                if pd.api.types.is_datetime64_any_dtype(df_opt_filt[col]):
-                        df_opt_filt[col] = df_opt_filt[col].dt.tz_localize(None)
-            df_opt_filt.to_excel(writer, sheet_name="Filtered_Options", index=False)
-        print(f"📄 Saved: {opt_path_filt}")
+            for col in df_opt.columns:
+                if pd.api.types.is_datetime64_any_dtype(df_opt[col]):
+                    df_opt[col] = df_opt[col].dt.tz_localize(None)
+            df_opt.to_excel(writer, sheet_name=sheet, index=False)
+        print(f"📄 Saved: {opt_path}")
+
+    # 更新到期日数量记录（保留本次没有运行的代码的旧记录）
+    if results["chain_sizes"]:
+        chain_sizes = load_chain_sizes(out_dir)
+        chain_sizes.update(results["chain_sizes"])
+        with open(os.path.join(out_dir, CHAIN_SIZES_FILE), "w", encoding="utf-8") as f:
+            json.dump(chain_sizes, f)
+
+
+def save_shard(results, path, codes, assignment):
+    """
+    分片的中间结果：表格存为 pickle（保留索引与类型，合并时不需要重新解析 Excel）。
+    shard.json 同时记录完整的分配（全部分片的代码列表），合并时据此确认各分片来自同一次分配。
+    """
+    os.makedirs(path, exist_ok=True)
+    for key in HISTORY_INTERVALS + ["options_raw", "options_filt"]:
+        if results[key] is not None:
+            results[key].to_pickle(os.path.join(path, f"{key}.pkl"))
+    with open(os.path.join(path, "shard.json"), "w", encoding="utf-8") as f:
+        json.dump({"codes": codes, "assignment": assignment,
+                   "last_bars": results["last_bars"], "chain_sizes": results["chain_sizes"]}, f)
+    print(f"📄 Saved shard: {path}")
+
+
+def merge_shards(out_dir, date_tag, list_file):
+    """合并某天的全部分片，写出与不分片运行相同的每日文件；缺少分片时不合并"""
+    base = os.path.join(out_dir, SHARD_DIR, date_tag)
+    names = sorted(os.listdir(base)) if os.path.isdir(base) else []
+    shards = [m for m in map(SHARD_NAME.fullmatch, names) if m and os.path.isdir(os.path.join(base, m.group(0)))]
+    if not shards:
+        print(f"❌ Error: {base} 下没有分片结果")
+        return False
+    counts = {int(m.group(2)) for m in shards}
+    if len(counts) > 1:
+        print(f"❌ Error: {base} 下有不同分片数的结果 ({', '.join(map(str, sorted(counts)))})，请删除多余的")
+        return False
+    count = counts.pop()
+    missing = [i for i in range(count) if not os.path.exists(os.path.join(shard_dir(out_dir, date_tag, i, count), "shard.json"))]
+    if missing:
+        print(f"❌ Error: 分片 {', '.join(map(str, missing))} / {count} 还没有完成")
+        return False
+
+    metas = []
+    for i in range(count):
+        with open(os.path.join(shard_dir(out_dir, date_tag, i, count), "shard.json"), encoding="utf-8") as f:
+            metas.append(json.load(f))
+
+    # 各分片必须来自同一次分配，且互不重叠、合起来正好是代码列表，否则合并结果会缺行或重复
+    assignment = metas[0].get("assignment")
+    mismatched = [i for i, meta in enumerate(metas)
+                  if meta.get("assignment") != assignment or assignment is None or meta["codes"] != assignment[i]]
+    if mismatched:
+        print(f"❌ Error: 分片 {', '.join(map(str, mismatched))} / {count} 与其他分片的分配不一致"
+              f"（到期日记录或代码列表不同），请用相同的输入重新运行")
+        return False
+    seen, overlap = set(), set()
+    for meta in metas:
+        overlap.update(seen.intersection(meta["codes"]))
+        seen.update(meta["codes"])
+    if overlap:
+        print(f"❌ Error: 有 {len(overlap)} 个代码同时出现在多个分片中: {', '.join(sorted(overlap)[:10])}")
+        return False
+    listed = read_codes(list_file)[0] if os.path.exists(list_file) else [c for codes in assignment for c in codes]
+    if seen != set(listed):
+        missing, extra = set(listed) - seen, seen - set(listed)
+        print(f"❌ Error: 分片的代码与 {list_file} 不一致（缺少 {len(missing)} 个，多出 {len(extra)} 个），"
+              f"请确认各分片使用同一份代码列表")
+        return False
+
+    # 按原列表顺序排列，合并结果与不分片运行一致
+    order = {code: i for i, code in enumerate(listed)}
+    parts = {key: [] for key in HISTORY_INTERVALS + ["options_raw", "options_filt"]}
+    results = {"last_bars": {}, "chain_sizes": {}}
+    for i, meta in enumerate(metas):
+        path = shard_dir(out_dir, date_tag, i, count)
+        results["last_bars"].update(meta["last_bars"])
+        results["chain_sizes"].update(meta["chain_sizes"])
+        for key in parts:
+            pkl = os.path.join(path, f"{key}.pkl")
+            if os.path.exists(pkl):
+                parts[key].append(pd.read_pickle(pkl))
+    for key, frames in parts.items():
+        if not frames:
+            results[key] = None
+            continue
+        df = pd.concat(frames)
+        rank = df["Ticker"].map(order).fillna(len(order)).to_numpy()
+        results[key] = df.iloc[rank.argsort(kind="stable")]
+    results["last_bars"] = dict(sorted(results["last_bars"].items(), key=lambda item: order.get(item[0], len(order))))
+
+    save_daily_outputs(results, out_dir, date_tag)
+    return True
+
+
+# ========= 主程序 =========
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='批量下载历史行情与期权链')
+    parser.add_argument('--list',
+                       default='stock.list',
+                       help='代码列表：每行一个代码，或 get_stock_id.py 生成的 us_stocks_list.csv (默认: stock.list)')
+    parser.add_argument('--out-dir',
+                       default=os.path.join(os.getcwd(), "data2"),
+                       help='输出目录 (默认: ./data2)')
+    parser.add_argument('--date',
+                       default=datetime.today().strftime("%Y%m%d"),
+                       help='输出文件的日期标签 YYYYMMDD，多台机器分片时保持一致 (默认: 今天)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--shard',
+                      type=parse_shard,
+                      metavar='i/N',
+                      help='只处理第 i 份（共 N 份，i 从 0 开始），结果写入 OUT_DIR/shards/DATE/，全部完成后用 --merge 合并')
+    mode.add_argument('--merge',
+                      action='store_true',
+                      help='合并 OUT_DIR/shards/DATE/ 下的全部分片，生成最终的每日文件')
+    parser.add_argument('--seed-bars',
+                        action='store_true',
+                        help=f'另下载最近 {SEED_PERIOD} 的 {"/".join(SEED_INTERVALS)} 收盘价写入 {LAST_BARS_FILE}，'
+                             f'供 monitor.py --indicators 预热（每个代码多 {len(SEED_INTERVALS)} 次请求）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_arguments(argv)
+    if options.merge:
+        merge_shards(options.out_dir, options.date, options.list)
+        return
+
+    list_file = options.list
+    if not os.path.exists(list_file):
+        print(f"❌ Error: {list_file} 不存在")
+        return
+
+    codes, caps = read_codes(list_file)
+    if options.shard is not None:
+        index, count = options.shard
+        # 各分片用同一份到期日记录计算分配（多台机器时先同步 OUT_DIR/option_chain_sizes.json）
+        assignment = assign_shards(codes, count, load_chain_sizes(options.out_dir), caps)
+        codes = assignment[index]
+        print(f"🧩 Shard {index}/{count}: {len(codes)} codes")
+
+    results = collect_codes(codes, seed_bars=options.seed_bars)
+
+    if options.shard is not None:
+        save_shard(results, shard_dir(options.out_dir, options.date, *options.shard), codes, assignment)
+    else:
+        save_daily_outputs(results, options.out_dir, options.date)
 
     print("\n🎉 Done!")
 
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地行情分发：一个进程（--serve）负责抓取，多个终端（--connect）只负责显示
+
+- FeedHub：按主题（news / us / hk / crypto / status）保存最新数据，内容变化时递增序号并推送；
+- FeedServer：只监听本机的 HTTP 服务
+    GET  /snapshot  全部主题的当前数据（JSON）
+    GET  /events    SSE 流：连接后先推送每个主题的当前数据，之后只推送发生变化的主题
+    POST /refresh   请求抓取进程立即刷新（对应 W 键）
+- FeedClient：后台线程订阅 /events，断线后指数退避重连，在内存中保存各主题的最新数据。
+
+N 个显示终端只产生一份上游请求。只用标准库，SSE 按行读取，数据到达即处理。
+"""
+
+import json
+import queue
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+KEEPALIVE_INTERVAL = 15   # SSE 心跳间隔（秒），用于发现已断开的连接
+
+
+# ====== 发布端 ======
+class FeedHub:
+    def __init__(self, max_queue=256):
+        self.max_queue = max_queue          # 每个订阅者最多积压的消息数
+        self._topics = {}                   # 主题 -> (JSON 文本, 序号)
+        self._seq = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, topic, data):
+        """发布一个主题的新数据，内容与上次相同时不推送；返回是否推送"""
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            old = self._topics.get(topic)
+            if old is not None and old[0] == payload:
+                return False
+            self._seq += 1
+            self._topics[topic] = (payload, self._seq)
+            event = (topic, payload, self._seq)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # 订阅者太慢：丢掉积压的增量，改为重新发送一次全量
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(None)
+        return True
+
+    def snapshot(self):
+        """[(主题, JSON 文本, 序号)]"""
+        with self._lock:
+            return [(topic, payload, seq) for topic, (payload, seq) in self._topics.items()]
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+
+def make_handler(hub, on_refresh=None, metrics=None):
+    class FeedHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # 不输出访问日志
+
+        def _send(self, status, body=b"", content_type="application/json; charset=utf-8"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/snapshot":
+                body = "{" + ",".join(f"{json.dumps(t)}:{p}" for t, p, _ in hub.snapshot()) + "}"
+                self._send(200, body.encode("utf-8"))
+            elif self.path == "/events":
+                self._stream()
+            elif self.path == "/metrics" and metrics is not None:
+                self._send(200, metrics().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                self._send(404)
+
+        def do_POST(self):
+            if self.path == "/refresh":
+                if on_refresh:
+                    on_refresh()
+                self._send(204)
+            else:
+                self._send(404)
+
+        def _write_event(self, topic, payload, seq):
+            self.wfile.write(f"id: {seq}\nevent: {topic}\ndata: {payload}\n\n".encode("utf-8"))
+
+        def _stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            q = hub.subscribe()
+            try:
+                for event in hub.snapshot():
+                    self._write_event(*event)
+                self.wfile.flush()
+                while True:
+                    try:
+                        event = q.get(timeout=KEEPALIVE_INTERVAL)
+                    except queue.Empty:
+                        self.wfile.write(b": ping\n\n")
+                    else:
+                        # None 表示积压过多被清空，重新发送全量
+                        for e in (hub.snapshot() if event is None else [event]):
+                            self._write_event(*e)
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                hub.unsubscribe(q)
+
+    return FeedHandler
+
+
+class FeedServer:
+    def __init__(self, hub, host=DEFAULT_HOST, port=DEFAULT_PORT, on_refresh=None, metrics=None):
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.on_refresh = on_refresh        # 收到 POST /refresh 时的回调
+        self.metrics = metrics              # GET /metrics 返回的 Prometheus 文本（无参函数，可选）
+        self._server = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), make_handler(self.hub, self.on_refresh, self.metrics))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="feed-server").start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def parse_address(text):
+    """host:port / :port / port -> (host, port)"""
+    host, _, port = str(text).rpartition(":")
+    return host or DEFAULT_HOST, int(port or DEFAULT_PORT)
+
+
+# ====== 订阅端 ======
+def parse_sse(lines):
+    """把 SSE 文本行解析为 (事件名, 数据) 序列，忽略注释（心跳）"""
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+
+
+class FeedClient:
+    def __init__(self, url, on_update=None):
+        self.url = url.rstrip("/")
+        self.on_update = on_update          # 每次收到主题数据后的回调 (topic)
+        self.connected = False
+        self.last_error = None
+        self._data = {}                     # 主题 -> (版本号, 数据)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="feed-client").start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self, topic, default=None):
+        with self._lock:
+            entry = self._data.get(topic)
+        return default if entry is None else entry[1]
+
+    def version(self, topic):
+        """主题数据的本地版本号（每收到一次加一），用于判断是否需要重新转换"""
+        with self._lock:
+            entry = self._data.get(topic)
+        return 0 if entry is None else entry[0]
+
+    def request_refresh(self, timeout=2):
+        """请求抓取进程立即刷新，失败时返回 False"""
+        try:
+            urllib.request.urlopen(urllib.request.Request(f"{self.url}/refresh", data=b"", method="POST"),
+                                   timeout=timeout).close()
+            return True
+        except OSError as e:
+            self.last_error = e
+            return False
+
+    def handle_event(self, topic, data):
+        try:
+            value = json.loads(data)
+        except ValueError:
+            return
+        with self._lock:
+            version = self._data.get(topic, (0, None))[0] + 1
+            self._data[topic] = (version, value)
+        if self.on_update:
+            self.on_update(topic)
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                # 读超时大于心跳间隔：服务端无响应时断开重连
+                with urllib.request.urlopen(f"{self.url}/events", timeout=KEEPALIVE_INTERVAL * 4) as response:
+                    self.connected = True
+                    self.last_error = None
+                    backoff = 1
+                    lines = (line.decode("utf-8").rstrip("\r\n") for line in iter(response.readline, b""))
+                    for topic, data in parse_sse(lines):
+                        self.handle_event(topic, data)
+                        if self._stop.is_set():
+                            return
+            except OSError as e:
+                self.last_error = e
+            self.connected = False
+            if self.on_update:
+                self.on_update("connection")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
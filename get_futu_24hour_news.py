@@ -5,6 +5,7 @@ from datetime import datetime, timezone, timedelta
 import pytz
 import time
 import random
+from news_dedup import dedup_news
 
 URL = "https://news.futunn.com/news-site-api/main/get-flash-list"
 OUTPUT_FILE = "futu_flash_news.csv"
@@ -119,6 +120,16 @@ if __name__ == "__main__":
         print("❌ 没抓到任何新闻。")
         exit(1)
 
+    # 近似去重：同一事件的多条快讯只保留最新的一条
+    raw_count = len(news_list)
+    news_list = dedup_news(
+        news_list,
+        key=lambda item: str(item.get("id")),
+        text=lambda item: f"{item.get('title') or ''} {item.get('content') or item.get('summary') or ''}",
+    )
+    if len(news_list) < raw_count:
+        print(f"🧹 去除近似重复快讯 {raw_count - len(news_list)} 条")
+
     df = pd.DataFrame([
         {
             "id": item.get("id"),
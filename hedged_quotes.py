@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对冲请求（hedged request）：主行情源超出自身耗时分位数仍未返回时，向备用源再发一次
+
+- 记录主源最近的耗时，等待时间 = 该分位数（如 p95），没有足够样本时用默认值；
+- 主源在等待时间内返回且每个代码都有效：直接使用，不请求备用源（大多数请求只有一次上游调用）；
+  返回为空或缺少部分代码时，只向备用源请求缺的代码再合并；
+- 超时或主源出错：同时等两边，每个代码取先到的有效结果，全部代码有结果即返回，
+  不再等慢的一边（慢请求继续在后台完成，耗时仍计入统计）；
+- 两边都没有结果时抛出最后一个错误（由调用方的熔断器/缓存处理）。
+
+主源、备用源都是 代码列表 -> {代码: 行情dict} 的函数，返回格式需一致。
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait, FIRST_COMPLETED
+
+
+class LatencyTracker:
+    """最近 window 次耗时的分位数"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class HedgedFetcher:
+    def __init__(self, primary, secondary, percentile=95, min_delay=0.2, default_delay=1.0,
+                 min_samples=10, is_valid=bool, max_workers=16, name="hedged"):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile        # 主源超过自身该分位数耗时仍未返回时对冲
+        self.min_delay = min_delay          # 等待时间下限（秒），避免主源很快时频繁对冲
+        self.default_delay = default_delay  # 样本不足 min_samples 时的等待时间（秒）
+        self.min_samples = min_samples
+        self.is_valid = is_valid            # 判断单个代码的结果是否可用
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.hedged = 0                     # 发出备用请求的次数
+        self.secondary_wins = 0             # 备用源至少给出一个代码结果的请求次数（与 hedged 同为按次计数）
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-hedge")
+
+    def hedge_delay(self):
+        if len(self.latency) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, self.latency.percentile(self.percentile))
+
+    def _timed_primary(self, tickers):
+        start = time.monotonic()
+        result = self.primary(tickers)
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    def _valid(self, data):
+        return {ticker: quote for ticker, quote in (data or {}).items() if self.is_valid(quote)}
+
+    def __call__(self, tickers):
+        self.calls += 1
+        primary = self._pool.submit(self._timed_primary, tickers)
+        answers, error = {}, None
+        try:
+            answers = self._valid(primary.result(timeout=self.hedge_delay()))
+            if len(answers) >= len(tickers):
+                return answers
+            pending = set()                 # 主源很快返回但缺了部分代码：只向备用源补缺的
+        except TimeoutError:
+            pending = {primary}
+        except Exception as e:
+            error = e                       # 主源很快就出错：直接改用备用源
+            pending = set()
+
+        self.hedged += 1
+        secondary = self._pool.submit(self.secondary, [t for t in tickers if t not in answers])
+        pending.add(secondary)
+        secondary_won = False
+        while pending and len(answers) < len(tickers):
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    data = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                for ticker, quote in self._valid(data).items():
+                    if ticker not in answers:
+                        answers[ticker] = quote
+                        secondary_won = secondary_won or future is secondary
+        self.secondary_wins += secondary_won
+        if not answers and error is not None:
+            raise error
+        return answers
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中实时指标：把轮询到的价格聚合成 1m / 5m OHLC bar，并增量更新 RSI / MACD / MA
+
+- 每个 tick 只更新当前 bar（O(1)）；bar 结束时把收盘价推进一次指标状态（O(1)）；
+- 两个 tick 之间没有 tick 的周期（轮询间隔比 bar 长时）用上一个收盘价补齐平 bar，
+  指标始终按等间隔的 bar 计算；间隔超过 MAX_FILL_BARS 视为休市，不补；
+- 显示的是“假设当前 bar 以最新价收盘”的指标值（peek，不改变状态）；
+- 启动时用 daily_stock_option_data.py --seed-bars 保存的最近收盘价（data2/last_bars.json）
+  预热指标，开盘第一个 tick 就有值，不需要再下载历史数据；
+  只使用与 bar 周期相同的收盘价（1m 用 1m、5m 用 5m），不混用其他周期。
+
+参数与 calc_indicators 一致：RSI(14, Wilder 平滑)、MACD(12, 26, 9)、MA5 / MA20。
+"""
+
+import json
+import math
+from collections import deque
+
+import numpy as np
+
+BAR_INTERVALS = {"1m": 60, "5m": 300}
+BAR_HISTORY = 120                     # 每个代码每个周期保留的已完成 bar 数
+MAX_FILL_BARS = 30                    # 最多补齐多少个没有 tick 的 bar，更长的间隔视为休市
+
+
+# ====== 增量指标（update 推进状态，peek 只计算不推进） ======
+class EMA:
+    """指数移动平均，首个值作为起点（与 pandas ewm(adjust=False) 一致）"""
+
+    def __init__(self, period):
+        self.alpha = 2 / (period + 1)
+        self.value = None
+
+    def peek(self, x):
+        return x if self.value is None else self.value + self.alpha * (x - self.value)
+
+    def update(self, x):
+        self.value = self.peek(x)
+        return self.value
+
+
+class SMA:
+    def __init__(self, period):
+        self.period = period
+        self._window = deque(maxlen=period)
+        self._sum = 0.0
+
+    def peek(self, x):
+        if len(self._window) < self.period - 1:
+            return None
+        dropped = self._window[0] if len(self._window) == self.period else 0.0
+        return (self._sum - dropped + x) / self.period
+
+    def update(self, x):
+        value = self.peek(x)
+        if len(self._window) == self.period:
+            self._sum -= self._window[0]
+        self._window.append(x)
+        self._sum += x
+        return value
+
+
+class RSI:
+    """Wilder 平滑的 RSI"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self._prev = None
+        self._avg_gain = None
+        self._avg_loss = None
+        self._count = 0                 # 已推进的涨跌次数
+
+    def _step(self, x):
+        if self._prev is None:
+            return None, None, 0
+        change = x - self._prev
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self._avg_gain is None:
+            return gain, loss, 1
+        return (self._avg_gain + (gain - self._avg_gain) / self.period,
+                self._avg_loss + (loss - self._avg_loss) / self.period,
+                self._count + 1)
+
+    @staticmethod
+    def _value(avg_gain, avg_loss):
+        if avg_loss == 0:
+            return 50.0 if avg_gain == 0 else 100.0
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+    def peek(self, x):
+        avg_gain, avg_loss, count = self._step(x)
+        if count < self.period:
+            return None
+        return self._value(avg_gain, avg_loss)
+
+    def update(self, x):
+        avg_gain, avg_loss, count = self._step(x)
+        self._prev = x
+        if avg_gain is not None:
+            self._avg_gain, self._avg_loss, self._count = avg_gain, avg_loss, count
+        return None if count < self.period else self._value(avg_gain, avg_loss)
+
+
+class MACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.slow_period = slow
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+        self._count = 0
+
+    def peek(self, x):
+        """返回 (MACD, signal, hist)，数据不足时为 None"""
+        if self._count + 1 < self.slow_period:
+            return None
+        macd = self._fast.peek(x) - self._slow.peek(x)
+        signal = self._signal.peek(macd)
+        return macd, signal, macd - signal
+
+    def update(self, x):
+        self._count += 1
+        macd = self._fast.update(x) - self._slow.update(x)
+        signal = self._signal.update(macd)
+        return (macd, signal, macd - signal) if self._count >= self.slow_period else None
+
+
+class IndicatorSet:
+    def __init__(self):
+        self.rsi = RSI(14)
+        self.macd = MACD(12, 26, 9)
+        self.ma5 = SMA(5)
+        self.ma20 = SMA(20)
+
+    def update(self, close):
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.ma5.update(close)
+        self.ma20.update(close)
+
+    def peek(self, close):
+        macd = self.macd.peek(close)
+        return {
+            "RSI": self.rsi.peek(close),
+            "MACD": macd[0] if macd else None,
+            "MACD_signal": macd[1] if macd else None,
+            "MACD_hist": macd[2] if macd else None,
+            "MA5": self.ma5.peek(close),
+            "MA20": self.ma20.peek(close),
+        }
+
+
+# ====== OHLC bar ======
+class BarSeries:
+    """单个代码在一个周期上的 bar 序列与指标"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.bar = None                          # 当前 bar: [开始时间, 开, 高, 低, 收]
+        self.bars = deque(maxlen=BAR_HISTORY)    # 已完成的 bar
+        self.indicators = IndicatorSet()
+
+    def seed(self, closes):
+        for close in closes:
+            self.indicators.update(close)
+
+    def add_tick(self, ts, price):
+        start = ts - ts % self.interval
+        bar = self.bar
+        if bar is None or start > bar[0]:
+            if bar is not None:
+                self.bars.append(tuple(bar))
+                self.indicators.update(bar[4])
+                # 中间没有 tick 的周期：以上一个收盘价补平 bar
+                missing = int((start - bar[0]) // self.interval) - 1
+                if missing <= MAX_FILL_BARS:
+                    close = bar[4]
+                    for i in range(1, missing + 1):
+                        self.bars.append((bar[0] + i * self.interval, close, close, close, close))
+                        self.indicators.update(close)
+            self.bar = [start, price, price, price, price]
+        elif start == bar[0]:
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+        # 比当前 bar 更早的 tick（乱序到达）直接忽略
+
+    def values(self):
+        return self.indicators.peek(self.bar[4]) if self.bar else {}
+
+
+class LiveIndicators:
+    """所有代码的 1m / 5m bar 与指标"""
+
+    def __init__(self, intervals=BAR_INTERVALS):
+        self.intervals = dict(intervals)
+        self._series = {}                        # (代码, 周期名) -> BarSeries
+        self._seeds = {}                         # (代码, 周期名) -> 预热用的收盘价
+
+    def load_seeds(self, path):
+        """读取日线脚本保存的最近收盘价（只取本对象的周期），返回可预热的代码数（文件不存在返回 0）"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return 0
+        seeded = set()
+        for ticker, by_interval in stored.items():
+            for interval in self.intervals:
+                closes = by_interval.get(interval)
+                if closes:
+                    self._seeds[(ticker.upper(), interval)] = [float(c) for c in closes if c is not None]
+                    seeded.add(ticker.upper())
+        return len(seeded)
+
+    def series(self, ticker, interval):
+        key = (ticker, interval)
+        series = self._series.get(key)
+        if series is None:
+            series = BarSeries(self.intervals[interval])
+            series.seed(self._seeds.get(key, ()))
+            self._series[key] = series
+        return series
+
+    def add_tick(self, ts, ticker, price):
+        for interval in self.intervals:
+            self.series(ticker, interval).add_tick(ts, price)
+
+    def update_many(self, ts, tickers, prices):
+        """同一时刻一批代码的价格（缺失价格跳过）"""
+        for ticker, price in zip(tickers, prices):
+            if price is not None and not math.isnan(price):
+                self.add_tick(ts, ticker, float(price))
+
+    def columns(self, tickers, interval="5m"):
+        """按代码顺序返回数值列 {RSI, MACD(柱), MA20}，没有数据为 NaN"""
+        rsi, hist, ma20 = [], [], []
+        for ticker in tickers:
+            series = self._series.get((ticker, interval))
+            values = series.values() if series else {}
+            rsi.append(values.get("RSI"))
+            hist.append(values.get("MACD_hist"))
+            ma20.append(values.get("MA20"))
+        as_array = lambda v: np.array([np.nan if x is None else x for x in v], dtype=float)
+        return {"RSI": as_array(rsi), "MACD": as_array(hist), "MA20": as_array(ma20)}
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+美股 / 港股交易日历与按时段调度的轮询器
+
+- 美股：NYSE 假日按规则推算（含复活节、顺延规则），半日市 13:00 收盘；
+  时段分为 盘前 / 盘中 / 盘后 / 隔夜 / 休市。
+- 港股：固定日期假日按规则推算，农历相关假日使用 HK_LUNAR_HOLIDAYS 表（需每年补充）；
+  时段分为 开市前竞价 / 上午 / 午休 / 下午 / 休市，半日市只有上午。
+- PollingScheduler：每个数据源按所属市场当前时段决定刷新间隔，休市时暂停，
+  并在下一次开市时立即触发，不会错过开盘。
+"""
+
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import pytz
+
+NY_TZ = pytz.timezone('America/New_York')
+HK_TZ = pytz.timezone('Asia/Hong_Kong')
+
+# ====== 港股农历相关假日（香港公众假期，周末顺延后的交易所休市日） ======
+HK_LUNAR_HOLIDAYS = {
+    2025: ["2025-01-29", "2025-01-30", "2025-01-31", "2025-04-04", "2025-05-05",
+           "2025-10-07", "2025-10-29"],
+    2026: ["2026-02-17", "2026-02-18", "2026-02-19", "2026-04-06", "2026-04-07", "2026-05-25",
+           "2026-06-19", "2026-10-19"],
+    2027: ["2027-02-08", "2027-02-09", "2027-04-05", "2027-05-13", "2027-06-09",
+           "2027-09-16", "2027-10-08"],
+}
+# 港股半日市（农历除夕，若为交易日）
+HK_LUNAR_HALF_DAYS = {
+    2025: ["2025-01-28"],
+    2026: ["2026-02-16"],
+    2027: ["2027-02-05"],
+}
+
+
+# ====== 日期工具 ======
+def easter_sunday(year):
+    """复活节日期（公历，Anonymous Gregorian 算法）"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year, month, weekday, n):
+    """某月第 n 个星期几（n=-1 表示最后一个）"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(d):
+    """美股顺延规则：周六提前到周五，周日顺延到周一"""
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+# ====== 美股日历 ======
+@lru_cache(maxsize=16)
+def us_holidays(year):
+    days = set()
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:  # 元旦逢周六不提前到上一年
+        days.add(_observed(new_year))
+    days.add(nth_weekday(year, 1, 0, 3))             # 马丁路德金纪念日
+    days.add(nth_weekday(year, 2, 0, 3))             # 总统日
+    days.add(easter_sunday(year) - timedelta(days=2))  # 耶稣受难日
+    days.add(nth_weekday(year, 5, 0, -1))            # 阵亡将士纪念日
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))       # 六月节
+    days.add(_observed(date(year, 7, 4)))            # 独立日
+    days.add(nth_weekday(year, 9, 0, 1))             # 劳动节
+    days.add(nth_weekday(year, 11, 3, 4))            # 感恩节
+    days.add(_observed(date(year, 12, 25)))          # 圣诞节
+    return frozenset(days)
+
+
+@lru_cache(maxsize=16)
+def us_half_days(year):
+    """13:00 提前收盘的交易日"""
+    days = {nth_weekday(year, 11, 3, 4) + timedelta(days=1)}  # 感恩节次日
+    for d in (date(year, 7, 3), date(year, 12, 24)):
+        if d.weekday() < 5:
+            days.add(d)
+    return frozenset(d for d in days if d not in us_holidays(year))
+
+
+def us_trading_day(d):
+    return d.weekday() < 5 and d not in us_holidays(d.year)
+
+
+def us_session(now=None):
+    """
+    当前美股时段：盘前 / 盘中 / 盘后 / 隔夜 / 休市
+    隔夜盘为下一个交易日前一晚 20:00 至当日 04:00。
+    """
+    ny = (now or datetime.now(pytz.utc)).astimezone(NY_TZ)
+    d = ny.date()
+    minutes = ny.hour * 60 + ny.minute
+    if minutes < 4 * 60:
+        return "隔夜" if us_trading_day(d) else "休市"
+    if not us_trading_day(d):
+        return "隔夜" if minutes >= 20 * 60 and us_trading_day(d + timedelta(days=1)) else "休市"
+    half = d in us_half_days(d.year)
+    close = 13 * 60 if half else 16 * 60
+    post_close = 17 * 60 if half else 20 * 60
+    if minutes < 9 * 60 + 30:
+        return "盘前"
+    if minutes < close:
+        return "盘中"
+    if minutes < post_close:
+        return "盘后"
+    if minutes >= 20 * 60 and us_trading_day(d + timedelta(days=1)):
+        return "隔夜"
+    return "休市"
+
+
+# ====== 港股日历 ======
+@lru_cache(maxsize=16)
+def hk_holidays(year):
+    def sunday_shift(d):
+        """香港规则：假日逢周日顺延到周一，逢周六不补假"""
+        return d + timedelta(days=1) if d.weekday() == 6 else d
+
+    easter = easter_sunday(year)
+    christmas = date(year, 12, 25)
+    boxing_day = christmas + timedelta(days=1)
+    while boxing_day.weekday() >= 5:            # 圣诞节后第一个工作日
+        boxing_day += timedelta(days=1)
+    days = {
+        sunday_shift(date(year, 1, 1)),         # 元旦
+        easter - timedelta(days=2),             # 耶稣受难日
+        easter + timedelta(days=1),             # 复活节星期一
+        sunday_shift(date(year, 5, 1)),         # 劳动节
+        sunday_shift(date(year, 7, 1)),         # 香港特区成立纪念日
+        sunday_shift(date(year, 10, 1)),        # 国庆日
+        christmas,
+        boxing_day,
+    }
+    if christmas.weekday() == 6:
+        days.add(christmas + timedelta(days=2))
+    days.update(date.fromisoformat(s) for s in HK_LUNAR_HOLIDAYS.get(year, []))
+    return frozenset(d for d in days if d.weekday() < 5)
+
+
+@lru_cache(maxsize=16)
+def hk_half_days(year):
+    """只有上午交易的日子：平安夜、除夕、农历除夕"""
+    days = {date(year, 12, 24), date(year, 12, 31)}
+    days.update(date.fromisoformat(s) for s in HK_LUNAR_HALF_DAYS.get(year, []))
+    return frozenset(d for d in days if d.weekday() < 5 and d not in hk_holidays(year))
+
+
+def hk_trading_day(d):
+    return d.weekday() < 5 and d not in hk_holidays(d.year)
+
+
+def hk_session(now=None):
+    """当前港股时段：竞价 / 上午 / 午休 / 下午 / 休市"""
+    hk = (now or datetime.now(pytz.utc)).astimezone(HK_TZ)
+    d = hk.date()
+    if not hk_trading_day(d):
+        return "休市"
+    minutes = hk.hour * 60 + hk.minute
+    half = d in hk_half_days(d.year)
+    if 9 * 60 <= minutes < 9 * 60 + 30:
+        return "竞价"
+    if 9 * 60 + 30 <= minutes < 12 * 60:
+        return "上午"
+    if half:
+        return "休市"
+    if 12 * 60 <= minutes < 13 * 60:
+        return "午休"
+    if 13 * 60 <= minutes < 16 * 60 + 10:
+        return "下午"
+    return "休市"
+
+
+MARKET_SESSIONS = {
+    "us": us_session,
+    "hk": hk_session,
+}
+
+_session_starts = {}   # 市场 -> (时段, 开始时间戳, 上次确认时间戳)
+
+
+def session_start(market, now_ts=None):
+    """
+    当前时段开始的时间戳（按分钟向前查找，最多 5 天）。
+    同一时段内连续调用（间隔不超过 1 分钟）直接使用上次的结果。
+    """
+    now_ts = time.time() if now_ts is None else now_ts
+    session = MARKET_SESSIONS[market]
+    current = session(datetime.fromtimestamp(now_ts, pytz.utc))
+    cached = _session_starts.get(market)
+    if cached and cached[0] == current and cached[1] <= now_ts <= cached[2] + 60:
+        _session_starts[market] = (current, cached[1], now_ts)
+        return cached[1]
+    t = (int(now_ts) // 60) * 60
+    limit = now_ts - 5 * 86400
+    while t > limit and session(datetime.fromtimestamp(t - 60, pytz.utc)) == current:
+        t -= 60
+    _session_starts[market] = (current, t, now_ts)
+    return t
+
+
+# ====== 按时段调度 ======
+class PollingScheduler:
+    """
+    cadences: {源名称: (市场, {时段: 间隔秒数或 None})}
+    间隔为 None 表示该时段暂停；表中没有的时段使用 "default"。
+    市场为 None 表示与交易时段无关（固定使用 "default"）。
+    """
+
+    def __init__(self, cadences):
+        self.cadences = cadences
+        self._last_run = {}
+        self._next_change = {}   # 市场 -> (查找起点, 下一次时段变化时刻)
+
+    def session(self, market, now=None):
+        return MARKET_SESSIONS[market](now) if market else None
+
+    def interval(self, source, now=None):
+        market, table = self.cadences[source]
+        return table.get(self.session(market, now), table.get("default"))
+
+    def next_session_change(self, market, now_ts):
+        """下一次时段变化的时间戳（按分钟向后查找，结果缓存到变化发生为止）"""
+        cached = self._next_change.get(market)
+        if cached and cached[0] <= now_ts < cached[1]:
+            return cached[1]
+        current = self.session(market, datetime.fromtimestamp(now_ts, pytz.utc))
+        t = (int(now_ts) // 60 + 1) * 60
+        limit = now_ts + 5 * 86400
+        while t < limit and self.session(market, datetime.fromtimestamp(t, pytz.utc)) == current:
+            t += 60
+        self._next_change[market] = (now_ts, t)
+        return t
+
+    def next_due(self, source, now_ts=None):
+        """该源下一次应刷新的时间戳"""
+        now_ts = time.time() if now_ts is None else now_ts
+        last = self._last_run.get(source)
+        if last is None:
+            return now_ts
+        market, _ = self.cadences[source]
+        interval = self.interval(source, datetime.fromtimestamp(now_ts, pytz.utc))
+        due = last + interval if interval is not None else float('inf')
+        if market:
+            # 时段切换（例如开盘）时立即刷新一次
+            change = self.next_session_change(market, last)
+            due = min(due, change)
+        return due
+
+    def is_due(self, source, now_ts=None):
+        now_ts = time.time() if now_ts is None else now_ts
+        return self.next_due(source, now_ts) <= now_ts
+
+    def since(self, source, now_ts=None):
+        """距该源上次刷新的秒数（从未刷新返回 inf）"""
+        now_ts = time.time() if now_ts is None else now_ts
+        last = self._last_run.get(source)
+        return float('inf') if last is None else now_ts - last
+
+    def mark(self, source, now_ts=None):
+        self._last_run[source] = time.time() if now_ts is None else now_ts
+
+    def seconds_until_next(self, now_ts=None):
+        """距离最近一个源到期的秒数"""
+        now_ts = time.time() if now_ts is None else now_ts
+        if not self.cadences:
+            return float('inf')
+        return max(0.0, min(self.next_due(s, now_ts) for s in self.cadences) - now_ts)
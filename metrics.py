@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标：计数器、数值、耗时直方图，可输出为 Prometheus 文本格式
+
+- inc / set / observe 按 (指标名, 标签) 记录，可被多个线程同时调用；
+- set_counter 用于把其他模块自己维护的累计值（如缓存命中次数）同步进来；
+- 直方图按固定分桶累计，quantile 按桶内线性插值估算分位数
+  （与 Prometheus 的 histogram_quantile 相同的估算方式）；
+- render_prometheus 输出 text exposition format（0.0.4），
+  write_prometheus 原子写入文件，可由 node_exporter 的 textfile collector 采集。
+"""
+
+import os
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认分桶（秒）：覆盖本地渲染（毫秒级）到上游超时（10 秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self):
+        other = Histogram(self.buckets)
+        other.counts, other.sum, other.count = list(self.counts), self.sum, self.count
+        return other
+
+    def quantile(self, q):
+        """估算分位数（没有样本返回 None；落在 +Inf 桶时返回最大分桶上限）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if cumulative + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+
+def _label_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    def __init__(self, descriptions=None):
+        self.descriptions = dict(descriptions or {})   # 指标名 -> 说明（输出为 # HELP）
+        self._kinds = {}                                # 指标名 -> counter / gauge / histogram
+        self._values = {}                               # (指标名, 标签) -> 数值或 Histogram
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._kinds.setdefault(name, "counter")
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_counter(self, name, value, **labels):
+        """同步一个在别处累计的计数值"""
+        with self._lock:
+            self._kinds.setdefault(name, "counter")
+            self._values[self._key(name, labels)] = value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._kinds.setdefault(name, "gauge")
+            self._values[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._kinds.setdefault(name, "histogram")
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """with metrics.timer('x_seconds', source='y'): ... 记录耗时（异常时也记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        """计数器/数值的当前值，直方图返回 Histogram 的快照（没有记录返回 None）"""
+        with self._lock:
+            value = self._values.get(self._key(name, labels))
+            return value.copy() if isinstance(value, Histogram) else value
+
+    def series(self, name):
+        """某个指标的全部 {标签: 值}（直方图为锁内复制的快照）"""
+        with self._lock:
+            return {labels: v.copy() if isinstance(v, Histogram) else v
+                    for (n, labels), v in self._values.items() if n == name}
+
+    def render_prometheus(self):
+        with self._lock:
+            # 直方图在锁内复制（observe 会同时修改），保证各分桶与 _count / _sum 一致
+            items = sorted(((key, value.copy() if isinstance(value, Histogram) else value)
+                            for key, value in self._values.items()), key=lambda item: item[0])
+            kinds = dict(self._kinds)
+        lines, current = [], None
+        for (name, labels), value in items:
+            if name != current:
+                current = name
+                if name in self.descriptions:
+                    lines.append(f"# HELP {name} {self.descriptions[name]}")
+                lines.append(f"# TYPE {name} {kinds[name]}")
+            if isinstance(value, Histogram):
+                cumulative = 0
+                for bound, n in zip(value.buckets + (float("inf"),), value.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    lines.append(f"{name}_bucket{_label_text(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_number(value.sum)}")
+                lines.append(f"{name}_count{_label_text(labels)} {value.count}")
+            else:
+                lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """原子写入文本文件（先写临时文件再改名，采集端不会读到写了一半的文件）"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
@@ -1,47 +1,174 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
-import pandas as pd
+import numpy as np
 import time
 import os
 import sys
 import threading
 import pytz
 import json
-import rea
-import pickle
+import re
 import argparse
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime, timezone
-from yahooquery import Ticker
-#from googletrans import Translator
-from typing import List, Dict, Any
+from typing import List, Dict
+from urllib.parse import urlsplit
+from news_dedup import NearDuplicateFilter
+from crypto_stream import CryptoPriceStream, poll_gate_prices, pair_to_symbol, GATE_WS_URL
+from watchlist import WatchlistCache, parse_cost_shares
+from quote_cache import QuoteCache, split_by_length
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED
+from market_calendar import PollingScheduler, us_session, hk_session, session_start
+from render import ScreenRenderer, display_width, truncate_width, pad_width
+from translation_cache import TranslationCache, NewsTranslator, get_translation_backend
+from live_indicators import LiveIndicators, BAR_INTERVALS
+from tick_store import TickRecorder, DEFAULT_CAPACITY as TICK_CAPACITY
+from alerts import AlertEngine, AlertNotifier
+from positions import PositionBook, MARKET_NAMES
+from quote_table import QuoteTable
+from hedged_quotes import HedgedFetcher
+from metrics import MetricsRegistry
+from fanout import FeedHub, FeedServer, FeedClient, parse_address, DEFAULT_HOST, DEFAULT_PORT
+
+# ====== 各数据源的请求超时（秒） ======
+SOURCE_DEADLINES = {
+    'crypto': 5,
+    'us': 10,
+    'hk': 5,
+    'news': 10,
+}
 
-# ====== US quotes 缓存（全局） ======
-_stock_cache: Dict[str, Dict[str, Any]] = {}
-_CACHE_TTL = 30  # 秒
+# ====== 运行指标（--metrics 显示在画面底部，--metrics-file / --serve 的 /metrics 输出 Prometheus 文本，见 metrics.py） ======
+METRIC_DESCRIPTIONS = {
+    'monitor_upstream_request_seconds': '单个上游请求的耗时（秒）',
+    'monitor_upstream_bytes_total': '上游响应正文字节数',
+    'monitor_upstream_errors_total': '上游请求失败次数（异常或 HTTP 4xx/5xx）',
+    'monitor_refresh_seconds': '一个数据源一次刷新的总耗时（秒）',
+    'monitor_refresh_errors_total': '数据源刷新失败次数（不含熔断快速失败）',
+    'monitor_cache_requests_total': '行情/翻译缓存的查询次数（按代码/条目计）',
+    'monitor_cache_retries_total': '行情缓存的重试次数（含失败后二分）',
+    'monitor_translation_errors_total': '新闻翻译失败次数（按批次计）',
+    'monitor_hedged_requests_total': '--hedge 发出备用请求的次数',
+    'monitor_hedge_secondary_wins_total': '--hedge 备用源给出了结果的请求次数',
+    'monitor_breaker_open': '熔断器是否打开（1=打开或半开）',
+    'monitor_render_seconds': '生成并输出一帧画面的耗时（秒）',
+}
+_metrics = MetricsRegistry(METRIC_DESCRIPTIONS)
+METRICS_WRITE_INTERVAL = 10       # --metrics-file 的写入间隔（秒），退出时也写入
+UPSTREAM_NAMES = {                # 主机名 -> 指标中的上游名称
+    'api.gateio.ws': 'Gate.io',
+    'qt.gtimg.cn': '腾讯',
+    'static.mktnews.net': '英文新闻',
+    'www.cls.cn': '财联社',
+}
 
-def get_us_quotes(tickers: List[str]) -> Dict[str, dict]:
-    """带 30 秒 TTL 的 Yahoo quotes 获取（全局缓存）"""
-    now = time.time()
-    to_fetch = [t for t in tickers if t not in _stock_cache or now - _stock_cache[t]['ts'] > _CACHE_TTL]
-    if to_fetch:
+# ====== 上游 HTTP 请求入口（--capture / --replay 时替换为录制/回放替身，见 replay.py） ======
+# requests / yahooquery / pandas 导入较慢，推迟到第一次请求时（在抓取线程中）再导入，启动时先显示画面
+def _requests_get(url, **kwargs):
+    import requests
+    return requests.get(url, **kwargs)
+
+_http_backend = _requests_get
+_upstream_tap = None
+
+def http_get(url, **kwargs):
+    """所有上游 HTTP 请求经过这里：记录耗时、响应字节数和失败次数"""
+    host = urlsplit(url).hostname or url
+    source = UPSTREAM_NAMES.get(host, host)
+    with _metrics.timer('monitor_upstream_request_seconds', source=source):
         try:
-            tk = Ticker(to_fetch, params={"overnightPrice": "true"})
-            fetched = tk.quotes if isinstance(tk.quotes, dict) else {}
-        except Exception as e:
-            print(f"❌ Yahoo API 获取失败: {e}")
-            fetched = {}
-        for t in to_fetch:
-            _stock_cache[t] = {'ts': now, 'data': fetched.get(t, {})}
-    return {t: _stock_cache.get(t, {}).get('data', {}) for t in tickers}
+            response = _http_backend(url, **kwargs)
+        except Exception:
+            _metrics.inc('monitor_upstream_errors_total', source=source)
+            raise
+    _metrics.inc('monitor_upstream_bytes_total', len(response.content), source=source)
+    if response.status_code >= 400:
+        _metrics.inc('monitor_upstream_errors_total', source=source)
+    return response
+
+# ====== 每个上游一个熔断器：连续失败后快速失败，画面继续显示最后一次成功的数据（见 circuit_breaker.py） ======
+# 单次调用超出预算也记为失败，上游变慢时同样会被熔断
+SOURCE_BREAKERS = {
+    'crypto': CircuitBreaker('Gate.io', budget=SOURCE_DEADLINES['crypto']),
+    'us': CircuitBreaker('Yahoo', budget=SOURCE_DEADLINES['us']),
+    'us_alt': CircuitBreaker('腾讯美股', budget=SOURCE_DEADLINES['us']),
+    'hk': CircuitBreaker('腾讯港股', budget=SOURCE_DEADLINES['hk']),
+    'news_en': CircuitBreaker('英文新闻', budget=SOURCE_DEADLINES['news']),
+    'news_cn': CircuitBreaker('财联社', budget=SOURCE_DEADLINES['news']),
+}
+
+# ====== US quotes 缓存（全局，stale-while-revalidate，见 quote_cache.py） ======
+# 各时段的行情缓存有效期（秒）：盘中变化快，休市时几乎不变
+SESSION_QUOTE_TTL = {
+    "盘中": 15,
+    "盘前": 30,
+    "盘后": 30,
+    "隔夜": 120,
+    "休市": 1800,
+}
+QUOTE_NEGATIVE_TTL = 10  # 拉取失败后的重试间隔（秒），期间继续显示旧数据
+YAHOO_CHUNK_SIZE = 50    # 每个 Yahoo 请求的代码数（URL 长度与单次耗时的折中）
+YAHOO_MAX_WORKERS = 8    # 并发请求数
+
+def fetch_yahoo_quotes(tickers: List[str]) -> Dict[str, dict]:
+    """一次 Yahoo quotes 请求"""
+    from yahooquery import Ticker
+    with _metrics.timer('monitor_upstream_request_seconds', source='Yahoo'):
+        try:
+            tk = Ticker(tickers, params={"overnightPrice": "true"}, timeout=SOURCE_DEADLINES['us'])
+            # yahooquery 用自己的会话（每个 Ticker 一个），不经过 http_get：包装会话的 get 统计响应字节数
+            session = getattr(tk, 'session', None)
+            if session is not None:
+                session.get = counting_get(session.get)
+            quotes = tk.quotes  # 每次读取 quotes 属性都会发起请求，只读一次
+        except Exception:
+            _metrics.inc('monitor_upstream_errors_total', source='Yahoo')
+            raise
+    if not isinstance(quotes, dict):
+        # 出错时 yahooquery 返回错误信息字符串而不是抛异常
+        _metrics.inc('monitor_upstream_errors_total', source='Yahoo')
+        return {}
+    return quotes
+
+def counting_get(get):
+    def wrapper(*args, **kwargs):
+        response = get(*args, **kwargs)
+        content = getattr(response, 'content', None)   # 异步会话返回 Future，不统计
+        if content is not None:
+            _metrics.inc('monitor_upstream_bytes_total', len(content), source='Yahoo')
+        return response
+    return wrapper
+
+_stock_cache = QuoteCache(fetch_yahoo_quotes, negative_ttl=QUOTE_NEGATIVE_TTL,
+                          chunk_size=YAHOO_CHUNK_SIZE, max_workers=YAHOO_MAX_WORKERS, name="Yahoo",
+                          breaker=SOURCE_BREAKERS['us'], on_refresh=lambda symbols: quotes_refreshed('us'))
+
+def us_quote_ttl(now=None):
+    """按当前美股时段选择缓存有效期；本时段开始之前取到的数据一律过期（收盘后第一次刷新取到收盘价）"""
+    now = time.time() if now is None else now
+    return min(SESSION_QUOTE_TTL.get(us_session(), 30), now - session_start('us', now))
+
+def get_us_quotes(tickers: List[str]) -> Dict[str, dict]:
+    """按时段 TTL 获取 Yahoo quotes：过期数据先返回再后台刷新，失败不清空旧数据"""
+    return _stock_cache.get_many(tickers, us_quote_ttl())
 
 
 # ====== 刷新时间设置（秒） ======
 CRYPTO_REFRESH_INTERVAL = 60      # 虚拟币刷新间隔（60秒）
 STOCK_REFRESH_INTERVAL = 100      # 美股刷新间隔（10分钟=600秒）
 NEWS_REFRESH_INTERVAL = 300       # 新闻刷新间隔（5分钟=300秒）
-MAIN_LOOP_INTERVAL = 60           # 主循环间隔（60秒）
+MAIN_LOOP_INTERVAL = 60           # 主循环兜底唤醒间隔 / 空数据重试间隔（60秒）
+
+# ====== 各数据源按市场时段的刷新间隔（秒），None=该时段暂停，时段切换（如开盘）时立即刷新 ======
+SOURCE_CADENCE = {
+    'us': ('us', {'盘中': STOCK_REFRESH_INTERVAL, '盘前': 300, '盘后': 300, '隔夜': 900, '休市': None}),
+    'hk': ('hk', {'上午': STOCK_REFRESH_INTERVAL, '下午': STOCK_REFRESH_INTERVAL, '竞价': 300,
+                  '午休': None, '休市': None}),
+    'news': ('us', {'休市': 1800, 'default': NEWS_REFRESH_INTERVAL}),
+}
 
 # ====== 虚拟币持仓（成本价与持仓量，size可为杠杆后实际仓位） ======
 crypto_positions = {
@@ -54,17 +181,33 @@ crypto_positions_spec = {
     "ETHUSDT": "0.0",
     "BNBUSDT": "0*0"
 }
-_tmp = {}
-for _k, _v in crypto_positions_spec.items():
-    if isinstance(_v, str) and '*' in _v:
-        _p = _v.split('*')
-        if len(_p) >= 2:
-            try:
-                _tmp[_k] = {"cost": float(_p[0]), "size": float(_p[1])}
-            except Exception:
-                pass
-if _tmp:
-    crypto_positions.update(_tmp)
+
+# ====== 持仓簿（美股/港股/虚拟币盈亏与汇总，见 positions.py） ======
+_position_book = PositionBook()
+
+def load_crypto_positions():
+    """把虚拟币持仓载入持仓簿（crypto_positions_spec 中能解析的 成本价*数量 优先）"""
+    positions = {sym: (p.get("cost", 0.0), p.get("size", 0.0)) for sym, p in crypto_positions.items()}
+    for sym, spec in crypto_positions_spec.items():
+        parsed = parse_cost_shares(spec) if isinstance(spec, str) else None
+        if parsed:
+            positions[sym] = (parsed['cost_price'], parsed['shares'])
+    _position_book.sync('crypto', positions)
+
+def sync_stock_positions(market, cost_and_shares):
+    """stocks.txt 中的持仓同步到持仓簿（没有变化的持仓不改动）"""
+    _position_book.sync(market, {t: (p['cost_price'], p['shares']) for t, p in cost_and_shares.items()})
+
+def position_summary_line():
+    """持仓汇总行：各市场的盈亏、多头/空头敞口，按各自计价货币显示，不跨币种相加（没有持仓返回空字符串）"""
+    if not len(_position_book):
+        return ""
+    parts = [f"{MARKET_NAMES[m]} 盈亏 {s['pnl']:+,.2f} {s['currency']} 多 {s['long']:,.0f} 空 {s['short']:,.0f}"
+             for m, s in _position_book.summary().items()]
+    return "💼 持仓 " + " | ".join(parts)
+
+# ====== 监控的虚拟币交易对（Gate.io 格式） ======
+CRYPTO_PAIRS = ["BTC_USDT", "ETH_USDT", "BNB_USDT"]
 
 # ====== 美股文件路径 ======
 STOCK_FILE = "stocks.txt"
@@ -73,57 +216,159 @@ STOCK_FILE = "stocks.txt"
 NEWS_API_URL_EN = "https://static.mktnews.net/json/flash/en.json"  # 英文新闻源
 NEWS_API_URL_CN = "https://www.cls.cn/nodeapi/telegraphList"       # 财联社中文新闻源
 
-# ====== 新闻翻译缓存文件 ======
-NEWS_CACHE_FILE = "news_translation_cache.pkl"
+# ====== 新闻翻译缓存文件（SQLite，有界 LRU） ======
+NEWS_CACHE_FILE = "news_translation_cache.sqlite"
+NEWS_CACHE_LEGACY_FILE = "news_translation_cache.pkl"   # 旧版 pickle 缓存，首次启动时自动迁移
+NEWS_CACHE_CAPACITY = 5000
+
+# ====== 新闻增量抓取状态（每个源一个游标 + 有界环形缓冲，按时间倒序） ======
+NEWS_RING_SIZE = 100          # 每个源在内存中保留的最近新闻条数
+NEWS_DELTA_PAGE_SIZE = 20     # 已有游标时，财联社每次只请求的条数
+_news_state = {
+    'en': {'etag': None, 'last_modified': None, 'cursor': 0.0, 'ring': deque(maxlen=NEWS_RING_SIZE)},
+    'cn': {'cursor': 0.0, 'ring': deque(maxlen=NEWS_RING_SIZE)},
+}
+
+# ====== 新闻近似去重（跨来源、跨刷新，6小时滚动窗口） ======
+NEWS_DEDUP_WINDOW = 6 * 3600
+_news_dedup = NearDuplicateFilter(window_seconds=NEWS_DEDUP_WINDOW)
 
 # ====== 控制退出和手动刷新 ======
+# 按键、数据到达、定时器都通过 _wakeup 唤醒主循环，空闲时不轮询
+_wakeup = threading.Event()
+_key_pressed = threading.Event()
+_crypto_pushed = threading.Event()   # 上一帧之后收到过虚拟币推送
+# 行情缓存后台刷新完成的板块（'us' / 'hk'）：主循环从缓存重新生成该板块，不等下一次定时刷新
+_quotes_refreshed = set()
+RENDER_MIN_INTERVAL = 0.2         # 推送行情触发重绘的最小间隔（秒），按键不受此限制
+WATCHLIST_POLL_INTERVAL = 2       # stocks.txt / 提醒规则文件的检查间隔（秒，在后台线程中检查，有变化才唤醒主循环）
+SHOW_MORE_NEWS_DURATION = 30      # 按 M 显示更多新闻后，多久恢复默认条数（秒）
+ALERTS_FILE = "alerts.txt"        # 提醒规则文件（见 alerts.py）
+ALERT_DISPLAY_COUNT = 5           # 画面底部显示最近几条提醒
 stop_flag = False
 manual_refresh_flag = False
 show_more_news = False
-current_news_source = 2  # 默认使用财联社中文新闻源 (1=英文新闻源, 2=财联社中文新闻源)
+current_news_source = 2  # 默认使用财联社中文新闻源 (1=英文新闻源, 2=财联社中文新闻源, 3=多源合并)
+us_page = 0              # 美股行情当前页（--top 分页时 N/P 翻页）
 
 # ====== 命令行参数解析 ======
-def parse_arguments():
-    """解析命令行参数"""
+def parse_arguments(argv=None):
+    """解析命令行参数（argv 默认取 sys.argv）"""
     parser = argparse.ArgumentParser(description='实时市场监控工具')
     parser.add_argument('-s', '--source', 
-                       choices=['e', 'c'], 
+                       choices=['e', 'c', 'm'], 
                        default='c',
-                       help='选择新闻源: e=英文新闻源, c=财联社中文新闻源 (默认: c)')
-    return parser.parse_args()
-
-# ====== 字符串显示宽度计算函数 ======
-def get_display_width(text):
-    """计算字符串的显示宽度（中文字符占2个宽度）"""
-    width = 0
-    for char in text:
-        if ord(char) > 127:  # 非ASCII字符（包括中文）
-            width += 2
-        else:
-            width += 1
-    return width
-
-def format_with_width(text, target_width):
-    """格式化字符串，考虑中文字符宽度"""
-    current_width = get_display_width(text)
-    if current_width >= target_width:
-        return text
-    else:
-        return text + " " * (target_width - current_width)
-
-# 解析命令行参数并设置新闻源
-args = parse_arguments()
-if args.source == 'e':
-    current_news_source = 1  # 英文新闻源
-else:
-    current_news_source = 2  # 财联社中文新闻源
+                       help='选择新闻源: e=英文新闻源, c=财联社中文新闻源, m=多源合并 (默认: c)')
+    parser.add_argument('-t', '--translator',
+                       choices=['google', 'none'],
+                       default='google',
+                       help='英文新闻翻译后端: google=googletrans, none=不翻译 (默认: google)')
+    parser.add_argument('--crypto-ws-url',
+                       default=GATE_WS_URL,
+                       help='虚拟币行情 WebSocket 地址（可指向本地替身服务器测试）')
+    parser.add_argument('--no-crypto-stream',
+                       action='store_true',
+                       help='不使用 WebSocket 推送，只按 CRYPTO_REFRESH_INTERVAL 轮询')
+    parser.add_argument('--top',
+                       type=int,
+                       default=0,
+                       help='美股行情每页显示的条数，按 N/P 翻页 (默认: 0=全部显示)')
+    parser.add_argument('--indicators',
+                       choices=sorted(BAR_INTERVALS),
+                       help='按该周期的实时 bar 显示 RSI / MACD 柱 / MA20 方向列（不指定则不显示）')
+    parser.add_argument('--record-ticks',
+                       nargs='?',
+                       const='ticks',
+                       metavar='DIR',
+                       help='把每次观测到的价格写入每个代码一个的内存映射环形文件 (默认目录: ticks)')
+    parser.add_argument('--tick-capacity',
+                       type=int,
+                       default=TICK_CAPACITY,
+                       help=f'每个代码保留的记录条数，写满后覆盖最旧的 (默认: {TICK_CAPACITY})')
+    tap = parser.add_mutually_exclusive_group()
+    tap.add_argument('--capture',
+                       metavar='FILE',
+                       help='录制所有上游响应到 JSONL 文件（录制时不使用 WebSocket 推送）')
+    tap.add_argument('--replay',
+                       metavar='FILE',
+                       help='不访问网络，从 --capture 录制的文件回放上游响应')
+    parser.add_argument('--replay-speed',
+                       type=float,
+                       default=1.0,
+                       help='回放倍速，0=不等待按顺序回放 (默认: 1)')
+    feed = parser.add_mutually_exclusive_group()
+    feed.add_argument('--serve',
+                       nargs='?',
+                       const=f"{DEFAULT_HOST}:{DEFAULT_PORT}",
+                       metavar='HOST:PORT',
+                       help=f'无界面模式：只抓取数据并通过本地 HTTP/SSE 分发 (默认: {DEFAULT_HOST}:{DEFAULT_PORT})')
+    feed.add_argument('--connect',
+                       nargs='?',
+                       const=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}",
+                       metavar='URL',
+                       help='从 --serve 进程接收数据并显示，不直接请求上游')
+    parser.add_argument('--alerts',
+                       default=ALERTS_FILE,
+                       metavar='FILE',
+                       help=f'价格/涨跌幅/盈亏/新闻关键词提醒规则，修改后自动重新加载 (默认: {ALERTS_FILE})')
+    parser.add_argument('--alert-notify',
+                       choices=['bell', 'desktop', 'none'],
+                       default='bell',
+                       help='提醒方式: bell=终端响铃, desktop=响铃+桌面通知, none=只显示在画面底部 (默认: bell)')
+    parser.add_argument('--hedge',
+                       nargs='?',
+                       type=float,
+                       const=95,
+                       metavar='PCT',
+                       help='美股行情对冲请求：Yahoo 超出自身耗时的 PCT 分位数仍未返回时，同时向腾讯行情请求，取先到的结果 (默认分位数: 95)')
+    parser.add_argument('--metrics',
+                       action='store_true',
+                       help='在画面底部显示运行指标：各上游耗时 p50/p95、缓存命中率、渲染耗时、失败与重试次数')
+    parser.add_argument('--metrics-file',
+                       metavar='FILE',
+                       help=f'每 {METRICS_WRITE_INTERVAL} 秒把运行指标以 Prometheus 文本格式写入 FILE（可由 node_exporter textfile collector 采集）')
+    return parser.parse_args(argv)
+
+# 命令行参数在启动入口解析（apply_arguments），导入本模块不读取 sys.argv
+args = None
+
+def apply_arguments(options):
+    """应用命令行参数：新闻源、虚拟币推送地址（其他工具导入本模块时可传入自己的参数）"""
+    global args, current_news_source, _crypto_stream
+    args = options
+    current_news_source = {'e': 1, 'm': 3}.get(options.source, 2)  # 1=英文 2=财联社中文 3=多源合并
+    # WebSocket 推送（main 中启动），断线或数据过期时回退到轮询
+    _crypto_stream = CryptoPriceStream(CRYPTO_PAIRS, ws_url=options.crypto_ws_url, on_update=on_crypto_update)
+    if options.hedge:
+        # 熔断器只包住各自的源：Yahoo 熔断时仍可走腾讯（腾讯请求内部使用 us_alt 熔断器），
+        # 腾讯的成功也不会计入 Yahoo 的熔断统计，因此缓存层不再套 Yahoo 熔断器
+        _stock_cache.fetch_many = HedgedFetcher(lambda t: SOURCE_BREAKERS['us'].call(fetch_yahoo_quotes, t),
+                                                fetch_tencent_us_quotes, percentile=options.hedge,
+                                                is_valid=has_quote_price, name="us")
+        _stock_cache.breaker = None
 
 # ====== 辅助函数 ======
-def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+def watch_files(watchlist, alerts_path):
+    """后台线程：定期检查 stocks.txt 与提醒规则文件，只有文件变化时才唤醒主循环"""
+    while not stop_flag:
+        _alert_engine.poll_file(alerts_path)
+        if watchlist.has_changes():
+            _wakeup.set()
+        time.sleep(WATCHLIST_POLL_INTERVAL)
+
+def quotes_refreshed(source):
+    """行情缓存后台刷新完成（在刷新线程中调用）"""
+    _quotes_refreshed.add(source)
+    _wakeup.set()
+
+def request_manual_refresh():
+    """立即刷新所有数据（W 键；--serve 时也由显示终端远程触发）"""
+    global manual_refresh_flag
+    manual_refresh_flag = True
+    _wakeup.set()
 
 def key_listener():
-    global stop_flag, manual_refresh_flag, show_more_news, current_news_source
+    global stop_flag, manual_refresh_flag, show_more_news, current_news_source, us_page
     while True:
         key = sys.stdin.read(1).lower()
         if key == 'q':
@@ -134,287 +379,319 @@ def key_listener():
         elif key == 'm':
             show_more_news = not show_more_news
             manual_refresh_flag = True
+        elif key == 'n':
+            us_page += 1
+        elif key == 'p':
+            us_page = max(0, us_page - 1)
+        _key_pressed.set()
+        _wakeup.set()
+    _key_pressed.set()
+    _wakeup.set()
 
 # ====== 虚拟币价格获取 ======
 def fetch_prices_from_gate():
-    url = "https://api.gateio.ws/api/v4/spot/tickers"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        prices = {}
-        for item in data:
-            symbol = item.get("currency_pair", "")
-            if symbol in ["BTC_USDT", "ETH_USDT", "BNB_USDT"]:
-                last_price = float(item.get("last", 0))
-                prices[symbol.replace("_", "")] = last_price
-        return prices
-    except Exception as e:
-        print(f"❌ Gate.io API 错误: {e}")
-        return {}
+    """轮询兜底：只请求配置的交易对，不下载整个行情列表"""
+    return SOURCE_BREAKERS['crypto'].call(poll_gate_prices, CRYPTO_PAIRS, timeout=SOURCE_DEADLINES['crypto'],
+                                          http_get=http_get)
+
+# ====== 逐笔价格记录（--record-ticks，见 tick_store.py），main 中创建 ======
+_tick_recorder = None
+
+def record_ticks(results):
+    """把本轮取到的行情写入环形文件（代码加市场前缀，避免不同市场重名）"""
+    ts = time.time()
+    if 'crypto' in results:
+        prices = results['crypto']
+        _tick_recorder.record_many(ts, [f"CRYPTO.{sym}" for sym in prices], list(prices.values()))
+    for market in ('us', 'hk'):
+        df = results.get(market)
+        if df is not None and not df.empty:
+            _tick_recorder.record_many(ts, [f"{market.upper()}.{t}" for t in df["Ticker"]],
+                                       df["Price"], df["Change"])
+
+# ====== 价格提醒（--alerts，见 alerts.py），main 中按规则文件加载 ======
+_alert_engine = AlertEngine()
+_recent_alerts = deque(maxlen=ALERT_DISPLAY_COUNT)
+
+def evaluate_alerts(results, prices):
+    """用本轮更新的行情/新闻检查提醒规则，返回新触发的提醒（虚拟币推送每轮都检查）"""
+    now = time.time()
+    fired = []
+    for market in ('us', 'hk'):
+        df = results.get(market)
+        if df is None or df.empty:
+            continue
+        tickers = df["Ticker"].tolist()
+        fired += _alert_engine.update_many('price', tickers, df["Price"].tolist(), now)
+        fired += _alert_engine.update_many('change', tickers, df["Change"].tolist(), now)
+        if "PnL" in df.columns:
+            fired += _alert_engine.update_many('pnl', tickers, df["PnL"].tolist(), now)
+    for sym, price in (prices.items() if 'crypto' not in _snapshot_sections else ()):
+        fired += _alert_engine.update(sym, 'price', price, now)
+        position = _position_book.peek('crypto', sym, price)
+        if position:
+            fired += _alert_engine.update(sym, 'pnl', position[2], now)
+    if 'news' in results:
+        fired += _alert_engine.check_news(results['news'], now)
+    _recent_alerts.extend(fired)
+    return fired
+
+# ====== 盘中实时指标（--indicators，见 live_indicators.py），main 中创建 ======
+INDICATOR_SEED_FILE = os.path.join("data2", "last_bars.json")   # daily_stock_option_data.py 保存的最近收盘价
+INDICATOR_COLUMNS = ("RSI", "MACD", "MA20")
+_live_indicators = None
+
+def add_indicator_columns(df):
+    """把行情喂给 1m/5m bar，并附加所选周期的指标列"""
+    if df.empty:
+        return df
+    _live_indicators.update_many(time.time(), df["Ticker"], df["Price"])
+    return df.assign(**_live_indicators.columns(df["Ticker"], args.indicators))
+
+def on_crypto_update(symbol, price):
+    """WebSocket 每次推送：记录逐笔价格并唤醒主循环"""
+    if _tick_recorder is not None:
+        _tick_recorder.record(time.time(), f"CRYPTO.{symbol}", price)
+    _crypto_pushed.set()
+    _wakeup.set()
+
+_crypto_stream = None   # apply_arguments 中创建
 
 # ====== 时段检测 ======
+# 各时段使用的价格/涨跌幅字段；休市（周末、节假日）显示最近的盘后价格，缺失时回退到收盘价
+SESSION_PRICE_KEYS = {
+    "盘前": ("preMarketPrice", "preMarketChangePercent"),
+    "盘中": ("regularMarketPrice", "regularMarketChangePercent"),
+    "盘后": ("postMarketPrice", "postMarketChangePercent"),
+    "隔夜": ("overnightMarketPrice", "overnightMarketChangePercent"),
+    "休市": ("postMarketPrice", "postMarketChangePercent"),
+}
+
 def detect_session():
-    ny_tz = pytz.timezone('America/New_York')
-    ny_time = datetime.now(ny_tz)
-    hour = ny_time.hour
-    minute = ny_time.minute
-    
-    if (hour == 4 and minute >= 0) or (hour >= 5 and hour < 9) or (hour == 9 and minute < 30):
-        phase = "盘前"
-        active_price_key = "preMarketPrice"
-        active_change_key = "preMarketChangePercent"
-    elif (hour == 9 and minute >= 30) or (hour >= 10 and hour < 16):
-        phase = "盘中"
-        active_price_key = "regularMarketPrice"
-        active_change_key = "regularMarketChangePercent"
-    elif (hour >= 16 and hour < 20):
-        phase = "盘后"
-        active_price_key = "postMarketPrice"
-        active_change_key = "postMarketChangePercent"
-    else:
-        phase = "隔夜"
-        active_price_key = "overnightMarketPrice"
-        active_change_key = "overnightMarketChangePercent"
-    
+    """按美股交易日历判断当前时段（含节假日与半日市，见 market_calendar.py）"""
+    ny_time = datetime.now(pytz.timezone('America/New_York'))
+    phase = us_session(ny_time)
+    active_price_key, active_change_key = SESSION_PRICE_KEYS[phase]
     return ny_time.strftime('%H:%M'), phase, active_price_key, active_change_key
 
-# ====== 读取 stocks.txt（支持第二列 1/2 标记和第三列成本价*持仓票数，识别港股） ======
+# ====== 读取 stocks.txt（解析结果缓存，文件 mtime 变化时才重新解析，见 watchlist.py） ======
+_watchlists: Dict[str, WatchlistCache] = {}
+
+def get_watchlist(file_path=STOCK_FILE):
+    """获取自选股缓存对象（每个文件一个）"""
+    if file_path not in _watchlists:
+        _watchlists[file_path] = WatchlistCache(file_path)
+    return _watchlists[file_path]
+
 def read_stocks(file_path):
-    us_tickers = []  # 美股代码
-    hk_tickers = []  # 港股代码
-    marks = {}
-    cost_and_shares = {}
+    """返回 (美股代码, 港股代码, 标记, 成本与持仓)，文件未变化时不重复解析"""
+    wl = get_watchlist(file_path).get()
+    return list(wl.us_tickers), list(wl.hk_tickers), wl.marks, wl.cost_and_shares
+
+def _to_float(value):
+    """转为 float，缺失或非数值返回 NaN"""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split()
-                if not parts:
-                    continue
-                t = parts[0].upper()
-                
-                # 判断是否为港股（数字开头）
-                if t[0].isdigit():
-                    hk_tickers.append(t)
-                else:
-                    us_tickers.append(t)
-                
-                mark = ""
-                if len(parts) > 1:
-                    if parts[1] == "1":
-                        mark = "🚀"
-                    elif parts[1] == "2":
-                        mark = "⚡"
-                if mark:
-                    marks[t] = mark
-                # 解析第三列或第四列的成本价*持仓票数格式
-                if len(parts) > 2:
-                    # 检查第三列是否包含成本价*持仓票数
-                    cost_shares_str = parts[2]
-                    if '*' in cost_shares_str:
-                        try:
-                            cost_price, shares = cost_shares_str.split('*')
-                            cost_and_shares[t] = {
-                                'cost_price': float(cost_price),
-                                'shares': float(shares)
-                            }
-                        except (ValueError, IndexError):
-                            pass
-                    # 如果第三列不包含，检查第四列
-                    elif len(parts) > 3:
-                        cost_shares_str = parts[3]
-                        if '*' in cost_shares_str:
-                            try:
-                                cost_price, shares = cost_shares_str.split('*')
-                                cost_and_shares[t] = {
-                                    'cost_price': float(cost_price),
-                                    'shares': float(shares)
-                                }
-                            except (ValueError, IndexError):
-                                pass
-    except FileNotFoundError:
-        return [], [], {}, {}
-    return us_tickers, hk_tickers, marks, cost_and_shares
-
-# ====== 港股价格获取函数 ======
-def get_hk_stock_price(hk_tickers, marks={}, cost_and_shares={}):
+        return float(value) if value not in (None, "") else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+# ====== 腾讯行情接口（港股；美股作为 --hedge 的备用源） ======
+TENCENT_QUOTE_URL = "http://qt.gtimg.cn/q"
+
+def fetch_tencent_us_quotes(tickers: List[str]) -> Dict[str, dict]:
+    """
+    一次腾讯美股行情请求，整理成 Yahoo quote 的字段，可与 Yahoo 结果混用。
+    腾讯只提供正常交易时段的价格，盘前/盘后/隔夜由 normalize_us_quotes 按时段回退到该价格。
+    """
+    # Yahoo 的 BRK-B 在腾讯为 usBRK.B
+    codes = {f"r_us{t.replace('-', '.')}": t for t in tickers}
+    response = SOURCE_BREAKERS['us_alt'].call(http_get, TENCENT_QUOTE_URL, params={'q': ",".join(codes), 'fmt': 'json'},
+                                              timeout=SOURCE_DEADLINES['us'])
+    response.raise_for_status()
+    quotes = {}
+    for code, fields in response.json().items():
+        ticker = codes.get(code)
+        if ticker is None or not isinstance(fields, list) or len(fields) <= 32:
+            continue
+        price = _to_float(fields[3])
+        if price > 0:
+            quotes[ticker] = {
+                "regularMarketPrice": price,
+                "regularMarketPreviousClose": _to_float(fields[4]),
+                "regularMarketChangePercent": _to_float(fields[32]),
+            }
+    return quotes
+
+def has_quote_price(quote):
+    """对冲时判断单个代码的结果是否可用：任一时段有正的价格"""
+    return isinstance(quote, dict) and any(_to_float(quote.get(price_key)) > 0 for price_key, _ in PRICE_FIELD_PAIRS)
+
+# ====== 港股行情：按 URL 长度分块并发拉取，按港股交易时段缓存（见 quote_cache.py） ======
+HK_MAX_URL_LENGTH = 2000       # 单个请求 URL 的最大长度（过长的 URL 会被代理/服务器拒绝）
+HK_URL_BUDGET = HK_MAX_URL_LENGTH - len(f"{TENCENT_QUOTE_URL}?q=&fmt=json")
+HK_MAX_WORKERS = 4             # 并发请求数
+# 交易时段的行情缓存有效期（秒）；午休/休市时行情不变，每个时段只取一次
+HK_SESSION_QUOTE_TTL = {'竞价': 30, '上午': 15, '下午': 15}
+
+def _hk_code(ticker):
+    return f"r_hk{ticker}"
+
+def fetch_tencent_hk_quotes(hk_tickers: List[str]) -> Dict[str, dict]:
+    """一次腾讯港股行情请求，返回 {代码: {'name', 'price', 'change'}}（价格 <= 0 视为无数据）"""
+    # 请求失败时直接抛出，由缓存与熔断器记录，画面继续显示上一次的数据
+    response = http_get(TENCENT_QUOTE_URL, params={'q': ",".join(map(_hk_code, hk_tickers)), 'fmt': 'json'},
+                        timeout=SOURCE_DEADLINES['hk'])
+    response.raise_for_status()
+    quotes = {}
+    for code, fields in response.json().items():
+        if not isinstance(fields, list):
+            continue
+        price = _to_float(fields[3]) if len(fields) > 3 else np.nan
+        quotes[code.replace('r_hk', '')] = {
+            'name': fields[1] if len(fields) > 1 else "N/A",
+            'price': price if price > 0 else np.nan,
+            'change': _to_float(fields[32]) if len(fields) > 32 else np.nan,
+        }
+    return quotes
+
+# 查询参数中的逗号会被编码为 %2C，按编码后的长度分块
+_hk_cache = QuoteCache(fetch_tencent_hk_quotes, negative_ttl=QUOTE_NEGATIVE_TTL, retries=0,
+                       max_workers=HK_MAX_WORKERS, name="HK", breaker=SOURCE_BREAKERS['hk'],
+                       chunker=lambda symbols: split_by_length(symbols, HK_URL_BUDGET, encode=_hk_code, sep="%2C"),
+                       on_refresh=lambda symbols: quotes_refreshed('hk'))
+
+def hk_quote_ttl(now=None):
+    """按当前港股时段选择缓存有效期：午休/休市时本时段开始之后取到的数据一直有效，之前的一律过期"""
+    now = time.time() if now is None else now
+    since_start = now - session_start('hk', now)
+    ttl = HK_SESSION_QUOTE_TTL.get(hk_session())
+    return since_start if ttl is None else min(ttl, since_start)
+
+def get_hk_stock_price(hk_tickers, marks={}, book=None):
+    """
+    港股行情表：Ticker / Name / Mark / Priority / Price / Change / PnL，
+    与美股相同的标记优先级和持仓盈亏（book 为持仓簿）。
+    """
     if not hk_tickers:
-        return pd.DataFrame()
-    
-    url = "http://qt.gtimg.cn/q"
-    # 为港股代码添加前缀
-    code_list = [f"r_hk{code}" for code in hk_tickers]
-    code_str = ",".join(code_list)
-    
-    try:
-        response = requests.get(url, params={'q': code_str, 'fmt': 'json'})
-        stock_list = response.json()
-        
-        stock_data = []
-        for stock_code, stock_info in stock_list.items():
-            # 移除前缀获取原始代码
-            original_code = stock_code.replace('r_hk', '')
-            
-            # 获取股票信息
-            name = stock_info[1] if len(stock_info) > 1 else "N/A"
-            price = float(stock_info[3]) if len(stock_info) > 3 and stock_info[3] else 0.0
-            change_percent = float(stock_info[32]) if len(stock_info) > 32 and stock_info[32] else 0.0
-            
-            # 格式化显示
-            price_s = f"{price:.2f}" if price > 0 else "N/A"
-            change_s = f"{change_percent:+.2f}%" if change_percent != 0 else "0.00%"
-            
-            stock_data.append({
-                'Ticker': original_code,
-                'Name': name,
-                'Price': price_s,
-                'Change': change_s,
-            })
-        
-        df = pd.DataFrame(stock_data)
-        return df
-        
-    except Exception as e:
-        print(f"获取港股数据失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return pd.DataFrame()
-
-# ====== 抓取并构建 DataFrame（优化时段价格获取逻辑） ======
+        return QuoteTable()
+    quotes = _hk_cache.get_many(hk_tickers, hk_quote_ttl())
+    price = np.array([quotes[t].get('price', np.nan) for t in hk_tickers], dtype=float)
+    mark = [marks.get(t, "") for t in hk_tickers]
+    return QuoteTable({
+        'Ticker': list(hk_tickers),
+        'Name': [quotes[t].get('name') or t for t in hk_tickers],
+        'Mark': mark,
+        'Priority': np.array([MARK_PRIORITY.get(m, 1) for m in mark], dtype=np.int8),
+        'Price': price,
+        'Change': np.array([quotes[t].get('change', np.nan) for t in hk_tickers], dtype=float),
+        'PnL': book.mark_many('hk', hk_tickers, price) if book is not None else np.full(len(hk_tickers), np.nan),
+    })
+
+# ====== US 行情归一化：列式数值表，格式化留到渲染时且只处理可见行 ======
+PRICE_FIELD_PAIRS = [
+    ("preMarketPrice", "preMarketChangePercent"),
+    ("regularMarketPrice", "regularMarketChangePercent"),
+    ("postMarketPrice", "postMarketChangePercent"),
+    ("overnightMarketPrice", "overnightMarketChangePercent"),
+]
+QUOTE_FIELDS = [field for pair in PRICE_FIELD_PAIRS for field in pair]
+QUOTE_FIELD_INDEX = {field: i for i, field in enumerate(QUOTE_FIELDS)}
+CHANGE_FIELD_OF = dict(PRICE_FIELD_PAIRS)
+
+# 当前时段价格缺失时，按时间逻辑的回退顺序
+PRICE_FALLBACK_ORDER = {
+    "preMarketPrice": ["overnightMarketPrice", "regularMarketPrice", "postMarketPrice"],      # 盘前：隔夜价或前一日收盘价
+    "regularMarketPrice": ["preMarketPrice", "postMarketPrice", "overnightMarketPrice"],     # 正常交易：盘前价或前一日收盘价
+    "postMarketPrice": ["regularMarketPrice", "preMarketPrice", "overnightMarketPrice"],     # 盘后：正常交易价或盘前价
+    "overnightMarketPrice": ["postMarketPrice", "regularMarketPrice", "preMarketPrice"],     # 隔夜：盘后价或正常交易价
+}
+
+# 标记优先级：🚀=3, ⚡=2, 无标记=1
+MARK_PRIORITY = {"🚀": 3, "⚡": 2}
+
+def _quote_values(quote):
+    """按 QUOTE_FIELDS 顺序取出一条 quote 的数值（非 dict 视为空）"""
+    if not isinstance(quote, dict):
+        quote = {}
+    return [_to_float(quote.get(field)) for field in QUOTE_FIELDS]
+
+def normalize_us_quotes(tickers, quotes, active_price_key, active_change_key, marks, book=None):
+    """
+    把 {代码: quote dict} 归一化为列式 DataFrame：
+    Ticker / Mark / Priority / Price / Change / PrevClose / PnL（数值列缺失为 NaN）。
+    只有取字段这一步逐个代码遍历，时段回退是整列运算；盈亏由持仓簿 book 按新价格增量标价。
+    """
+    quotes = quotes or {}
+    raw = np.array([_quote_values(quotes.get(t)) for t in tickers],
+                   dtype=float).reshape(len(tickers), len(QUOTE_FIELDS))
+
+    # 1) 优先使用当前时段的价格和涨跌幅
+    price = raw[:, QUOTE_FIELD_INDEX[active_price_key]].copy()
+    change = raw[:, QUOTE_FIELD_INDEX[active_change_key]].copy()
+
+    # 2) 当前时段价格缺失的行按顺序回退，涨跌幅取与价格同一时段的字段
+    for field in PRICE_FALLBACK_ORDER.get(active_price_key, []):
+        column = raw[:, QUOTE_FIELD_INDEX[field]]
+        fill = np.isnan(price) & ~np.isnan(column)
+        price[fill] = column[fill]
+        change[fill] = raw[fill, QUOTE_FIELD_INDEX[CHANGE_FIELD_OF[field]]]
+
+    # 3) 浮盈浮亏（成本价为负表示做空）；无持仓为 NaN
+    pnl = book.mark_many('us', tickers, price) if book is not None else np.full(len(tickers), np.nan)
+
+    mark = [marks.get(t, "") for t in tickers]
+    return QuoteTable({
+        "Ticker": list(tickers),
+        "Mark": mark,
+        "Priority": np.array([MARK_PRIORITY.get(m, 1) for m in mark], dtype=np.int8),
+        "Price": price,
+        "Change": change,
+        "PrevClose": raw[:, QUOTE_FIELD_INDEX["regularMarketPrice"]],
+        "PnL": pnl,
+    })
+
 def fetch_all_stocks(file_path, active_price_key, active_change_key):
     us_tickers, hk_tickers, marks, cost_and_shares = read_stocks(file_path)
     if not us_tickers:
-        return pd.DataFrame()
+        return QuoteTable()
 
     # ====== 获取 US quotes，一次性调用全局缓存函数 ======
     quotes_all = get_us_quotes(us_tickers)
-
-    rows = []
-    for t in us_tickers:
-        q = (quotes_all or {}).get(t, {})
-        if not isinstance(q, dict):
-            q = {}
-
-        # 所有可能的价格字段对
-        field_pairs = [
-            ("preMarketPrice", "preMarketChangePercent"),
-            ("regularMarketPrice", "regularMarketChangePercent"),
-            ("postMarketPrice", "postMarketChangePercent"),
-            ("overnightMarketPrice", "overnightMarketChangePercent"),
-        ]
-
-        # previous close 用于计算 fallback 的百分比
-        prev_close = q.get("regularMarketPrice")
-
-        # 1) 优先获取当前时段的价格和涨跌幅
-        active_price = q.get(active_price_key)
-        active_change = q.get(active_change_key)
-
-        # 2) 如果当前时段数据不可用，按时间逻辑回退
-        if active_price is None:
-            # 根据当前时段智能回退
-            if active_price_key == "preMarketPrice":
-                # 盘前时段：回退到前一日收盘价或隔夜价格
-                fallback_order = ["overnightMarketPrice", "regularMarketPrice", "postMarketPrice"]
-            elif active_price_key == "regularMarketPrice":
-                # 正常交易时段：回退到盘前价格或前一日收盘价
-                fallback_order = ["preMarketPrice", "postMarketPrice", "overnightMarketPrice"]
-            elif active_price_key == "postMarketPrice":
-                # 盘后时段：回退到正常交易价格或盘前价格
-                fallback_order = ["regularMarketPrice", "preMarketPrice", "overnightMarketPrice"]
-            else:
-                # 隔夜时段：回退到盘后价格或正常交易价格
-                fallback_order = ["postMarketPrice", "regularMarketPrice", "preMarketPrice"]
-            
-            for pf in fallback_order:
-                p = q.get(pf)
-                if p is not None:
-                    active_price = p
-                    # 找到对应的涨跌幅字段
-                    matching_cf = None
-                    for pair in field_pairs:
-                        if pair[0] == pf:
-                            matching_cf = pair[1]
-                            break
-                    if matching_cf:
-                        active_change = q.get(matching_cf)
-                    break
-
-        # 3) 涨跌幅直接从API字段获取，不再手动计算
-
-        # 格式化数据，为Last Close添加固定宽度以对齐emoji
-        active_price_s = f"{float(active_price):.2f}" if active_price is not None else "N/A"
-        active_change_s = f"{float(active_change):+.2f}%" if active_change is not None else "N/A"
-        prev_close_s = f"{float(prev_close):.2f}".rjust(8) if prev_close is not None else "N/A".rjust(8)
-
-        prefix = marks.get(t, "")
-        # 设置优先级：🚀=3, ⚡=2, 无标记=1
-        if prefix == "🚀":
-            priority = 3
-        elif prefix == "⚡":
-            priority = 2
-        else:
-            priority = 1
-        
-        # 为没有标记的股票添加占位符，保持对齐
-        if prefix:
-            ticker_display = prefix + "" + t
-        else:
-            ticker_display = "  " + t  # 两个空格占位符，与⚡长度相同
-        
-        # 计算浮盈浮亏并添加到Change列
-        profit_loss_str = ""
-        if t in cost_and_shares and active_price is not None:
-            cost_info = cost_and_shares[t]
-            cost_price = cost_info['cost_price']
-            shares = cost_info['shares']
-            # 判断是否为做空仓位：成本价为负表示做空
-            if cost_price < 0:
-                # 做空收益：(开仓价的绝对值 - 当前价) * 持仓股数
-                profit_loss = (abs(cost_price) - float(active_price)) * shares
-            else:
-                # 多头收益：(当前价 - 成本价) * 持仓股数
-                profit_loss = (float(active_price) - cost_price) * shares
-            profit_loss_str = f"({profit_loss:+.2f})"
-        
-        # 修改Change列格式，添加浮盈浮亏
-        if profit_loss_str:
-            change_display = f"{active_change_s}{profit_loss_str}"
-        else:
-            change_display = active_change_s
-
-        rows.append({
-            "Last Close": prev_close_s,
-            "Ticker": ticker_display,
-            "Priority": priority,
-            "Price": active_price_s,
-            "Change": change_display
-        })
-
-    df = pd.DataFrame(rows)
-    return df
+    us_set = set(us_tickers)
+    sync_stock_positions('us', {t: p for t, p in cost_and_shares.items() if t in us_set})
+    return normalize_us_quotes(us_tickers, quotes_all, active_price_key, active_change_key,
+                               marks, _position_book)
 
 # ====== 英文新闻模块 ======
 def fetch_news_data_en():
-    """获取英文新闻数据"""
-    try:
-        # 添加时间戳参数避免缓存
-        timestamp = int(time.time() * 1000)
-        url = f"{NEWS_API_URL_EN}?t={timestamp}"
-        response = requests.get(url, timeout=10)
+    """获取英文新闻数据（条件请求：内容未变化时返回空列表，失败或熔断中返回 None）"""
+    state = _news_state['en']
+    headers = {}
+    if state['etag']:
+        headers['If-None-Match'] = state['etag']
+    if state['last_modified']:
+        headers['If-Modified-Since'] = state['last_modified']
+
+    def request():
+        response = http_get(NEWS_API_URL_EN, headers=headers, timeout=SOURCE_DEADLINES['news'])
+        if response.status_code == 304:
+            return []
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"❌ 英文新闻API获取失败: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"❌ 英文新闻JSON解析失败: {e}")
+        data = response.json()
+        state['etag'] = response.headers.get('ETag')
+        state['last_modified'] = response.headers.get('Last-Modified')
+        return data
+
+    # 错误由熔断器记录并显示在画面底部
+    try:
+        return SOURCE_BREAKERS['news_en'].call(request)
+    except (CircuitOpenError, OSError, ValueError):  # requests 的异常均为 OSError，JSON 解析错误为 ValueError
         return None
 
 # ====== 财联社新闻模块 ======
-def fetch_news_data_cn():
-    """获取财联社中文新闻数据"""
-    try:
+def fetch_news_data_cn(rn=NEWS_RING_SIZE):
+    """获取财联社中文新闻数据（rn 为请求条数，失败或熔断中返回 None）"""
+    def request():
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
@@ -422,19 +699,30 @@ def fetch_news_data_cn():
             "app": "CailianpressWeb",
             "os": "web", 
             "refresh_type": "1",
-            "rn": "100",  # 增加获取数量到100条
+            "rn": str(rn),
             "sv": "8.4.6"
         }
-        response = requests.get(NEWS_API_URL_CN, params=params, timeout=10, headers=headers)
+        response = http_get(NEWS_API_URL_CN, params=params, timeout=SOURCE_DEADLINES['news'], headers=headers)
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
-        print(f"❌ 财联社新闻API获取失败: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"❌ 财联社新闻JSON解析失败: {e}")
+
+    # 错误由熔断器记录并显示在画面底部
+    try:
+        return SOURCE_BREAKERS['news_cn'].call(request)
+    except (CircuitOpenError, OSError, ValueError):  # requests 的异常均为 OSError，JSON 解析错误为 ValueError
         return None
 
+def merge_into_ring(state, new_items):
+    """把本次解析出的新条目放入环形缓冲头部并推进游标，返回实际新增条数"""
+    seen = {n['id'] for n in state['ring']}
+    fresh = [n for n in new_items if n['id'] not in seen]
+    # 按时间正序逐条 appendleft，缓冲区保持时间倒序，超出容量时自动丢弃最旧的
+    for news in sorted(fresh, key=lambda n: n['ts']):
+        state['ring'].appendleft(news)
+    if fresh:
+        state['cursor'] = max(state['cursor'], max(n['ts'] for n in fresh))
+    return len(fresh)
+
 def format_news_time(time_str):
     """格式化新闻时间字符串，转换为东8区时间"""
     try:
@@ -448,6 +736,10 @@ def format_news_time(time_str):
     except ValueError:
         return time_str[:10], None
 
+def news_timestamp(dt):
+    """把 format_news_time / format_news_time_cn 返回的 datetime 统一为 Unix 时间戳（秒），用于跨源排序"""
+    return dt.timestamp() if dt is not None else 0.0
+
 def format_news_time_cn(timestamp):
     """格式化财联社新闻时间戳"""
     try:
@@ -465,22 +757,19 @@ def clean_news_content(content):
     content = re.sub(r'\s+', ' ', content).strip()
     return content
 
-# ====== 新闻翻译缓存管理 ======
-def load_translation_cache():
-    """加载翻译缓存"""
-    try:
-        with open(NEWS_CACHE_FILE, 'rb') as f:
-            return pickle.load(f)
-    except (FileNotFoundError, pickle.PickleError):
-        return {}
+# ====== 新闻翻译（缓存 + 批量翻译，首次使用时初始化） ======
+_news_translator = None
 
-def save_translation_cache(cache):
-    """保存翻译缓存"""
-    try:
-        with open(NEWS_CACHE_FILE, 'wb') as f:
-            pickle.dump(cache, f)
-    except Exception as e:
-        print(f"❌ 保存翻译缓存失败: {e}")
+def get_news_translator():
+    """获取全局翻译服务，首次调用时打开缓存并迁移旧版 pickle"""
+    global _news_translator
+    if _news_translator is None:
+        cache = TranslationCache(NEWS_CACHE_FILE, capacity=NEWS_CACHE_CAPACITY)
+        cache.import_pickle(NEWS_CACHE_LEGACY_FILE)
+        # 回放时不访问翻译服务，只使用缓存中已有的译文
+        backend = get_translation_backend('none' if args.replay else args.translator)
+        _news_translator = NewsTranslator(backend, cache)
+    return _news_translator
 
 def get_news_key(news_item):
     """生成新闻的唯一标识符"""
@@ -488,96 +777,122 @@ def get_news_key(news_item):
     content = news_item.get('content', '')
     return content[:50] if content else str(hash(str(news_item)))
 
-def translate_news_text_cached(text, cache, translator):
-    """带缓存的新闻翻译"""
-    if not text or len(text.strip()) == 0:
-        return text
-    
-    # 检查缓存
-    if text in cache:
-        return cache[text]
-    
-    try:
-        # 翻译文本
-        translated = translator.translate(text, src='en', dest='zh-cn')
-        translated_text = translated.text
-        
-        # 保存到缓存
-        cache[text] = translated_text
-        return translated_text
-    except Exception as e:
-        print(f"❌ 翻译失败: {e}")
-        return text
-
 def fetch_latest_news(count=5):
     """获取最新新闻，根据当前新闻源选择"""
     global current_news_source
     
     if current_news_source == 1:
         return fetch_latest_news_en(count)
+    elif current_news_source == 3:
+        return fetch_latest_news_merged(count)
     else:
         return fetch_latest_news_cn(count)
 
+def fetch_latest_news_merged(count=5):
+    """并发获取所有新闻源，按时间 k 路归并（耗时约等于最慢的一个源）"""
+    fetchers = list(MERGED_NEWS_SOURCES.values())
+    with ThreadPoolExecutor(max_workers=len(fetchers)) as pool:
+        futures = [pool.submit(fetcher, count) for fetcher in fetchers]
+        streams = []
+        for future in futures:
+            try:
+                items = future.result()
+            except Exception:
+                items = []
+            # 各源按时间倒序，保证归并前提成立
+            streams.append(sorted(items, key=lambda n: n['ts'], reverse=True))
+    merged = heapq.merge(*streams, key=lambda n: n['ts'], reverse=True)
+    return [news for _, news in zip(range(count), merged)]
+
 def fetch_latest_news_en(count=5):
-    """获取最新英文新闻并翻译"""
+    """获取最新英文新闻并翻译（只解析游标之后的新条目，只翻译要显示的条目）"""
+    state = _news_state['en']
     news_data = fetch_news_data_en()
-    if not news_data:
+
+    # None=请求失败, []=未变化（304），两种情况都直接使用缓冲区中的数据
+    if news_data:
+        new_items = []
+        # 英文新闻API返回的是数组，不是对象，按时间倒序
+        items = news_data if isinstance(news_data, list) else []
+        for item in items:
+            if len(new_items) >= NEWS_RING_SIZE:
+                break
+            try:
+                # 格式化时间
+                time_str, dt = format_news_time(item.get('time', ''))
+                ts = news_timestamp(dt)
+                # 早于游标的都已处理过
+                if ts and ts < state['cursor']:
+                    break
+                
+                # 获取重要性标记 - 英文新闻使用important字段
+                importance = item.get('important', 0)
+                if importance >= 2:
+                    importance_mark = "🔴"
+                elif importance == 1:
+                    importance_mark = "🟡"
+                else:
+                    importance_mark = "⚪"
+                
+                # 清理内容 - 英文新闻内容在data.content字段
+                content_data = item.get('data', {})
+                content = clean_news_content(content_data.get('content', ''))
+
+                new_items.append({
+                    'id': f"en:{item.get('id') or content[:50]}",
+                    'time': time_str,
+                    'ts': ts,
+                    'source': '英文',
+                    'importance': importance_mark,
+                    'content': content
+                })
+                
+            except Exception as e:
+                continue
+        merge_into_ring(state, new_items)
+
+    if not state['ring']:
         return []
     
-    # 加载翻译缓存
-    cache = load_translation_cache()
-    translator = Translator()
+    translator = get_news_translator()
+    ring = list(state['ring'])
     
     news_list = []
-    # 英文新闻API返回的是数组，不是对象
-    items = news_data[:count] if isinstance(news_data, list) else []
-    
-    for item in items:
-        try:
-            # 格式化时间
-            time_str, dt = format_news_time(item.get('time', ''))
-            
-            # 获取重要性标记 - 英文新闻使用important字段
-            importance = item.get('important', 0)
-            if importance >= 2:
-                importance_mark = "🔴"
-            elif importance == 1:
-                importance_mark = "🟡"
-            else:
-                importance_mark = "⚪"
-            
-            # 清理和翻译内容 - 英文新闻内容在data.content字段
-            content_data = item.get('data', {})
-            content = clean_news_content(content_data.get('content', ''))
-            translated_content = translate_news_text_cached(content, cache, translator)
-            
-            news_list.append({
-                'time': time_str,
-                'importance': importance_mark,
-                'content': translated_content
-            })
-            
-        except Exception as e:
-            continue
-    
-    # 保存更新后的缓存
-    save_translation_cache(cache)
+    pos = 0
+    # 每轮把还差的条数合并成一次批量翻译；有重复被跳过时再补一轮
+    while len(news_list) < count and pos < len(ring):
+        batch = ring[pos:pos + count - len(news_list)]
+        pos += len(batch)
+        translated = translator.translate_many([news['content'] for news in batch])
+        for news, translated_content in zip(batch, translated):
+            # 跳过与窗口内已显示新闻近似重复的条目（按译文比较，可与中文源互相去重）
+            if _news_dedup.is_duplicate(news['id'], translated_content):
+                continue
+            news_list.append(dict(news, content=translated_content))
     
     return news_list
 
 def fetch_latest_news_cn(count=5):
-    """获取最新财联社中文新闻"""
-    news_data = fetch_news_data_cn()
-    if not news_data:
-        return []
-    
-    news_list = []
-    items = news_data.get('data', {}).get('roll_data', [])[:count]
-    
+    """获取最新财联社中文新闻（有游标后只请求一小页增量）"""
+    state = _news_state['cn']
+    news_data = fetch_news_data_cn(NEWS_DELTA_PAGE_SIZE if state['ring'] else NEWS_RING_SIZE)
+    items = news_data.get('data', {}).get('roll_data', []) if news_data else []
+
+    # 增量页里全部都比游标新，说明中间可能有遗漏，补抓一整页
+    if state['ring'] and items and all(item.get('ctime', 0) > state['cursor'] for item in items):
+        full_data = fetch_news_data_cn(NEWS_RING_SIZE)
+        if full_data:
+            items = full_data.get('data', {}).get('roll_data', [])
+
+    new_items = []
     for item in items:
         try:
-            # 格式化时间
+            # 早于游标的都已处理过
             ctime = item.get('ctime', 0)
+            if ctime < state['cursor']:
+                continue
+
+            # 格式化时间
             time_str, dt = format_news_time_cn(ctime)
             
             # 财联社新闻等级映射
@@ -592,338 +907,704 @@ def fetch_latest_news_cn(count=5):
             # 获取内容（财联社是中文，不需要翻译）
             content = clean_news_content(item.get('content', ''))
             
-            news_list.append({
+            new_items.append({
+                'id': f"cls:{item.get('id') or content[:50]}",
                 'time': time_str,
+                'ts': news_timestamp(dt),
+                'source': '财联社',
                 'importance': importance_mark,
                 'content': content
             })
             
         except Exception as e:
             continue
+    merge_into_ring(state, new_items)
+
+    # 跳过与窗口内已显示新闻近似重复的条目
+    news_list = []
+    for news in state['ring']:
+        if len(news_list) >= count:
+            break
+        if not _news_dedup.is_duplicate(news['id'], news['content']):
+            news_list.append(news)
     
     return news_list
 
-# ====== 主循环 ======
-def main():
-    global stop_flag, manual_refresh_flag, show_more_news, current_news_source
-    threading.Thread(target=key_listener, daemon=True).start()
-    
-    # 显示当前新闻源设置
-    current_source_name = "英文新闻源" if current_news_source == 1 else "财联社中文新闻源"
-    print(f"当前新闻源: {current_source_name}")
-    print("按 Q 退出程序，按 W 手动刷新所有数据，按 M 切换新闻数量.\n")
-    time.sleep(1)
+# ====== 多源合并模式使用的新闻源 ======
+MERGED_NEWS_SOURCES = {
+    '英文': fetch_latest_news_en,
+    '财联社': fetch_latest_news_cn,
+}
 
-    last_stock_update = 0
-    last_news_update = 0
-    stock_df = pd.DataFrame()
-    hk_stock_df = pd.DataFrame()  # 添加港股DataFrame
-    news_list = []
+# ====== 并发刷新：到期的数据源提交到线程池后立即返回，完成时唤醒主循环 ======
+_fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='fetch')
+_pending_fetches = {}  # 源名称 -> 尚未取回的 Future（跨轮次保留）
+_source_errors = {}    # 源名称 -> 最近一次未经熔断器记录的异常（显示在画面底部）
+
+def submit_sources(jobs):
+    """
+    并发执行 jobs（源名称 -> 无参函数），不等待结果。
+    同一源上一次还没结束时不重复提交，避免慢源堆积请求。
+    """
+    for name, job in jobs.items():
+        if name not in _pending_fetches:
+            future = _fetch_pool.submit(timed_job, name, job)
+            future.add_done_callback(lambda f: _wakeup.set())
+            _pending_fetches[name] = future
+
+def timed_job(name, job):
+    """执行一个数据源的刷新，记录耗时和失败次数（熔断快速失败不计）"""
+    with _metrics.timer('monitor_refresh_seconds', source=name):
+        try:
+            return job()
+        except CircuitOpenError:
+            raise
+        except Exception:
+            _metrics.inc('monitor_refresh_errors_total', source=name)
+            raise
+
+def collect_sources():
+    """
+    取回已完成的数据源结果 {源名称: 结果}，未完成的留到下次。
+    失败的源不出现在结果中，调用方继续使用上一次成功的数据；
+    错误不打印（画面随后会被重绘），在画面底部显示。
+    """
+    results = {}
+    for name, future in list(_pending_fetches.items()):
+        if not future.done():
+            continue
+        del _pending_fetches[name]
+        try:
+            results[name] = future.result()
+            _source_errors.pop(name, None)
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            _source_errors[name] = e
+    return results
 
-    while not stop_flag:
-        now = time.time()
-        prices = fetch_prices_from_gate()
-        ny_time, phase, active_price_key, active_change_key = detect_session()
+def fetch_hk_stocks():
+    """读取港股列表并获取行情（持仓同步到持仓簿）"""
+    us_tickers, hk_tickers, marks, cost_and_shares = read_stocks(STOCK_FILE)
+    if not hk_tickers:
+        return QuoteTable()
+    hk_set = set(hk_tickers)
+    sync_stock_positions('hk', {t: p for t, p in cost_and_shares.items() if t in hk_set})
+    return get_hk_stock_price(hk_tickers, marks, _position_book)
+
+# ====== 画面构建（只生成行列表，由差分渲染器输出变化部分） ======
+NEWS_BREAKER_KEYS = {1: ('news_en',), 2: ('news_cn',), 3: ('news_en', 'news_cn')}
+
+def format_age(seconds):
+    """把秒数格式化为 12秒前 / 3分钟前 / 2小时前"""
+    if seconds < 60:
+        return f"{seconds:.0f}秒前"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f}分钟前"
+    return f"{seconds // 3600:.0f}小时前"
+
+def stale_note(*keys):
+    """上游异常时在标题后注明数据的更新时间（正常时返回空字符串）"""
+    ages = []
+    for key in keys:
+        breaker = SOURCE_BREAKERS[key]
+        if breaker.failures and breaker.age() is not None:
+            ages.append(breaker.age())
+    return f"（{format_age(max(ages))}的数据）" if ages else ""
+
+def status_lines():
+    """画面底部的最近提醒与错误/熔断状态"""
+    lines = [f"🔔 {datetime.fromtimestamp(a.ts):%H:%M:%S} {a.text}" for a in reversed(_recent_alerts)]
+    lines += [f"⚠️ {status}" for status in (b.status() for b in SOURCE_BREAKERS.values()) if status]
+    for name, error in _source_errors.items():
+        breaker = SOURCE_BREAKERS.get(name)
+        if breaker is None or error is not breaker.last_error:
+            lines.append(f"⚠️ {name} 数据获取异常: {str(error)[:60]}")
+    if _news_translator is not None:
+        if getattr(_news_translator.backend, 'reason', None):
+            lines.append(f"⚠️ {_news_translator.backend.reason[:60]}")
+        if _news_translator.last_error is not None:
+            lines.append(f"⚠️ 新闻翻译失败: {str(_news_translator.last_error)[:60]}")
+    if args is not None and args.metrics:
+        lines.append(metrics_line())
+    return lines
+
+# ====== 运行指标汇总 ======
+def sync_metrics():
+    """把各模块自己累计的数值（缓存命中、重试、对冲、熔断状态）同步到指标，输出前调用"""
+    for cache_name, cache in (('美股', _stock_cache), ('港股', _hk_cache)):
+        for result in ('hit', 'stale', 'miss'):
+            _metrics.set_counter('monitor_cache_requests_total', cache.stats[result], cache=cache_name, result=result)
+        _metrics.set_counter('monitor_cache_retries_total', cache.stats['retry'], cache=cache_name)
+    if _news_translator is not None:
+        for result in ('hit', 'miss'):
+            _metrics.set_counter('monitor_cache_requests_total', _news_translator.stats[result],
+                                 cache='翻译', result=result)
+        _metrics.set_counter('monitor_translation_errors_total', _news_translator.stats['error'])
+    hedger = _stock_cache.fetch_many
+    if isinstance(hedger, HedgedFetcher):
+        _metrics.set_counter('monitor_hedged_requests_total', hedger.hedged)
+        _metrics.set_counter('monitor_hedge_secondary_wins_total', hedger.secondary_wins)
+    for breaker in SOURCE_BREAKERS.values():
+        _metrics.set('monitor_breaker_open', int(breaker.state != CLOSED), source=breaker.name)
+
+def prometheus_text():
+    """Prometheus 文本格式的全部指标（--serve 的 GET /metrics）"""
+    sync_metrics()
+    return _metrics.render_prometheus()
+
+def write_metrics_file():
+    """--metrics-file：原子写入 Prometheus 文本（写入失败不影响监控）"""
+    sync_metrics()
+    try:
+        _metrics.write_prometheus(args.metrics_file)
+    except OSError:
+        pass
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.1f}s"
+
+def cache_hit_ratio(cache_name):
+    """不需要同步请求的比例（命中 + 过期先返回），没有查询返回 None"""
+    counts = {dict(labels)['result']: n for labels, n in _metrics.series('monitor_cache_requests_total').items()
+              if dict(labels)['cache'] == cache_name}
+    total = sum(counts.values())
+    return (counts.get('hit', 0) + counts.get('stale', 0)) / total if total else None
+
+def metrics_line():
+    """--metrics 底部指标行：各上游耗时 p50/p95、缓存命中率、渲染耗时、失败与重试次数"""
+    sync_metrics()
+    parts = []
+    for labels, histogram in sorted(_metrics.series('monitor_upstream_request_seconds').items()):
+        parts.append(f"{dict(labels)['source']} {format_seconds(histogram.quantile(0.5))}"
+                     f"/{format_seconds(histogram.quantile(0.95))}")
+    for cache_name in ('美股', '港股', '翻译'):
+        ratio = cache_hit_ratio(cache_name)
+        if ratio is not None:
+            parts.append(f"{cache_name}缓存 {ratio:.0%}")
+    render = _metrics.value('monitor_render_seconds')
+    if render is not None:
+        parts.append(f"渲染 {format_seconds(render.quantile(0.5))}")
+    errors = sum(_metrics.series('monitor_upstream_errors_total').values())
+    retries = sum(_metrics.series('monitor_cache_retries_total').values())
+    parts.append(f"失败 {errors} 重试 {retries}")
+    return "📈 " + " | ".join(parts)
+
+def format_quote_columns(rows, name_width, price_width, change_width, gap, extra=()):
+    """把 [(名称, 价格, 涨跌, *附加列)] 排成左右两列，返回表头 + 数据行；extra 为附加列的 [(表头, 宽度)]"""
+    def cell(name, price, change, *more):
+        text = (f"{pad_width(truncate_width(name, name_width), name_width)} "
+                f"{pad_width(price, price_width)} {pad_width(change, change_width)}")
+        for value, (_, width) in zip(more, extra):
+            text += f" {pad_width(value, width)}"
+        return text
 
-        # 检查是否需要手动刷新
-        force_refresh = manual_refresh_flag
-        if manual_refresh_flag:
-            manual_refresh_flag = False  # 重置标志
+    mid_point = (len(rows) + 1) // 2
+    left_rows, right_rows = rows[:mid_point], rows[mid_point:]
 
-        # 每10分钟更新一次美股数据（或第一次或手动刷新）
-        if now - last_stock_update > STOCK_REFRESH_INTERVAL or stock_df.empty or force_refresh:
-            stock_df = fetch_all_stocks(STOCK_FILE, active_price_key, active_change_key)
-            
-            # 同时获取港股数据
-            us_tickers, hk_tickers, marks, cost_and_shares = read_stocks(STOCK_FILE)
-            if hk_tickers:
-                hk_stock_df = get_hk_stock_price(hk_tickers, marks, cost_and_shares)
-            
-            last_stock_update = now
-
-        # 每5分钟更新一次新闻数据（或第一次或手动刷新）
-        if now - last_news_update > NEWS_REFRESH_INTERVAL or not news_list or force_refresh:
-            # 根据show_more_news标志决定显示数量
-            news_count = 10 if show_more_news else 5
-            news_list = fetch_latest_news(news_count)
-            last_news_update = now
-            
-            # 如果是手动刷新触发的，在下一个周期重置为默认显示数量
-            if force_refresh and show_more_news:
-                # 设置一个标志，在下一个自动刷新周期重置
-                pass
-
-        clear_screen()
-        
-        print("=== 综合行情显示 ===")
-        # print(f"⏰ 本地时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        # print(f"   美东时间: {ny_time}  - {phase}  (使用: {active_price_key} / {active_change_key})\n")
-        print()
-
-        # 新闻部分 - 第一位
-        if news_list:
-            news_count_display = len(news_list)
-            news_source_name = "英文新闻" if current_news_source == 1 else "财联社"
-            print(f"📰 最新财经新闻（{news_source_name} - 最近{news_count_display}条）:")
-            print("-" * 70)
-            for i, news in enumerate(news_list, 1):
-                print(f"{news['time']} {news['importance']} {news['content']}")
+    header = cell("Name", "Price", "Change", *(title for title, _ in extra))
+    lines = [f"{header}{gap}{header}"]
+    lines.append("-" * (2 * display_width(header) + len(gap)))
+    for i, left in enumerate(left_rows):
+        left_str = cell(*left)
+        if i < len(right_rows):
+            lines.append(f"{left_str}{gap}{cell(*right_rows[i])}")
         else:
-            print("📰 新闻获取失败")
-
-        print()
-
-        # 美股部分 - 第二位：只显示当前时段 price + change
-        if not stock_df.empty:
-            df_sorted = stock_df.copy()
-
-            # 把 Change 字符串转换为数值用于排序（将 "N/A" 视作 0）
-            def parse_pct(s):
-                try:
-                    return float(str(s).replace("%", "").replace("+", ""))
-                except Exception:
-                    return 0.0
-
-            df_sorted["val"] = df_sorted["Change"].apply(parse_pct)
-            df_sorted = df_sorted.sort_values(by=["Priority", "val"], ascending=[False, False]).drop(columns=["Priority", "val"])
-
-            # add arrow
-            def add_arrow(s):
-                if str(s).startswith("+"):
-                    return s + " "
-                elif str(s).startswith("-"):
-                    return s + " "
-                else:
-                    return s + " "
-                return s
+            lines.append(left_str)
+    return lines
+
+def rank_quotes(stock_df, limit=0, page=0):
+    """
+    按 优先级↓、涨跌幅↓（缺失视为 0）排序并取出一页，返回 (该页的行, 页码, 总页数)。
+    整列 lexsort，几千个代码也只需毫秒级；limit=0 表示全部。
+    """
+    change = np.nan_to_num(stock_df["Change"], nan=0.0)
+    order = np.lexsort((-change, -stock_df["Priority"]))
+    pages = 1
+    if limit > 0:
+        pages = max(1, -(-len(order) // limit))
+        page = min(page, pages - 1)
+        order = order[page * limit:(page + 1) * limit]
+    else:
+        page = 0
+    return stock_df.take(order), page, pages
+
+INDICATOR_DISPLAY = [("RSI", 3), ("MACD", 6), ("MA", 2)]
+
+def format_indicator_cells(view):
+    """指标列：RSI 取整、MACD 柱、价格相对 MA20 的方向（▲ 在上方 / ▼ 在下方）"""
+    cells = []
+    for price, rsi, hist, ma20 in zip(view["Price"], view["RSI"], view["MACD"], view["MA20"]):
+        rsi_s = "-" if np.isnan(rsi) else f"{rsi:.0f}"
+        hist_s = "-" if np.isnan(hist) else f"{hist:+.2f}"
+        ma_s = "-" if np.isnan(ma20) or np.isnan(price) else ("▲" if price >= ma20 else "▼")
+        cells.append((rsi_s, hist_s, ma_s))
+    return cells
+
+def with_indicators(rows, view):
+    """有指标列时把指标单元格接到每行后面，返回 (行, 附加列定义)"""
+    if "RSI" not in view.columns:
+        return rows, ()
+    return [row + cells for row, cells in zip(rows, format_indicator_cells(view))], INDICATOR_DISPLAY
+
+def format_us_rows(view):
+    """把可见的美股行格式化为 [(代码, 价格, 涨跌%(浮盈亏))]"""
+    rows = []
+    for ticker, mark, price, change, pnl in zip(view["Ticker"], view["Mark"], view["Price"],
+                                                view["Change"], view["PnL"]):
+        # 没有标记的股票用两个空格占位，与 emoji 宽度对齐
+        ticker_display = f"{mark}{ticker}" if mark else f"  {ticker}"
+        price_s = "N/A" if np.isnan(price) else f"{price:.2f}"
+        change_s = "N/A" if np.isnan(change) else f"{change:+.2f}%"
+        if not np.isnan(pnl):
+            change_s += f"({pnl:+.2f})"
+        rows.append((ticker_display, price_s, f"{change_s} "))
+    return rows
+
+def format_hk_rows(view):
+    """把港股行格式化为 [(名称, 价格, 涨跌%(浮盈亏))]"""
+    rows = []
+    for name, mark, price, change, pnl in zip(view["Name"], view["Mark"], view["Price"],
+                                              view["Change"], view["PnL"]):
+        name_display = f"{mark}{name}" if mark else f"  {name}"
+        price_s = "N/A" if np.isnan(price) else f"{price:.2f}"
+        change_s = f"{change:+.2f}%" if not np.isnan(change) and change != 0 else "0.00%"
+        if not np.isnan(pnl):
+            change_s += f"({pnl:+.2f})"
+        rows.append((name_display, price_s, change_s))
+    return rows
+
+def collect_status():
+    """各板块标题后的数据时间注释和底部状态行（--serve 时随数据一起分发）"""
+    return {
+        'notes': {
+            'news': stale_note(*NEWS_BREAKER_KEYS.get(current_news_source, ('news_cn',))),
+            'us': stale_note('us'),
+            'hk': stale_note('hk'),
+            'crypto': "" if _crypto_stream.is_fresh() else stale_note('crypto'),
+            **{name: f"（启动缓存，{format_age(time.time() - saved_at)}的数据）"
+               for name, saved_at in _snapshot_sections.items()},
+        },
+        'positions': position_summary_line(),
+        'lines': status_lines(),
+    }
+
+def build_screen(news_list, stock_df, hk_stock_df, prices, status=None):
+    """生成一整帧画面的行列表（status 为 collect_status() 的结果，默认取本进程的状态）"""
+    status = status or collect_status()
+    notes = status.get('notes', {})
+    lines = ["=== 综合行情显示 ===", ""]
+
+    # 新闻部分 - 第一位
+    if news_list:
+        news_source_name = {1: "英文新闻", 3: "多源合并"}.get(current_news_source, "财联社")
+        lines.append(f"📰 最新财经新闻（{news_source_name} - 最近{len(news_list)}条）{notes.get('news', '')}:")
+        lines.append("-" * 70)
+        for news in news_list:
+            if current_news_source == 3:
+                lines.append(f"{news['time']} {news['importance']} [{news['source']}] {news['content']}")
+            else:
+                lines.append(f"{news['time']} {news['importance']} {news['content']}")
+    else:
+        lines.append("📰 新闻获取失败")
+    lines.append("")
+
+    # 美股部分 - 第二位：只显示当前时段 price + change
+    if not stock_df.empty:
+        # 数值列直接排序，只格式化当前页的行
+        view, page, pages = rank_quotes(stock_df, args.top, us_page)
+        page_note = f"（第 {page + 1}/{pages} 页，N/P 翻页）" if pages > 1 else ""
+        lines.append(f"📊 美股行情（当前时段价格 & 涨跌%）{page_note}{notes.get('us', '')}:")
+        rows, extra = with_indicators(format_us_rows(view), view)
+        lines.extend(format_quote_columns(rows, 12, 6, 8, "    ", extra))
+    else:
+        lines.append("📊 未找到美股列表 (请创建 stocks.txt)")
+    lines.append("")
+
+    # 港股部分 - 第三位：与美股相同按 优先级↓、涨跌幅↓ 排序，名称截断到 10 个显示单位（标记 + 约4个中文字符）
+    if not hk_stock_df.empty:
+        view, _, _ = rank_quotes(hk_stock_df)
+        lines.append(f"🏢 港股行情{notes.get('hk', '')}:")
+        rows, extra = with_indicators(format_hk_rows(view), view)
+        lines.extend(format_quote_columns(rows, 10, 6, 6, "  ", extra))
+        lines.append("")
+
+    lines.append(f"💰 虚拟币行情（Gate.io）{notes.get('crypto', '')}：")
+    for sym in (pair_to_symbol(pair) for pair in CRYPTO_PAIRS):
+        price = prices.get(sym)
+        if price is None:
+            lines.append(f"{sym}: 获取失败")
+            continue
+        position = _position_book.peek('crypto', sym, price)
+        if position:
+            cost, qty, pnl, roi_pct = position
+            pos = "多头" if qty > 0 else "做空"
+            lines.append(f"{sym}: {price:,.2f} | 成本 {cost:,.2f}*{abs(qty):g} {pos} | 盈亏 {pnl:+.2f} (ROI {roi_pct:+.2f}%)")
+        else:
+            lines.append(f"{sym}: {price:,.2f}")
 
-            df_sorted["Change"] = df_sorted["Change"].apply(add_arrow)
+    if status.get('positions'):
+        lines.append(status['positions'])
 
-            print(f"📊 美股行情（当前时段价格 & 涨跌%）:")
-            
-            # 两列显示：将股票分成两组
-            total_stocks = len(df_sorted)
-            mid_point = (total_stocks + 1) // 2
-            
-            left_df = df_sorted.iloc[:mid_point].reset_index(drop=True)
-            right_df = df_sorted.iloc[mid_point:].reset_index(drop=True)
-            
-            # 格式化左右两列的字符串
-            left_strings = []
-            right_strings = []
-            
-            for i in range(max(len(left_df), len(right_df))):
-                # 左列
-                if i < len(left_df):
-                    row = left_df.iloc[i]
-                    # 截断股票名字以适应显示宽度
-                    if 'Name' in row:
-                        name_display = row['Name'][:6] if get_display_width(row['Name']) > 12 else row['Name']
-                    else:
-                        name_display = row['Ticker']  # 如果没有Name列，使用Ticker
-                    
-                    name_formatted = format_with_width(name_display, 12)
-                    price_formatted = format_with_width(str(row['Price']), 6)
-                    change_formatted = format_with_width(str(row['Change']), 8)
-                    left_str = f"{name_formatted} {price_formatted} {change_formatted}"
-                else:
-                    left_str = " " * 26
-                left_strings.append(left_str)
-                
-                # 右列
-                if i < len(right_df):
-                    row = right_df.iloc[i]
-                    # 截断股票名字以适应显示宽度
-                    if 'Name' in row:
-                        name_display = row['Name'][:6] if get_display_width(row['Name']) > 12 else row['Name']
-                    else:
-                        name_display = row['Ticker']  # 如果没有Name列，使用Ticker
-                    
-                    name_formatted = format_with_width(name_display, 12)
-                    price_formatted = format_with_width(str(row['Price']), 6)
-                    change_formatted = format_with_width(str(row['Change']), 8)
-                    right_str = f"{name_formatted} {price_formatted} {change_formatted}"
-                else:
-                    right_str = ""
-                right_strings.append(right_str)
-            
-            # 打印表头
-            header_name = format_with_width("Name", 12)
-            header_price = format_with_width("Price", 6)
-            header_change = format_with_width("Change", 8)
-            header_left = f"{header_name} {header_price} {header_change}"
-            header_right = f"{header_name} {header_price} {header_change}"
-            print(f"{header_left}    {header_right}")
-            print("-" * 60)
-            
-            # 打印数据行
-            for left, right in zip(left_strings, right_strings):
-                if right.strip():
-                    print(f"{left}    {right}")
-                else:
-                    print(left)
-        else:
-            print("📊 未找到美股列表 (请创建 stocks.txt)")
+    lines.append("")
+    lines.extend(status.get('lines', []))
+    lines.append("按 Q 退出 | 按 W 手动刷新 | 按 M 切换新闻数量" + (" | 按 N/P 翻页" if args.top else ""))
+    return lines
 
-        print()
+# ====== 行情表与 JSON 互转（--serve / --connect 分发用） ======
+TABLE_NUMERIC_COLUMNS = {"Price", "Change", "PrevClose", "PnL"} | set(INDICATOR_COLUMNS)
 
-        # 港股部分 - 第三位：显示港股价格和涨跌幅
-        if not hk_stock_df.empty:
-            print(f"🏢 港股行情:")
-            
-            # 按涨跌幅排序，涨幅大的在前面
-            # 将Change列的字符串格式（如"+2.50%"）转换为数值进行排序
-            def parse_change(change_str):
-                try:
-                    # 移除%符号并转换为浮点数
-                    return float(change_str.replace('%', ''))
-                except:
-                    return 0.0
-            
-            hk_stock_df['change_numeric'] = hk_stock_df['Change'].apply(parse_change)
-            hk_stock_df_sorted = hk_stock_df.sort_values('change_numeric', ascending=False).reset_index(drop=True)
-            # 删除临时列
-            hk_stock_df_sorted = hk_stock_df_sorted.drop('change_numeric', axis=1)
-            
-            # 两列显示：将港股分成两组
-            total_hk_stocks = len(hk_stock_df_sorted)
-            mid_point = (total_hk_stocks + 1) // 2
-            
-            left_df = hk_stock_df_sorted.iloc[:mid_point].reset_index(drop=True)
-            right_df = hk_stock_df_sorted.iloc[mid_point:].reset_index(drop=True)
-            
-            # 格式化左右两列的字符串
-            left_strings = []
-            right_strings = []
-            
-            for i in range(max(len(left_df), len(right_df))):
-                # 左列
-                if i < len(left_df):
-                    row = left_df.iloc[i]
-                    # 截断股票名字以适应显示宽度 - 缩小到3个中文字符（6个显示单位）
-                    if 'Name' in row:
-                        name_display = row['Name']
-                        if get_display_width(name_display) > 8:
-                            # 截断到6个显示单位（约3个中文字符）
-                            truncated = ""
-                            for char in name_display:
-                                if get_display_width(truncated + char) <= 8:
-                                    truncated += char
-                                else:
-                                    break
-                            name_display = truncated
-                    else:
-                        name_display = row['Ticker']  # 如果没有Name列，使用Ticker
-                    
-                    name_formatted = format_with_width(name_display, 8)
-                    price_formatted = format_with_width(str(row['Price']), 5)
-                    change_formatted = format_with_width(str(row['Change']), 6)
-                    left_str = f"{name_formatted} {price_formatted} {change_formatted}"
-                else:
-                    left_str = " " * 18
-                left_strings.append(left_str)
-                
-                # 右列
-                if i < len(right_df):
-                    row = right_df.iloc[i]
-                    # 截断股票名字以适应显示宽度 - 缩小到3个中文字符（6个显示单位）
-                    if 'Name' in row:
-                        name_display = row['Name']
-                        if get_display_width(name_display) > 8:
-                            # 截断到6个显示单位（约3个中文字符）
-                            truncated = ""
-                            for char in name_display:
-                                if get_display_width(truncated + char) <= 8:
-                                    truncated += char
-                                else:
-                                    break
-                            name_display = truncated
-                    else:
-                        name_display = row['Ticker']  # 如果没有Name列，使用Ticker
-                    
-                    name_formatted = format_with_width(name_display, 6)
-                    price_formatted = format_with_width(str(row['Price']), 5)
-                    change_formatted = format_with_width(str(row['Change']), 6)
-                    right_str = f"{name_formatted} {price_formatted} {change_formatted}"
-                else:
-                    right_str = ""
-                right_strings.append(right_str)
-            
-            # 打印表头
-            header_name = format_with_width("Name", 6)
-            header_price = format_with_width("Price", 5)
-            header_change = format_with_width("Change", 6)
-            header_left = f"{header_name} {header_price} {header_change}"
-            header_right = f"{header_name} {header_price} {header_change}"
-            print(f"{header_left}  {header_right}")
-            print("-" * 38)
-            
-            # 打印数据行
-            for left, right in zip(left_strings, right_strings):
-                if right.strip():
-                    print(f"{left}  {right}")
-                else:
-                    print(left)
+def table_to_json(df):
+    """QuoteTable -> {列名: 值列表}（NaN 转为 null）"""
+    return df.to_json()
 
-        print()
+def table_from_json(data):
+    """table_to_json 的逆操作，数值列恢复为 float（null 为 NaN）"""
+    return QuoteTable.from_json(data, TABLE_NUMERIC_COLUMNS)
 
-        print("💰 虚拟币行情（Gate.io）：")
-        symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
-        for sym in symbols:
-            price = prices.get(sym)
-            if price is None:
-                print(f"{sym}: 获取失败")
-            else:
-                pos_info = crypto_positions.get(sym, {"cost": 0.0, "size": 0.0})
-                cost = pos_info.get("cost", 0.0)
-                size = pos_info.get("size", 0.0)
-                if size and cost:
-                    notional = abs(cost) * size
-                    margin = notional
-                    if cost > 0:
-                        pnl = (price - cost) * size
-                        roi_pct = (pnl / margin) * 100 if margin else 0.0
-                        pos = "多头"
-                        cdisp = cost
-                    else:
-                        pnl = (abs(cost) - price) * size
-                        roi_pct = (pnl / margin) * 100 if margin else 0.0
-                        pos = "做空"
-                        cdisp = abs(cost)
-                    print(f"{sym}: {price:,.2f} | 成本 {cdisp:,.2f}*{size} {pos} | 盈亏 {pnl:+.2f} (ROI {roi_pct:+.2f}%)")
-                else:
-                    print(f"{sym}: {price:,.2f}")
+# ====== 启动缓存：保存最近一次的数据，下次启动时先显示，不等网络 ======
+SNAPSHOT_FILE = "monitor_snapshot.json"
+SNAPSHOT_SAVE_INTERVAL = 30       # 保存间隔（秒），退出时也保存
+SNAPSHOT_SECTIONS = ('news', 'us', 'hk', 'crypto')
+_snapshot_sections = {}           # 仍在显示启动缓存的板块 -> 数据时间（取到新数据后移除）
+
+def save_snapshot(news_list, stock_df, hk_stock_df, prices):
+    """原子写入启动缓存；仍是启动缓存的板块保留原来的数据时间"""
+    now = time.time()
+    data = {'news': news_list, 'us': table_to_json(stock_df), 'hk': table_to_json(hk_stock_df), 'crypto': prices}
+    snapshot = {
+        'news_source': current_news_source,
+        'sections': {name: {'saved_at': _snapshot_sections.get(name, now), 'data': data[name]}
+                     for name in SNAPSHOT_SECTIONS if data[name]},
+    }
+    tmp_path = SNAPSHOT_FILE + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, SNAPSHOT_FILE)
+    except OSError:
+        pass
+
+def load_snapshot():
+    """读取启动缓存，返回 {板块: 数据}（新闻源不同时不使用缓存的新闻；没有缓存返回空字典）"""
+    try:
+        with open(SNAPSHOT_FILE, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    sections = snapshot.get('sections', {})
+    if snapshot.get('news_source') != current_news_source:
+        sections.pop('news', None)
+    loaded = {}
+    for name, entry in sections.items():
+        data = entry.get('data')
+        if name in ('us', 'hk'):
+            if 'Priority' not in data:
+                continue            # 旧版本保存的港股表没有标记/优先级列
+            # 没有开启 --indicators 时不显示缓存中的指标列
+            data = table_from_json({k: v for k, v in data.items() if args.indicators or k not in INDICATOR_COLUMNS})
+        loaded[name] = data
+        _snapshot_sections[name] = entry.get('saved_at', 0)
+    return loaded
+
+# ====== 录制 / 回放 ======
+def open_upstream_tap():
+    """--capture / --replay：把所有上游请求换成录制/回放替身"""
+    global _http_backend, _upstream_tap
+    from replay import Capture, Replay
+    if args.capture:
+        tap = Capture(args.capture)
+    elif args.replay:
+        tap = Replay(args.replay, speed=args.replay_speed)
+    else:
+        return None
+    _http_backend = tap.get
+    if isinstance(_stock_cache.fetch_many, HedgedFetcher):
+        # 对冲时只替换主源，备用源经 http_get 已被录制/回放
+        tapped = tap.wrap('yahoo', fetch_yahoo_quotes)
+        _stock_cache.fetch_many.primary = lambda t: SOURCE_BREAKERS['us'].call(tapped, t)
+    else:
+        _stock_cache.fetch_many = tap.wrap('yahoo', fetch_yahoo_quotes)
+    _upstream_tap = tap
+    return tap
 
-        print()
+# ====== 主循环 ======
+def main(hub=None):
+    """抓取并显示；传入 hub（--serve）时不显示，只把数据发布给显示终端"""
+    global stop_flag, manual_refresh_flag, show_more_news, current_news_source, _tick_recorder, _live_indicators
+    if hub is None:
+        threading.Thread(target=key_listener, daemon=True).start()
+    if args.record_ticks:
+        _tick_recorder = TickRecorder(args.record_ticks, capacity=args.tick_capacity)
+    if args.indicators:
+        _live_indicators = LiveIndicators()
+        seeded = _live_indicators.load_seeds(INDICATOR_SEED_FILE)
+        print(f"实时指标周期 {args.indicators}，{seeded} 个代码已用 {INDICATOR_SEED_FILE} 预热")
+    load_crypto_positions()
+    if _alert_engine.poll_file(args.alerts) and _alert_engine.rule_count:
+        print(f"已加载 {_alert_engine.rule_count} 条提醒规则（{args.alerts}）")
+    notifier = AlertNotifier(args.alert_notify if hub is None else 'none')
+    if open_upstream_tap():
+        print(f"{'录制上游响应到' if args.capture else '回放上游响应自'} {args.capture or args.replay}")
 
+    # 显示当前新闻源设置
+    current_source_name = {1: "英文新闻源", 3: "多源合并"}.get(current_news_source, "财联社中文新闻源")
+    print(f"当前新闻源: {current_source_name}")
+    if hub is None:
+        print("按 Q 退出程序，按 W 手动刷新所有数据，按 M 切换新闻数量.\n")
 
+    # 启动虚拟币 WebSocket 推送（录制/回放时只用轮询，推送不经过替身）
+    if not args.no_crypto_stream and _upstream_tap is None and not _crypto_stream.start():
+        print("⚠️ 未安装 websocket-client，虚拟币行情使用轮询模式")
 
-        #print(f"\n(虚拟币每{CRYPTO_REFRESH_INTERVAL}秒刷新 | 美股每{STOCK_REFRESH_INTERVAL//60}分钟刷新 | 新闻每{NEWS_REFRESH_INTERVAL//60}分钟刷新)")
-        print("按 Q 退出 | 按 W 手动刷新 | 按 M 切换新闻数量")
-        
-        # 在循环中检查是否需要重置新闻显示数量
-        for i in range(MAIN_LOOP_INTERVAL):
-            if stop_flag:
-                break
-            # 如果用户按下 W 请求手动刷新，则立即跳出等待循环
+    last_crypto_update = 0
+    scheduler = PollingScheduler(SOURCE_CADENCE)
+    stock_df = QuoteTable()
+    hk_stock_df = QuoteTable()
+    news_list = []
+    prices = {}
+    # 先用上次保存的数据画出第一帧（回放时不读写启动缓存）
+    cached = load_snapshot() if not args.replay else {}
+    news_list = cached.get('news', news_list)
+    stock_df = cached.get('us', stock_df)
+    hk_stock_df = cached.get('hk', hk_stock_df)
+    prices = cached.get('crypto', prices)
+    last_snapshot = time.time()
+    last_metrics_write = 0
+    fetched = False
+    renderer = ScreenRenderer() if hub is None else None
+    watchlist = get_watchlist(STOCK_FILE)
+    threading.Thread(target=watch_files, args=(watchlist, args.alerts), daemon=True).start()
+    show_more_until = 0
+    last_render = 0
+    redraw = True   # 本轮是否需要重新生成画面（没有任何变化的唤醒不重绘）
+
+    # 收尾放在 finally 中：--serve 时 Ctrl+C（KeyboardInterrupt）也会保存启动缓存、写指标、关闭记录文件
+    try:
+        while not stop_flag:
+            _wakeup.clear()
+            now = time.time()
+            ny_time, phase, active_price_key, active_change_key = detect_session()
+
+            # 检查是否需要手动刷新
+            force_refresh = manual_refresh_flag
             if manual_refresh_flag:
-                break
-            # 在自动刷新周期中重置show_more_news标志
-            if i == MAIN_LOOP_INTERVAL//2 and show_more_news and not manual_refresh_flag:
+                manual_refresh_flag = False  # 重置标志
+
+            # 按 M 显示更多新闻，一段时间后自动恢复默认条数
+            if show_more_news and not show_more_until:
+                show_more_until = now + SHOW_MORE_NEWS_DURATION
+            elif show_more_until and now >= show_more_until:
                 show_more_news = False
-            time.sleep(1)
+                redraw = True
+            if not show_more_news:
+                show_more_until = 0
+
+            # stocks.txt 有变化：清理已删除代码的行情缓存；行情缓存按代码保存，
+            # 立即刷新时只有新增代码会真正请求接口，持仓/标记变化只需重算
+            # （文件由 watch_files 在后台检查，有变化时才唤醒；这里只是取走累计的变化）
+            watch_diff = watchlist.poll()
+            stocks_changed = bool(watch_diff)
+            if watch_diff:
+                _stock_cache.evict(watch_diff.removed)
+                _hk_cache.evict(watch_diff.removed)
+
+            jobs = {}
+
+            # 虚拟币：推送数据新鲜时直接读内存，否则按 CRYPTO_REFRESH_INTERVAL 轮询
+            if not _crypto_stream.is_fresh() and (now - last_crypto_update > CRYPTO_REFRESH_INTERVAL or force_refresh):
+                jobs['crypto'] = fetch_prices_from_gate
+                last_crypto_update = now
+
+            # 美股/港股按各自交易时段的间隔刷新（或第一次、手动刷新、自选股变化、空数据重试）
+            stock_jobs = {
+                'us': lambda pk=active_price_key, ck=active_change_key: fetch_all_stocks(STOCK_FILE, pk, ck),
+                'hk': fetch_hk_stocks,
+            }
+            if (scheduler.is_due('us', now) or force_refresh or stocks_changed
+                    or (stock_df.empty and scheduler.since('us', now) > MAIN_LOOP_INTERVAL)):
+                jobs['us'] = stock_jobs['us']
+                scheduler.mark('us', now)
+            if scheduler.is_due('hk', now) or force_refresh or stocks_changed:
+                jobs['hk'] = stock_jobs['hk']
+                scheduler.mark('hk', now)
+            # 过期行情在后台刷新完成后，从缓存重新生成表格（不发请求；暂停时段也能显示收盘后取到的数据）
+            for source in ('us', 'hk'):
+                if source in _quotes_refreshed and source not in _pending_fetches:
+                    _quotes_refreshed.discard(source)
+                    jobs[source] = stock_jobs[source]
+
+            # 新闻：美股非休市时每5分钟、休市时每30分钟（或第一次、手动刷新、空数据重试）
+            if (scheduler.is_due('news', now) or force_refresh
+                    or (not news_list and scheduler.since('news', now) > MAIN_LOOP_INTERVAL)):
+                # 根据show_more_news标志决定显示数量（分发时总是取 10 条，由各显示终端决定显示几条）
+                news_count = 10 if show_more_news or hub is not None else 5
+                jobs['news'] = lambda n=news_count: fetch_latest_news(n)
+                scheduler.mark('news', now)
+
+            # 所有源并发抓取，不阻塞画面；先用已有数据绘制，每个源到达后再唤醒重绘
+            submit_sources(jobs)
+            finished = [name for name, future in _pending_fetches.items() if future.done()]
+            results = collect_sources()
+            if 'crypto' in results:
+                prices = results['crypto']
+            if 'us' in results:
+                stock_df = results['us']
+            if 'hk' in results:
+                hk_stock_df = results['hk']
+            if 'news' in results:
+                news_list = results['news']
+            if _tick_recorder is not None:
+                record_ticks(results)
+            if _live_indicators is not None:
+                if 'us' in results:
+                    stock_df = add_indicator_columns(stock_df)
+                if 'hk' in results:
+                    hk_stock_df = add_indicator_columns(hk_stock_df)
+            if _crypto_stream.is_fresh():
+                prices = _crypto_stream.snapshot()
+            # 取到新数据的板块不再标注“启动缓存”
+            updated = set(results) | ({'crypto'} if _crypto_stream.is_fresh() else set())
+            for name in updated:
+                _snapshot_sections.pop(name, None)
+            if updated and not args.replay:
+                fetched = True
+                if now - last_snapshot >= SNAPSHOT_SAVE_INTERVAL:
+                    save_snapshot(news_list, stock_df, hk_stock_df, prices)
+                    last_snapshot = now
+            _position_book.mark_many('crypto', list(prices), list(prices.values()))
+            notifier.notify(evaluate_alerts(results, prices))
+            if args.metrics_file and now - last_metrics_write >= METRICS_WRITE_INTERVAL:
+                write_metrics_file()
+                last_metrics_write = now
+
+            # 没有新数据、按键、文件变化或定时器的唤醒不重新生成画面
+            crypto_pushed = _crypto_pushed.is_set()
+            _crypto_pushed.clear()
+            if redraw or force_refresh or stocks_changed or finished or crypto_pushed:
+                if hub is None:
+                    with _metrics.timer('monitor_render_seconds'):
+                        renderer.render(build_screen(news_list, stock_df, hk_stock_df, prices))
+                else:
+                    # 只发布本轮有更新的主题，内容未变化的不会推送
+                    if 'news' in results:
+                        hub.publish('news', {'source': current_news_source, 'items': news_list})
+                    if 'us' in results:
+                        hub.publish('us', table_to_json(stock_df))
+                    if 'hk' in results:
+                        hub.publish('hk', table_to_json(hk_stock_df))
+                    hub.publish('crypto', prices)
+                    hub.publish('status', collect_status())
+                last_render = time.time()
+
+            # 睡到最近的定时器到期，期间按键或数据到达会立即唤醒
+            timers = [
+                scheduler.seconds_until_next(now),
+                MAIN_LOOP_INTERVAL,
+            ]
+            if show_more_until:
+                timers.append(show_more_until - now)
+            if not _crypto_stream.is_fresh():
+                timers.append(last_crypto_update + CRYPTO_REFRESH_INTERVAL - now)
+            woken = _wakeup.wait(max(0.0, min(timers)))
+
+            # 推送行情引起的唤醒限制重绘频率；按键立即响应
+            key_pressed = _key_pressed.is_set()
+            if not key_pressed:
+                delay = last_render + RENDER_MIN_INTERVAL - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            _key_pressed.clear()
+            # 定时器到期（时钟、数据时间需要更新）或按键时重绘；其他唤醒看下一轮是否有新数据
+            redraw = not woken or key_pressed
+    finally:
+        if fetched:
+            save_snapshot(news_list, stock_df, hk_stock_df, prices)
+        if args.metrics_file:
+            write_metrics_file()
+        if _tick_recorder is not None:
+            _tick_recorder.close()
+        if _upstream_tap is not None:
+            _upstream_tap.close()
+        if renderer is not None:
+            renderer.close()
+    print("\n程序已退出。")
 
+# ====== 分发模式 ======
+def run_server(address):
+    """--serve：无界面抓取，通过本地 HTTP/SSE 分发给 --connect 终端"""
+    host, port = parse_address(address)
+    hub = FeedHub()
+    server = FeedServer(hub, host, port, on_refresh=request_manual_refresh, metrics=prometheus_text)
+    server.start()
+    print(f"行情分发已启动: http://{host}:{port}/events （Ctrl+C 退出）")
+    try:
+        main(hub)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+def run_viewer(url):
+    """--connect：从分发进程接收数据并显示，不直接请求上游"""
+    global manual_refresh_flag, current_news_source
+    threading.Thread(target=key_listener, daemon=True).start()
+    load_crypto_positions()
+    client = FeedClient(url, on_update=lambda topic: _wakeup.set())
+    client.start()
+    renderer = ScreenRenderer()
+    tables = {}   # 主题 -> (版本号, DataFrame)，数据没变时不重复转换
+    last_render = 0
+
+    def table(topic):
+        version = client.version(topic)
+        if topic not in tables or tables[topic][0] != version:
+            tables[topic] = (version, table_from_json(client.get(topic)))
+        return tables[topic][1]
+
+    while not stop_flag:
+        _wakeup.clear()
+        if manual_refresh_flag:
+            manual_refresh_flag = False
+            _fetch_pool.submit(client.request_refresh)
+
+        news = client.get('news') or {}
+        current_news_source = news.get('source', current_news_source)
+        news_list = news.get('items', [])[:10 if show_more_news else 5]
+        status = dict(client.get('status') or {'notes': {}, 'lines': []})
+        if not client.connected:
+            status['lines'] = list(status.get('lines', [])) + [f"⚠️ 未连接到分发进程 {url}: {client.last_error or '连接中'}"]
+
+        renderer.render(build_screen(news_list, table('us'), table('hk'), client.get('crypto') or {}, status))
+        last_render = time.time()
+
+        _wakeup.wait(MAIN_LOOP_INTERVAL)
+        if not _key_pressed.is_set():
+            delay = last_render + RENDER_MIN_INTERVAL - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        _key_pressed.clear()
+
+    client.stop()
+    renderer.close()
     print("\n程序已退出。")
 
 # ====== 启动入口 ======
 if __name__ == '__main__':
+    apply_arguments(parse_arguments())
+    if args.serve:
+        run_server(args.serve)
+        sys.exit(0)
     if os.name != 'nt':
         import termios, tty
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
         tty.setcbreak(fd)
     try:
-        main()
+        if args.connect:
+            run_viewer(args.connect)
+        else:
+            main()
     finally:
         if os.name != 'nt':
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
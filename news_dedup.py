@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+新闻近似去重：MinHash 指纹 + LSH 分桶
+
+同一事件常在财联社、mktnews、富途快讯中几分钟内重复出现，措辞略有不同。
+这里给每条新闻的 shingle 集合（中文为字符 2-gram，英文等拉丁文字为单词）计算 MinHash 签名，
+把签名切成若干段（band）做分桶，只和同桶的候选估算相似度，整体接近 O(n)，无需与全部历史两两比较。
+"""
+
+import re
+import time
+import threading
+import hashlib
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+NUM_PERM = 32                  # MinHash 签名长度
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# 固定种子生成的置换参数 (a, b)，保证各进程/各次运行的签名一致
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), 'big') % (_MERSENNE_PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), 'big') % _MERSENNE_PRIME)
+    for i in range(NUM_PERM)
+]
+
+# 各新闻源常见的固定前缀，不参与指纹计算
+_BOILERPLATE_RE = re.compile(r'^(财联社|格隆汇|金十数据)?\d{1,2}月\d{1,2}日(电|讯)[，,：:]?')
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+# 中日韩文字：按字符切分；不含这些字符的文本按单词切分
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]')
+# 英文常见虚词，不参与指纹（否则不相关的标题也会因为它们而重合）
+STOP_WORDS = frozenset("a an the of to in on at for and or by with from as is are was be it its".split())
+
+
+# ====== 指纹计算 ======
+def _strip_boilerplate(text):
+    """去掉 HTML、【标题】与来源前缀"""
+    text = re.sub(r'<[^>]+>', '', text or '')
+    text = re.sub(r'^【[^】]*】', '', text.strip())
+    return _BOILERPLATE_RE.sub('', text)
+
+
+def normalize_text(text):
+    """去掉 HTML/标点/空白与来源前缀，统一小写"""
+    return _NON_WORD_RE.sub('', _strip_boilerplate(text)).lower()
+
+
+def _shingles(text, size=2):
+    """字符级 n-gram 集合（用于中文）"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _word_shingles(text):
+    """拉丁文字的单词集合（小写、去虚词）；英文字符 2-gram 种类太少，不相关的标题也会高度重合"""
+    words = {w for w in _WORD_RE.findall(text.lower()) if w not in STOP_WORDS}
+    return words or set(_WORD_RE.findall(text.lower()))
+
+
+def minhash(text, shingle_size=2):
+    """计算 MinHash 签名（输入为原始文本），空文本返回 None"""
+    text = _strip_boilerplate(text)
+    if _CJK_RE.search(text):
+        shingles = _shingles(_NON_WORD_RE.sub('', text).lower(), shingle_size)
+    else:
+        shingles = _word_shingles(text)
+    if not shingles:
+        return None
+    base = [int.from_bytes(hashlib.blake2b(sh.encode('utf-8'), digest_size=4).digest(), 'big')
+            for sh in shingles]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in base)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(sig_a, sig_b):
+    """由签名估算 Jaccard 相似度"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+# ====== 滚动窗口去重器 ======
+class NearDuplicateFilter:
+    """
+    在滚动时间窗口内识别近似重复的新闻。
+
+    签名按 bands 段、每段 NUM_PERM // bands 行分桶：相似度高的两条新闻
+    大概率至少有一段完全相同而落入同一桶，再用 threshold 复核估算相似度。
+    """
+
+    def __init__(self, window_seconds=6 * 3600, threshold=0.5, bands=16, max_items=5000):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.bands = bands
+        self.max_items = max_items
+        self._rows = NUM_PERM // bands
+        self._order = deque()                        # (入窗时间, key)，按插入顺序
+        self._entries: Dict[str, tuple] = {}         # key -> (签名, 规范key)
+        self._buckets: Dict[tuple, set] = {}         # (段号, 段内签名) -> {key}
+        self._lock = threading.Lock()                # 多源并发抓取时共用同一个去重器
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_keys(self, sig):
+        if sig is None:
+            return []
+        r = self._rows
+        return [(i, sig[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def _evict(self, now):
+        cutoff = now - self.window_seconds
+        while self._order and (self._order[0][0] < cutoff or len(self._order) > self.max_items):
+            _, key = self._order.popleft()
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                continue
+            for bk in self._band_keys(entry[0]):
+                bucket = self._buckets.get(bk)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[bk]
+
+    def canonical(self, key, text, now=None):
+        """
+        返回该新闻所属“故事”的规范 key。
+        key 已登记过时返回它自己的规范 key（刷新时同一条不会被判为重复）；
+        与窗口内某条近似时返回那一条的规范 key；否则登记并返回自身。
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._canonical(key, text, now)
+
+    def _canonical(self, key, text, now):
+        self._evict(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry[1]
+
+        sig = minhash(text)
+        band_keys = self._band_keys(sig)
+        canon = key
+        checked = set()
+        for bk in band_keys:
+            for other in self._buckets.get(bk, ()):
+                if other in checked:
+                    continue
+                checked.add(other)
+                other_sig, other_canon = self._entries[other]
+                if similarity(sig, other_sig) >= self.threshold:
+                    canon = other_canon
+                    break
+            if canon != key:
+                break
+
+        self._entries[key] = (sig, canon)
+        self._order.append((now, key))
+        for bk in band_keys:
+            self._buckets.setdefault(bk, set()).add(key)
+        return canon
+
+    def is_duplicate(self, key, text, now=None):
+        """该新闻是否是窗口内另一条新闻的近似重复"""
+        return self.canonical(key, text, now) != key
+
+    def filter(self, items: Iterable, key: Callable, text: Callable,
+               limit: Optional[int] = None) -> List:
+        """按原顺序保留每个故事的第一条，最多 limit 条（同一 key 重复出现时只保留第一次）"""
+        result = []
+        seen = set()
+        for item in items:
+            item_key = key(item)
+            if item_key in seen:
+                continue
+            seen.add(item_key)
+            if not self.is_duplicate(item_key, text(item)):
+                result.append(item)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+
+def dedup_news(items, key, text, **kwargs):
+    """一次性去重（用于归档文件），不保留状态"""
+    return NearDuplicateFilter(window_seconds=float('inf'), max_items=float('inf'), **kwargs).filter(items, key, text)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持仓簿：美股 / 港股 / 虚拟币持仓统一存放，逐个价格增量更新盈亏与汇总
+
+- 持仓按行存放在 numpy 数组中（持仓量、开仓价、最新价、盈亏、敞口），(市场, 代码) -> 行号；
+- 每个新价格只重算该行，并把该行盈亏/敞口的变化量加到汇总上，
+  各市场的盈亏、多头/空头敞口随时可读，不需要每次刷新重扫全部持仓；
+- 各市场计价货币不同（美元 / 港币 / USDT），汇总只按市场分别累计，不跨市场相加；
+- 约定与 stocks.txt / crypto_positions 一致：开仓价为负表示做空，
+  盈亏 = (最新价 - 开仓价) * 持仓量（做空时持仓量为负）。
+- 可被抓取线程与主循环同时调用。
+"""
+
+import math
+import threading
+
+import numpy as np
+
+MARKETS = ("us", "hk", "crypto")
+MARKET_NAMES = {"us": "美股", "hk": "港股", "crypto": "虚拟币"}
+MARKET_CURRENCIES = {"us": "USD", "hk": "HKD", "crypto": "USDT"}
+
+
+class PositionBook:
+    def __init__(self, capacity=64):
+        self._lock = threading.RLock()
+        self._rows = {}                          # (市场, 代码) -> 行号
+        self._keys = []                          # 行号 -> (市场, 代码)
+        self.qty = np.zeros(capacity)            # 持仓量，做空为负
+        self.cost = np.zeros(capacity)           # 开仓价（正数）
+        self.price = np.full(capacity, np.nan)   # 最新价，未收到价格为 NaN
+        self.pnl = np.zeros(capacity)            # 未收到价格的行为 0（不计入汇总）
+        self.exposure = np.zeros(capacity)       # 持仓量 * 最新价
+        # 按市场累计（各市场货币不同，不相加）
+        self.market_pnl = dict.fromkeys(MARKETS, 0.0)
+        self.long_exposure = dict.fromkeys(MARKETS, 0.0)
+        self.short_exposure = dict.fromkeys(MARKETS, 0.0)   # 正数
+
+    def __len__(self):
+        return len(self._keys)
+
+    # ====== 汇总的增量维护 ======
+    def _contribute(self, row, sign):
+        """把一行的盈亏/敞口加到（sign=1）或移出（sign=-1）汇总"""
+        market = self._keys[row][0]
+        pnl, exposure = float(self.pnl[row]) * sign, float(self.exposure[row])
+        self.market_pnl[market] = self.market_pnl.get(market, 0.0) + pnl
+        if exposure > 0:
+            self.long_exposure[market] = self.long_exposure.get(market, 0.0) + exposure * sign
+        elif exposure < 0:
+            self.short_exposure[market] = self.short_exposure.get(market, 0.0) - exposure * sign
+
+    def _reprice(self, row, price):
+        self._contribute(row, -1)
+        self.price[row] = price
+        self.pnl[row] = (price - self.cost[row]) * self.qty[row]
+        self.exposure[row] = self.qty[row] * price
+        self._contribute(row, 1)
+
+    def _grow(self):
+        size = len(self.qty) * 2
+        self.qty = np.resize(self.qty, size)
+        self.cost = np.resize(self.cost, size)
+        self.pnl = np.resize(self.pnl, size)
+        self.exposure = np.resize(self.exposure, size)
+        price = np.full(size, np.nan)
+        price[:len(self.price)] = self.price
+        self.price = price
+
+    # ====== 持仓增删 ======
+    def set_position(self, market, symbol, cost_price, size):
+        """设置一笔持仓（开仓价为负表示做空）；开仓价或数量为 0 视为没有持仓"""
+        key = (market, symbol)
+        if not cost_price or not size:
+            self.remove(market, symbol)
+            return
+        qty = abs(size) * (-1 if cost_price < 0 else 1)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                if len(self._keys) == len(self.qty):
+                    self._grow()
+                row = len(self._keys)
+                self._rows[key] = row
+                self._keys.append(key)
+                self.price[row], self.pnl[row], self.exposure[row] = np.nan, 0.0, 0.0
+            elif self.qty[row] == qty and self.cost[row] == abs(cost_price):
+                return
+            self._contribute(row, -1)
+            self.qty[row], self.cost[row] = qty, abs(cost_price)
+            self.pnl[row] = self.exposure[row] = 0.0
+            if not math.isnan(self.price[row]):
+                self._reprice(row, self.price[row])
+
+    def remove(self, market, symbol):
+        with self._lock:
+            row = self._rows.pop((market, symbol), None)
+            if row is None:
+                return
+            self._contribute(row, -1)
+            last = len(self._keys) - 1
+            if row != last:
+                # 最后一行移到空出的位置，数组保持紧凑
+                for column in (self.qty, self.cost, self.price, self.pnl, self.exposure):
+                    column[row] = column[last]
+                self._keys[row] = self._keys[last]
+                self._rows[self._keys[row]] = row
+            self._keys.pop()
+
+    def sync(self, market, positions):
+        """用 {代码: (开仓价, 数量)} 替换某个市场的全部持仓（只改动有变化的行）"""
+        with self._lock:
+            for m, symbol in [key for key in self._keys if key[0] == market]:
+                if symbol not in positions:
+                    self.remove(m, symbol)
+            for symbol, (cost_price, size) in positions.items():
+                self.set_position(market, symbol, cost_price, size)
+
+    # ====== 标价 ======
+    def mark(self, market, symbol, price):
+        """收到一个新价格，返回该持仓的盈亏（没有持仓或价格缺失返回 NaN）"""
+        if price is None or math.isnan(price):
+            return math.nan
+        with self._lock:
+            row = self._rows.get((market, symbol))
+            if row is None:
+                return math.nan
+            if self.price[row] != price:
+                self._reprice(row, price)
+            return float(self.pnl[row])
+
+    def mark_many(self, market, symbols, prices):
+        """批量标价，返回与 symbols 对齐的盈亏数组（NaN 为没有持仓或价格缺失）"""
+        with self._lock:
+            return np.array([self.mark(market, s, p) for s, p in zip(symbols, prices)], dtype=float)
+
+    def peek(self, market, symbol, price):
+        """按给定价格计算持仓（不改变状态），返回 (开仓价, 持仓量, 盈亏, ROI%)；没有持仓返回 None"""
+        with self._lock:
+            row = self._rows.get((market, symbol))
+            if row is None:
+                return None
+            cost, qty = float(self.cost[row]), float(self.qty[row])
+        pnl = (price - cost) * qty
+        return cost, qty, pnl, pnl / (cost * abs(qty)) * 100
+
+    def summary(self):
+        """各市场（只含有持仓的市场）的汇总：{市场: {pnl, long, short, currency}}，金额为该市场的计价货币"""
+        with self._lock:
+            markets = {m for m, _ in self._keys}
+            return {
+                m: {
+                    "pnl": self.market_pnl[m],
+                    "long": self.long_exposure[m],
+                    "short": self.short_exposure[m],
+                    "currency": MARKET_CURRENCIES.get(m, ""),
+                }
+                for m in MARKETS if m in markets
+            }
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行情缓存：stale-while-revalidate + 失败短期负缓存
+
+- 有数据但已过期的代码：立即返回旧数据，后台线程刷新，刷新完成后调用 on_refresh（调用方据此重新从缓存取数）；
+- 从未取到过数据的代码：同步拉取（首屏必须有数据）；
+- 拉取失败：保留上一份好数据，只记录失败时间，negative_ttl 内不再重试；
+- 支持按代码淘汰（自选股中删除的代码）；
+- 大批量代码按 chunk_size（或调用方给的 chunker，如按 URL 长度）分块并发拉取，每块单独重试，失败的块再二分定位
+  坏代码，每块完成后立即写入缓存，一个块失败不影响其他代码；
+- 可传入熔断器（circuit_breaker.py）：上游持续失败时直接快速失败，不再重试和二分；
+- 错误不打印，最近一次记录在 last_error 中；命中/过期/未命中、重试、失败次数累计在 stats 中。
+
+TTL 由调用方按交易时段传入（盘中短、休市长）。
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable
+
+from circuit_breaker import CircuitOpenError
+
+
+def split_by_length(symbols, max_length, encode=str, sep=","):
+    """按编码后用 sep 拼接的长度分块（如 URL 长度限制），单个代码超长时单独成块"""
+    chunks, chunk, length = [], [], 0
+    for symbol in symbols:
+        size = len(encode(symbol)) + (len(sep) if chunk else 0)
+        if chunk and length + size > max_length:
+            chunks.append(chunk)
+            chunk, length, size = [], 0, len(encode(symbol))
+        chunk.append(symbol)
+        length += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class QuoteCache:
+    def __init__(self, fetch_many: Callable[[list], Dict[str, dict]], negative_ttl=10,
+                 chunk_size=50, retries=1, max_workers=8, name="quotes", breaker=None, chunker=None,
+                 on_refresh=None):
+        self.fetch_many = fetch_many        # 批量拉取函数：代码列表 -> {代码: 行情dict}
+        self.negative_ttl = negative_ttl    # 失败后多久内不再重试（秒）
+        self.chunk_size = chunk_size        # 每次请求的代码数量
+        self.chunker = chunker              # 可选的分块函数：代码列表 -> [块]（代替 chunk_size）
+        self.retries = retries              # 每块失败后的重试次数
+        self.name = name
+        self.breaker = breaker              # 可选的熔断器
+        self.on_refresh = on_refresh        # 可选：后台刷新完成后的回调（参数为刷新的代码列表）
+        self.last_error = None
+        # 按代码计：hit=不需要请求（有效期内 / 正在刷新 / 失败冷却中），stale=过期先返回旧数据，
+        # miss=没有数据需同步拉取；retry（含失败后二分）/ error 按请求计
+        self.stats = {'hit': 0, 'stale': 0, 'miss': 0, 'retry': 0, 'error': 0}
+        self._entries: Dict[str, dict] = {} # 代码 -> {'ts': 成功时间, 'data': 行情, 'err_ts': 失败时间}
+        self._inflight = set()
+        self._lock = threading.Lock()
+        # 后台刷新只负责分发，实际请求在分块线程池中执行（分开两个池避免互相等待死锁）
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"{name}-refresh")
+        self._chunk_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-chunk")
+
+    def _needs_refresh(self, symbol, ttl, now):
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return True
+        if entry['err_ts'] is not None and now - entry['err_ts'] < self.negative_ttl:
+            return False
+        return entry['data'] is None or now - entry['ts'] > ttl
+
+    def _fetch_chunk(self, chunk, retries):
+        """拉取一块并写入缓存；重试仍失败时二分，尽量只让坏代码失败"""
+        error = None
+        for attempt in range(retries + 1):
+            try:
+                if self.breaker is not None:
+                    fetched = self.breaker.call(self.fetch_many, chunk) or {}
+                else:
+                    fetched = self.fetch_many(chunk) or {}
+                self.store(fetched, chunk)
+                return
+            except CircuitOpenError as e:
+                # 熔断中：整块直接记为失败，保留旧数据
+                self.last_error = e
+                self.store({}, chunk)
+                return
+            except Exception as e:
+                error = e
+                self._count('error')
+                if attempt < retries:
+                    self._count('retry')
+                    time.sleep(0.5 * 2 ** attempt)
+        if len(chunk) > 1:
+            self._count('retry', 2)
+            mid = len(chunk) // 2
+            self._fetch_chunk(chunk[:mid], 0)
+            self._fetch_chunk(chunk[mid:], 0)
+        else:
+            self.last_error = error
+            self.store({}, chunk)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _refresh(self, symbols):
+        """分块并发拉取，全部块结束后返回"""
+        if self.chunker is not None:
+            chunks = self.chunker(symbols)
+        else:
+            chunks = [symbols[i:i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+        futures = [self._chunk_pool.submit(self._fetch_chunk, chunk, self.retries) for chunk in chunks]
+        wait(futures)
+
+    def _background_refresh(self, symbols):
+        self._refresh(symbols)
+        if self.on_refresh is not None:
+            self.on_refresh(symbols)
+
+    def store(self, fetched: Dict[str, dict], requested: Iterable[str] = ()):
+        """写入一批结果；requested 中未拿到有效数据的代码记为失败（保留旧数据）"""
+        now = time.time()
+        with self._lock:
+            for symbol, data in fetched.items():
+                if isinstance(data, dict) and data:
+                    self._entries[symbol] = {'ts': now, 'data': data, 'err_ts': None}
+                    self._inflight.discard(symbol)
+            for symbol in requested:
+                if symbol not in fetched or not fetched[symbol]:
+                    entry = self._entries.setdefault(symbol, {'ts': 0.0, 'data': None, 'err_ts': None})
+                    entry['err_ts'] = now
+                self._inflight.discard(symbol)
+
+    def get_many(self, symbols, ttl) -> Dict[str, dict]:
+        """返回 {代码: 行情dict}（取不到时为 {}），过期数据后台刷新"""
+        now = time.time()
+        with self._lock:
+            need = [s for s in symbols if s not in self._inflight and self._needs_refresh(s, ttl, now)]
+            missing = [s for s in need if self._entries.get(s, {}).get('data') is None]
+            missing_set = set(missing)
+            stale = [s for s in need if s not in missing_set]
+            self._inflight.update(need)
+            self.stats['miss'] += len(missing)
+            self.stats['stale'] += len(stale)
+            self.stats['hit'] += len(symbols) - len(need)
+
+        if stale:
+            self._executor.submit(self._background_refresh, stale)
+        if missing:
+            self._refresh(missing)
+
+        with self._lock:
+            return {s: (self._entries.get(s) or {}).get('data') or {} for s in symbols}
+
+    def age(self, symbol):
+        """距上次成功更新的秒数，没有数据返回 None"""
+        entry = self._entries.get(symbol)
+        if not entry or entry['data'] is None:
+            return None
+        return time.time() - entry['ts']
+
+    def evict(self, symbols: Iterable[str]):
+        """淘汰指定代码的缓存"""
+        with self._lock:
+            for s in symbols:
+                self._entries.pop(s, None)
+
+    def retain(self, symbols: Iterable[str]):
+        """只保留指定代码，其余全部淘汰"""
+        keep = set(symbols)
+        with self._lock:
+            for s in [s for s in self._entries if s not in keep]:
+                del self._entries[s]
+
+    def __contains__(self, symbol):
+        return symbol in self._entries
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量列式行情表（代替 pandas.DataFrame，monitor 启动时不需要导入 pandas）
+
+每列是一个 numpy 数组（数值列为 float，缺失为 NaN）；只提供画面用到的操作：
+按列取值、按行号取子表（排序/分页）、追加列、与 JSON 互转。
+"""
+
+import numpy as np
+
+
+class QuoteTable:
+    def __init__(self, columns=None):
+        self._columns = {name: np.asarray(values) for name, values in (columns or {}).items()}
+
+    def __len__(self):
+        return len(next(iter(self._columns.values()))) if self._columns else 0
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def take(self, indices):
+        """按行号取出子表（顺序即 indices 的顺序）"""
+        return QuoteTable({name: values[indices] for name, values in self._columns.items()})
+
+    def assign(self, **columns):
+        """返回追加/替换了若干列的新表"""
+        return QuoteTable({**self._columns, **columns})
+
+    def to_json(self):
+        """{列名: 值列表}（NaN 转为 null）"""
+        return {
+            name: [None if isinstance(v, float) and v != v else v for v in values.tolist()]
+            for name, values in self._columns.items()
+        }
+
+    @classmethod
+    def from_json(cls, data, numeric=()):
+        """to_json 的逆操作，numeric 中的列恢复为 float（null 为 NaN）"""
+        return cls({
+            name: np.array(values, dtype=float) if name in numeric else values
+            for name, values in (data or {}).items()
+        })
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+终端差分渲染
+
+保存上一帧的内容，每次只把发生变化的部分用 ANSI 光标定位重绘，
+不再 os.system('clear') 后整屏重打，刷新无闪烁、CPU 开销很小。
+显示宽度按 Unicode East Asian Width 规则计算并缓存。
+"""
+
+import sys
+import shutil
+import unicodedata
+from functools import lru_cache
+
+CSI = "\x1b["
+
+
+# ====== 显示宽度（East Asian Width） ======
+@lru_cache(maxsize=4096)
+def char_width(char):
+    """单个字符的终端显示宽度：全角/宽字符 2，组合字符、变体选择符等零宽字符 0，其余 1"""
+    if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me", "Cf"):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+
+@lru_cache(maxsize=8192)
+def display_width(text):
+    """字符串的终端显示宽度（结果缓存，行情表中的代码/价格字符串大量重复）"""
+    return sum(char_width(c) for c in text)
+
+
+def truncate_width(text, max_width):
+    """按显示宽度截断（线性扫描，不会切开宽字符）"""
+    if display_width(text) <= max_width:
+        return text
+    width = 0
+    for i, c in enumerate(text):
+        width += char_width(c)
+        if width > max_width:
+            return text[:i]
+    return text
+
+
+def wrap_width(text, max_width):
+    """按显示宽度把一行折成多行（终端自动换行会打乱行号，这里自己折）"""
+    if max_width <= 0 or display_width(text) <= max_width:
+        return [text]
+    rows = []
+    start = 0
+    width = 0
+    for i, c in enumerate(text):
+        w = char_width(c)
+        if width + w > max_width:
+            rows.append(text[start:i])
+            start, width = i, 0
+        width += w
+    rows.append(text[start:])
+    return rows
+
+
+def pad_width(text, target_width):
+    """按显示宽度右侧补空格（超出时原样返回）"""
+    return text + " " * max(0, target_width - display_width(text))
+
+
+# ====== 差分渲染器 ======
+class ScreenRenderer:
+    """
+    帧缓冲 + 差分输出。
+    每行与上一帧比较：相同则跳过；不同则从第一个不同字符处定位光标，
+    只写出后半段并清除行尾。
+    超出终端高度的行不输出（否则都会定位到最后一行互相覆盖），最后一行改为提示还有多少行未显示。
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._frame = []
+        self._started = False
+        self._size = None
+
+    def _common_prefix(self, old, new):
+        n = min(len(old), len(new))
+        i = 0
+        while i < n and old[i] == new[i]:
+            i += 1
+        return i
+
+    def render(self, lines):
+        """输出一帧（lines 为不含换行符的字符串列表），返回本次重绘的行数"""
+        size = shutil.get_terminal_size()
+        if size != self._size:
+            self.invalidate()
+            self._size = size
+        columns, height = size
+        lines = [row for line in lines for row in wrap_width(line, columns)]
+        if height > 0 and len(lines) > height:
+            hidden = len(lines) - height + 1
+            note = f"…… 还有 {hidden} 行未显示（终端高度不足，可放大窗口或用 --top 分页）"
+            lines = lines[:height - 1] + [truncate_width(note, columns)]
+        out = []
+        if not self._started:
+            out.append(f"{CSI}?25l{CSI}2J{CSI}H")  # 隐藏光标、清屏
+            self._started = True
+
+        changed = 0
+        for row, line in enumerate(lines):
+            old = self._frame[row] if row < len(self._frame) else None
+            if line == old:
+                continue
+            changed += 1
+            if old is None:
+                col, tail = 0, line
+            else:
+                i = self._common_prefix(old, line)
+                col, tail = display_width(line[:i]), line[i:]
+            out.append(f"{CSI}{row + 1};{col + 1}H{tail}{CSI}K")
+
+        # 新一帧更短时清除多余的旧行
+        if len(lines) < len(self._frame):
+            out.append(f"{CSI}{len(lines) + 1};1H{CSI}J")
+            changed += len(self._frame) - len(lines)
+
+        self._frame = list(lines)
+        if out:
+            self.stream.write("".join(out))
+            self.stream.flush()
+        return changed
+
+    def invalidate(self):
+        """下一帧强制整屏重绘（例如终端尺寸变化后）"""
+        self._frame = []
+        self._started = False
+
+    def close(self):
+        """恢复光标并把光标移到画面下方（画面占满终端时换行滚动一行）"""
+        self.stream.write(f"{CSI}{max(1, len(self._frame))};1H\n{CSI}?25h")
+        self.stream.flush()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游响应录制与回放（离线运行 / 压测 monitor 用）
+
+- Capture：原样记录每个上游响应（HTTP 状态码、关键响应头、正文；Yahoo 为 quotes 字典）
+  及其相对时间和耗时，逐行追加到 JSONL 文件；
+- Replay：本地替身，按请求标识（URL + 参数 / 代码列表）返回录制的响应，
+  speed=1 按真实节奏、speed>1 加速（返回回放时钟当时最新的一条，并按比例模拟耗时），
+  speed=0 不等待，按顺序逐条返回。录制中没有的请求按连接失败处理。
+- 批量行情请求（Yahoo 的代码列表、腾讯行情的 q= 参数）按代码分块，而分块随缓存时机变化，
+  回放时没有完全相同的请求就按代码从录制的响应中拼出结果（只缺部分代码时只返回有的）。
+
+两者都提供与 requests.get 兼容的 get()，以及包装任意拉取函数的 wrap()。
+"""
+
+import json
+import time
+import threading
+from collections import defaultdict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 回放时需要的响应头（条件请求、编码）
+KEPT_HEADERS = ("ETag", "Last-Modified", "Content-Type")
+# 值为逗号分隔的代码列表、响应为 {代码: 行情} JSON 的查询参数（腾讯行情）
+SPLIT_PARAMS = ("q",)
+
+
+def request_key(url, params=None):
+    """HTTP 请求标识：URL + 排序后的查询参数"""
+    if not params:
+        return url
+    return url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+
+def _sequence_key(args):
+    """拉取函数的请求标识：第一个参数（通常是代码列表）"""
+    if not args:
+        return ""
+    first = args[0]
+    return ",".join(map(str, first)) if isinstance(first, (list, tuple)) else str(first)
+
+
+def _split_key(key):
+    """HTTP 请求标识拆成 (去掉代码列表后的标识, 代码列表)；没有可拆分的参数时代码列表为 None"""
+    url, _, query = key.partition("?")
+    params = dict(item.split("=", 1) for item in query.split("&") if "=" in item)
+    for name in SPLIT_PARAMS:
+        if name in params:
+            codes = params.pop(name).split(",")
+            return f"{request_key(url, params)}#{name}", codes
+    return key, None
+
+
+# ====== 录制 ======
+class Capture:
+    def __init__(self, path):
+        self.path = path
+        self._start = time.time()
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def get(self, url, params=None, **kwargs):
+        """代替 requests.get：请求真实上游并记录响应"""
+        start = time.time()
+        record = {"t": round(start - self._start, 3), "source": "http", "key": request_key(url, params)}
+        try:
+            response = requests.get(url, params=params, **kwargs)
+        except requests.RequestException as e:
+            self._write(dict(record, latency=round(time.time() - start, 3), error=str(e)))
+            raise
+        self._write(dict(
+            record,
+            latency=round(time.time() - start, 3),
+            status=response.status_code,
+            headers={h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            body=response.text,
+        ))
+        return response
+
+    def wrap(self, source, fn):
+        """包装拉取函数：调用真实函数并记录返回值（需可 JSON 序列化）"""
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            record = {"t": round(start - self._start, 3), "source": source, "key": _sequence_key(args)}
+            try:
+                data = fn(*args, **kwargs)
+            except Exception as e:
+                self._write(dict(record, latency=round(time.time() - start, 3), error=str(e)))
+                raise
+            self._write(dict(record, latency=round(time.time() - start, 3), data=data))
+            return data
+        return wrapper
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# ====== 回放 ======
+class Replay:
+    def __init__(self, path, speed=1.0):
+        self.speed = speed                  # 回放倍速，0 表示不等待、按顺序逐条返回
+        self._records = defaultdict(list)   # (source, key) -> [记录]（按时间）
+        # 批量行情按代码拆开：(source, 去掉代码列表的 key) -> {代码: [{t, latency, value}]}
+        self._parts = defaultdict(lambda: defaultdict(list))
+        self._cursor = defaultdict(int)
+        self._lock = threading.Lock()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[(record["source"], record["key"])].append(record)
+                    self._index_parts(record)
+        self._start = time.time()
+
+    def _index_parts(self, record):
+        if "error" in record:
+            return
+        if record["source"] == "http":
+            base, codes = _split_key(record["key"])
+            if codes is None or record.get("status") != 200:
+                return
+            try:
+                data = json.loads(record["body"])
+            except ValueError:
+                return
+        else:
+            base, codes, data = "", record["key"].split(","), record.get("data")
+        if not isinstance(data, dict):
+            return
+        parts = self._parts[(record["source"], base)]
+        for code in codes:
+            if code in data:
+                parts[code].append({"t": record["t"], "latency": record.get("latency"), "value": data[code]})
+
+    def __len__(self):
+        return sum(len(records) for records in self._records.values())
+
+    def _select(self, cursor, records):
+        with self._lock:
+            if self.speed > 0:
+                # 回放时钟当时最新的一条（还没到第一条的时间时返回第一条）
+                clock = (time.time() - self._start) * self.speed
+                index = max(0, sum(1 for r in records if r["t"] <= clock) - 1)
+            else:
+                index = min(self._cursor[cursor], len(records) - 1)
+                self._cursor[cursor] += 1
+        return records[index]
+
+    def _next(self, source, key):
+        records = self._records.get((source, key))
+        if not records:
+            raise requests.ConnectionError(f"回放文件中没有该请求: {source} {key}")
+        record = self._select((source, key), records)
+        if self.speed > 0 and record.get("latency"):
+            time.sleep(record["latency"] / self.speed)
+        return record
+
+    def _assemble(self, source, base, codes):
+        """没有完全相同的批量请求时，按代码从录制的响应中拼出 {代码: 行情}"""
+        parts = self._parts.get((source, base), {})
+        found, latency = {}, 0.0
+        for code in codes:
+            entries = parts.get(code)
+            if entries:
+                entry = self._select((source, base, code), entries)
+                found[code] = entry["value"]
+                latency = max(latency, entry["latency"] or 0.0)
+        if not found:
+            raise requests.ConnectionError(f"回放文件中没有这些代码: {source} {','.join(codes)[:80]}")
+        if self.speed > 0 and latency:
+            time.sleep(latency / self.speed)
+        return found
+
+    def get(self, url, params=None, **kwargs):
+        """代替 requests.get：返回录制的响应"""
+        key = request_key(url, params)
+        base, codes = _split_key(key)
+        if ("http", key) not in self._records and codes is not None:
+            record = {"key": key, "status": 200, "headers": {"Content-Type": "application/json"},
+                      "body": json.dumps(self._assemble("http", base, codes), ensure_ascii=False)}
+        else:
+            record = self._next("http", key)
+        if "error" in record:
+            raise requests.ConnectionError(record["error"])
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.headers = CaseInsensitiveDict(record.get("headers", {}))
+        response._content = record["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = record["key"]
+        return response
+
+    def wrap(self, source, fn=None):
+        """代替拉取函数：返回录制的返回值（fn 只用于保持与 Capture.wrap 相同的调用方式）"""
+        def wrapper(*args, **kwargs):
+            key = _sequence_key(args)
+            if (source, key) not in self._records and args and isinstance(args[0], (list, tuple)):
+                return self._assemble(source, "", [str(code) for code in args[0]])
+            record = self._next(source, key)
+            if "error" in record:
+                raise RuntimeError(record["error"])
+            return record["data"]
+        return wrapper
+
+    def close(self):
+        pass
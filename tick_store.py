@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中逐笔价格记录：每个代码一个固定大小的内存映射环形文件
+
+文件布局（小端）：
+    头部 32 字节：magic(8) | 容量 uint32 | 记录长度 uint32 | 已写入总条数 uint64 | 写入序号 uint64
+    记录 24 字节：时间戳 float64 | 价格 float64 | 涨跌幅 float64（缺失为 NaN）
+
+- 写入序号是顺序锁（seqlock）：写入端写一条记录前后各加 1（写入中为奇数），
+  读取端读前后序号不同或为奇数时重读，写满覆盖时也不会读到写了一半的记录；
+- 其他进程用 mmap 只读映射读取，read_ticks 按时间正序返回 numpy 结构化数组：
+  所取范围在文件中连续时是映射的零拷贝视图，跨过环形末尾时才拼接成副本；
+- 文件大小固定，运行多久内存和磁盘占用都不变，写满后覆盖最旧的记录；
+- 与上一条价格、涨跌幅都相同的观测不重复写入（缓存中的旧行情会被反复看到）。
+
+命令行查看：python3 tick_store.py ticks/US.AAPL.ring [条数]
+"""
+
+import os
+import re
+import sys
+import mmap
+import math
+import time
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b"TICKRNG1"
+HEADER = struct.Struct("<8sIIQQ")
+U64 = struct.Struct("<Q")          # 头部中的已写入总条数（偏移 16）与写入序号（偏移 24）
+COUNT_OFFSET, SEQ_OFFSET = 16, 24
+READ_RETRIES = 1000
+RECORD = struct.Struct("<ddd")
+TICK_DTYPE = np.dtype([("ts", "<f8"), ("price", "<f8"), ("change", "<f8")])
+DEFAULT_CAPACITY = 8192   # 每个代码保留的记录数（约 192KB）
+
+
+def symbol_filename(symbol):
+    """代码 -> 文件名（去掉路径分隔符等不安全字符）"""
+    return re.sub(r"[^0-9A-Za-z._^=-]", "_", symbol) + ".ring"
+
+
+class TickRing:
+    """单个代码的环形文件（写入端）"""
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER.size
+        self._file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            magic, capacity, record_size, count, seq = HEADER.unpack_from(self._file.read(HEADER.size))
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError(f"不是 tick 环形文件: {path}")
+        else:
+            count = seq = 0
+            self._file.write(HEADER.pack(MAGIC, capacity, RECORD.size, 0, 0))
+            self._file.truncate(HEADER.size + capacity * RECORD.size)
+        self.path = path
+        self.capacity = capacity           # 已有文件沿用文件中的容量
+        self.count = count
+        self._mm = mmap.mmap(self._file.fileno(), HEADER.size + capacity * RECORD.size)
+        # 上次写入中途退出时序号停在奇数，恢复成偶数，否则读取端会一直等待
+        self._seq = seq + seq % 2
+        U64.pack_into(self._mm, SEQ_OFFSET, self._seq)
+        self._last = None
+        if count:
+            _, price, change = RECORD.unpack_from(self._mm, self._offset(count - 1))
+            self._last = (price, change)
+
+    def _offset(self, index):
+        return HEADER.size + (index % self.capacity) * RECORD.size
+
+    def append(self, ts, price, change=math.nan):
+        """追加一条记录；与上一条相同则跳过，返回是否写入"""
+        price = float(price)
+        change = math.nan if change is None else float(change)
+        if self._last is not None and _same(self._last, (price, change)):
+            return False
+        U64.pack_into(self._mm, SEQ_OFFSET, self._seq + 1)
+        RECORD.pack_into(self._mm, self._offset(self.count), ts, price, change)
+        self.count += 1
+        U64.pack_into(self._mm, COUNT_OFFSET, self.count)
+        self._seq += 2
+        U64.pack_into(self._mm, SEQ_OFFSET, self._seq)
+        self._last = (price, change)
+        return True
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def _same(a, b):
+    return all(x == y or (math.isnan(x) and math.isnan(y)) for x, y in zip(a, b))
+
+
+class TickRecorder:
+    """按代码打开/创建环形文件并写入，可被多个抓取线程同时调用"""
+
+    def __init__(self, directory="ticks", capacity=DEFAULT_CAPACITY):
+        self.directory = directory
+        self.capacity = capacity
+        self._rings = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _ring(self, symbol):
+        ring = self._rings.get(symbol)
+        if ring is None:
+            ring = TickRing(os.path.join(self.directory, symbol_filename(symbol)), self.capacity)
+            self._rings[symbol] = ring
+        return ring
+
+    def record(self, ts, symbol, price, change=math.nan):
+        """记录一次观测（价格缺失时忽略）"""
+        if price is None or math.isnan(price):
+            return False
+        with self._lock:
+            return self._ring(symbol).append(ts, price, change)
+
+    def record_many(self, ts, symbols, prices, changes=None):
+        """批量记录同一时刻的观测，返回写入条数"""
+        if changes is None:
+            changes = [math.nan] * len(symbols)
+        written = 0
+        with self._lock:
+            for symbol, price, change in zip(symbols, prices, changes):
+                if price is None or math.isnan(price):
+                    continue
+                written += self._ring(symbol).append(ts, price, change)
+        return written
+
+    def close(self):
+        with self._lock:
+            for ring in self._rings.values():
+                ring.close()
+            self._rings.clear()
+
+
+# ====== 读取端（其他进程） ======
+def read_ticks(path, last=None):
+    """
+    只读映射环形文件，返回按时间正序的结构化数组（ts / price / change），last 为只取最近几条。
+    范围连续时返回映射上的视图（不复制，写入端继续写满一圈后会被覆盖，需要长期保存时 .copy()），
+    跨过环形末尾时返回副本；读取期间写入序号变化则重读。
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, capacity, record_size, _, _ = HEADER.unpack_from(mm)
+    if magic != MAGIC or record_size != TICK_DTYPE.itemsize:
+        mm.close()
+        raise ValueError(f"不是 tick 环形文件: {path}")
+    # 视图引用着映射，数组都释放后映射随之关闭
+    records = np.frombuffer(mm, dtype=TICK_DTYPE, count=capacity, offset=HEADER.size)
+    for _ in range(READ_RETRIES):
+        seq = U64.unpack_from(mm, SEQ_OFFSET)[0]
+        if seq % 2:
+            time.sleep(0.0001)              # 写入中
+            continue
+        count = U64.unpack_from(mm, COUNT_OFFSET)[0]
+        n = min(count, capacity)
+        if last is not None:
+            n = min(n, last)
+        start = (count - n) % capacity
+        if start + n <= capacity:
+            result = records[start:start + n]
+        else:
+            result = np.concatenate((records[start:], records[:start + n - capacity]))
+        if U64.unpack_from(mm, SEQ_OFFSET)[0] == seq:
+            return result
+    raise RuntimeError(f"{path} 持续写入中，读取失败")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python3 tick_store.py <环形文件> [条数]")
+        sys.exit(1)
+    from datetime import datetime
+    ticks = read_ticks(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+    for ts, price, change in ticks.tolist():
+        change_s = "" if math.isnan(change) else f" {change:+.2f}%"
+        print(f"{datetime.fromtimestamp(ts):%m-%d %H:%M:%S} {price:.4f}{change_s}")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+新闻翻译：可插拔翻译后端 + 有界 LRU 缓存（SQLite 持久化）
+
+- 缓存以内容哈希为 key，内存中只保留最近使用的 capacity 条；
+- 磁盘上用 SQLite 表按 key 查询、逐条追加，不再整表读写 pickle；
+  命中的条目批量更新最近使用时间，磁盘上同样按最近使用淘汰；
+- 未命中的条目合并成一次批量调用交给翻译后端。
+"""
+
+import os
+import time
+import pickle
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+
+# ====== 翻译后端 ======
+class TranslationBackend:
+    """翻译后端基类：一次调用翻译一批文本，返回等长列表"""
+    name = "base"
+
+    def translate_batch(self, texts: List[str], src="en", dest="zh-cn") -> List[str]:
+        raise NotImplementedError
+
+
+class NullBackend(TranslationBackend):
+    """不翻译，原样返回（未安装翻译库或 --translator none 时使用）"""
+    name = "none"
+
+    def __init__(self, reason=None):
+        self.reason = reason    # 因其他后端不可用而退回时的原因（由调用方显示，不打印）
+
+    def translate_batch(self, texts, src="en", dest="zh-cn"):
+        return list(texts)
+
+
+class GoogleTransBackend(TranslationBackend):
+    """googletrans 后端：多条文本用换行拼成一次请求，再按行拆回"""
+    name = "google"
+
+    def __init__(self):
+        from googletrans import Translator
+        self._translator = Translator()
+
+    def _translate(self, text, src, dest):
+        result = self._translator.translate(text, src=src, dest=dest)
+        # googletrans 4.x 的 translate 是协程
+        if asyncio.iscoroutine(result):
+            result = asyncio.run(result)
+        return result.text
+
+    def translate_batch(self, texts, src="en", dest="zh-cn"):
+        if not texts:
+            return []
+        joined = "\n".join(t.replace("\n", " ") for t in texts)
+        lines = self._translate(joined, src, dest).split("\n")
+        if len(lines) == len(texts):
+            return lines
+        # 行数对不上时逐条翻译兜底
+        return [self._translate(t, src, dest) for t in texts]
+
+
+TRANSLATION_BACKENDS = {
+    "google": GoogleTransBackend,
+    "none": NullBackend,
+}
+
+
+def get_translation_backend(name="google"):
+    """按名称创建翻译后端，依赖缺失时退回 NullBackend（原因记录在其 reason 中）"""
+    try:
+        return TRANSLATION_BACKENDS[name]()
+    except ImportError as e:
+        return NullBackend(reason=f"翻译后端 {name} 不可用（{e}），新闻将不翻译")
+
+
+# ====== 有界 LRU 翻译缓存 ======
+def content_key(text, dest="zh-cn"):
+    """缓存 key：目标语言 + 文本内容哈希"""
+    return hashlib.sha1(f"{dest}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    内存 LRU + SQLite 持久化。
+    命中/写入只涉及本次用到的条目，代价与缓存总量无关。
+    """
+
+    def __init__(self, path, capacity=5000):
+        self.path = path
+        self.capacity = capacity
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._since_trim = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_used ON translations(used)")
+        self._trim()
+        self._conn.commit()
+
+    def _trim(self):
+        """磁盘上只保留最近使用的 capacity 条（启动时及每累计写入一批后执行）"""
+        self._since_trim = 0
+        self._conn.execute(
+            "DELETE FROM translations WHERE key NOT IN "
+            "(SELECT key FROM translations ORDER BY used DESC LIMIT ?)",
+            (self.capacity,),
+        )
+
+    def _remember(self, key, text):
+        self._lru[key] = text
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys) -> Dict[str, str]:
+        """批量查询，返回命中的 {key: 译文}"""
+        found = {}
+        missing = []
+        with self._lock:
+            for k in keys:
+                if k in self._lru:
+                    self._lru.move_to_end(k)
+                    found[k] = self._lru[k]
+                else:
+                    missing.append(k)
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._conn.execute(
+                    f"SELECT key, text FROM translations WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for k, text in rows:
+                    found[k] = text
+                    self._remember(k, text)
+            if found:
+                # 内存和磁盘命中都更新最近使用时间（一条语句），_trim 按它淘汰最久未用的
+                placeholders = ",".join("?" * len(found))
+                self._conn.execute(
+                    f"UPDATE translations SET used=? WHERE key IN ({placeholders})", [time.time(), *found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, str]):
+        """追加写入新译文（只写本次新增的条目）"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for k, text in items.items():
+                self._remember(k, text)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, text, used) VALUES (?, ?, ?)",
+                [(k, text, now) for k, text in items.items()],
+            )
+            self._since_trim += len(items)
+            if self._since_trim > max(100, self.capacity // 10):
+                self._trim()
+            self._conn.commit()
+
+    def import_pickle(self, pickle_path, dest="zh-cn"):
+        """一次性迁移旧版 {原文: 译文} pickle 缓存，迁移后删除旧文件"""
+        if not os.path.exists(pickle_path):
+            return 0
+        try:
+            with open(pickle_path, "rb") as f:
+                old = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            return 0
+        if isinstance(old, dict):
+            self.put_many({content_key(src, dest): dst for src, dst in old.items() if src and dst})
+            self._trim()
+            self._conn.commit()
+        os.remove(pickle_path)
+        return len(old) if isinstance(old, dict) else 0
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+
+# ====== 翻译服务：缓存优先，未命中的合并成一次批量翻译 ======
+class NewsTranslator:
+    def __init__(self, backend: TranslationBackend, cache: TranslationCache, src="en", dest="zh-cn"):
+        self.backend = backend
+        self.cache = cache
+        self.src = src
+        self.dest = dest
+        self.stats = {'hit': 0, 'miss': 0, 'error': 0}   # 按条计的缓存命中/未命中，按批次计的翻译失败
+        self.last_error = None
+
+    def translate_many(self, texts: List[str]) -> List[str]:
+        """翻译一批文本；失败时返回原文"""
+        keys = [content_key(t, self.dest) if t and t.strip() else None for t in texts]
+        cached = self.cache.get_many([k for k in keys if k])
+
+        # 同一批次内重复文本只翻译一次
+        todo = OrderedDict()
+        for t, k in zip(texts, keys):
+            if k and k not in cached:
+                todo.setdefault(k, t)
+
+        self.stats['hit'] += sum(1 for k in keys if k and k in cached)
+        self.stats['miss'] += len(todo)
+        if todo:
+            try:
+                translated = self.backend.translate_batch(list(todo.values()), src=self.src, dest=self.dest)
+                new_entries = dict(zip(todo.keys(), translated))
+                if self.backend.name != NullBackend.name:
+                    self.cache.put_many(new_entries)
+                cached.update(new_entries)
+                self.last_error = None
+            except Exception as e:
+                # 不打印（会被下一帧覆盖），由调用方显示 last_error
+                self.stats['error'] += 1
+                self.last_error = e
+
+        return [cached.get(k, t) if k else t for t, k in zip(texts, keys)]
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自选股列表（stocks.txt）解析与热加载
+
+文件只在 mtime/大小变化时重新解析一次，结果缓存为紧凑结构；
+每次重载都会与上一版比较，得到新增/删除的代码和变化的持仓，
+调用方据此只对新增代码立即拉取行情、清理已删除代码的缓存。
+
+文件格式（空白分隔）：
+    代码  [标记 1=🚀 2=⚡]  [成本价*持仓票数]
+    数字开头的代码视为港股；成本价为负表示做空。
+"""
+
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+MARK_SYMBOLS = {"1": "🚀", "2": "⚡"}
+
+
+class Watchlist(NamedTuple):
+    us_tickers: Tuple[str, ...]
+    hk_tickers: Tuple[str, ...]
+    marks: Dict[str, str]
+    cost_and_shares: Dict[str, Dict[str, float]]
+
+
+class WatchlistDiff(NamedTuple):
+    added: Tuple[str, ...]
+    removed: Tuple[str, ...]
+    changed_positions: Tuple[str, ...]
+    changed_marks: Tuple[str, ...]
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed_positions or self.changed_marks)
+
+
+EMPTY_WATCHLIST = Watchlist((), (), {}, {})
+
+
+# ====== 解析 ======
+def parse_cost_shares(text):
+    """解析 成本价*持仓票数，格式不对返回 None"""
+    if '*' not in text:
+        return None
+    try:
+        cost_price, shares = text.split('*')
+        return {'cost_price': float(cost_price), 'shares': float(shares)}
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_watchlist(lines) -> Watchlist:
+    """从文本行解析自选股（支持第二列 1/2 标记和第三/四列成本价*持仓票数，识别港股）"""
+    us_tickers: List[str] = []
+    hk_tickers: List[str] = []
+    marks = {}
+    cost_and_shares = {}
+    for line in lines:
+        parts = line.strip().split()
+        if not parts:
+            continue
+        t = parts[0].upper()
+
+        # 判断是否为港股（数字开头）
+        if t[0].isdigit():
+            hk_tickers.append(t)
+        else:
+            us_tickers.append(t)
+
+        if len(parts) > 1 and parts[1] in MARK_SYMBOLS:
+            marks[t] = MARK_SYMBOLS[parts[1]]
+
+        # 第三列不包含成本价*持仓票数时，检查第四列
+        if len(parts) > 2:
+            position = parse_cost_shares(parts[2])
+            if position is None and '*' not in parts[2] and len(parts) > 3:
+                position = parse_cost_shares(parts[3])
+            if position is not None:
+                cost_and_shares[t] = position
+
+    return Watchlist(tuple(us_tickers), tuple(hk_tickers), marks, cost_and_shares)
+
+
+def diff_watchlists(old: Watchlist, new: Watchlist) -> WatchlistDiff:
+    """比较两版自选股，得到增删的代码和变化的持仓/标记"""
+    old_all = set(old.us_tickers) | set(old.hk_tickers)
+    new_all = set(new.us_tickers) | set(new.hk_tickers)
+    added = tuple(t for t in new.us_tickers + new.hk_tickers if t not in old_all)
+    removed = tuple(t for t in old.us_tickers + old.hk_tickers if t not in new_all)
+    keep = old_all & new_all
+    changed_positions = tuple(sorted(
+        t for t in keep if old.cost_and_shares.get(t) != new.cost_and_shares.get(t)
+    ))
+    changed_marks = tuple(sorted(t for t in keep if old.marks.get(t) != new.marks.get(t)))
+    return WatchlistDiff(added, removed, changed_positions, changed_marks)
+
+
+# ====== 热加载缓存 ======
+class WatchlistCache:
+    """按文件 mtime/大小判断是否需要重新解析；可被多个抓取线程同时调用"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._watchlist = EMPTY_WATCHLIST
+        self._pending_diff: Optional[WatchlistDiff] = None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _reload_if_changed(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        if stamp is None:
+            new = EMPTY_WATCHLIST
+        else:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    new = parse_watchlist(f)
+            except FileNotFoundError:
+                new = EMPTY_WATCHLIST
+        diff = diff_watchlists(self._watchlist, new)
+        self._watchlist = new
+        self._stamp = stamp
+        if diff:
+            # 尚未被取走的变化与本次合并
+            if self._pending_diff is not None:
+                prev = self._pending_diff
+                added = tuple(t for t in prev.added if t not in diff.removed) + diff.added
+                removed = tuple(t for t in prev.removed if t not in diff.added) + diff.removed
+                diff = WatchlistDiff(
+                    added, removed,
+                    tuple(sorted(set(prev.changed_positions) | set(diff.changed_positions))),
+                    tuple(sorted(set(prev.changed_marks) | set(diff.changed_marks))),
+                )
+            self._pending_diff = diff
+
+    def get(self) -> Watchlist:
+        """返回当前自选股（文件未变化时不做任何解析）"""
+        with self._lock:
+            self._reload_if_changed()
+            return self._watchlist
+
+    def has_changes(self) -> bool:
+        """检查文件变化，返回是否有尚未被 poll 取走的变化（不取走）"""
+        with self._lock:
+            self._reload_if_changed()
+            return self._pending_diff is not None
+
+    def poll(self) -> Optional[WatchlistDiff]:
+        """检查文件变化，返回自上次 poll 以来累计的变化（无变化返回 None）"""
+        with self._lock:
+            self._reload_if_changed()
+            diff, self._pending_diff = self._pending_diff, None
+            return diff